@@ -0,0 +1,3 @@
+"""Offline benchmarks: a simulated inference backend, an Ollama stub server and synthetic repositories.
+
+Run with `python -m commenter.benchmarks.run --help`."""
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from ..models.base import InferenceBase, TransientInferenceError
+
+_CONTEXT_LINE_PATTERN = re.compile(r"^\s*(Element|Type|Return Type|Is Async|Parameters): ?(.*)$", re.MULTILINE)
+# Splits "a: number, b: Map<string, number>" at the commas that start a new parameter
+_PARAMETER_SPLIT_PATTERN = re.compile(r",\s*(?=[A-Za-z_$][\w$]*\??\s*:)")
+# Numbered element headings of a batched prompt (see CommentFormatter.create_batch_prompt)
+_BATCH_HEADING_PATTERN = re.compile(r"^\s*Element \d+:\s*$", re.MULTILINE)
+_FILLER = (
+    "Handles the request by validating its input, transforming the data "
+    "and returning the computed result to the caller. "
+)
+
+
+def fake_response(
+    prompt: str, response_chars: int, structured: bool = False, system: Optional[str] = None
+) -> str:
+    """
+    Build a plausible, deterministic answer to a prompt.
+
+    Comment prompts get an <element> block, batched prompts one indexed block per element
+    and structured prompts JSON; anything else (README summaries) gets plain text. The
+    description is padded to about `response_chars`.
+
+    Args:
+        prompt (str): The prompt being answered
+        response_chars (int): Approximate length of the description
+        structured (bool): Answer with the JSON element description instead of XML
+        system (Optional[str]): System instructions sent with the prompt
+
+    Returns:
+        str: The response text
+    """
+    description = (_FILLER * (response_chars // len(_FILLER) + 1))[: max(1, response_chars)].strip()
+    if structured:
+        return json.dumps(_describe(prompt, description))
+    if "<element>" not in (system or "") + prompt:
+        return description
+    sections = _BATCH_HEADING_PATTERN.split(prompt)[1:]
+    if not sections:
+        return _element_block(_describe(prompt, description))
+    # A batched prompt gets one indexed block per element, as CommentFormatter.split_batch_output expects
+    blocks = "".join(
+        _element_block(_describe(section, description), index)
+        for index, section in enumerate(sections, start=1)
+    )
+    return f"<elements>{blocks}</elements>"
+
+
+def _describe(prompt: str, description: str) -> Dict:
+    """Describe the element in a prompt from its context lines, matching CommentFormatter.element_schema."""
+    context = dict(_CONTEXT_LINE_PATTERN.findall(prompt))
+    element_type = context.get("Type", "function").strip() or "function"
+    answer = {
+        "name": context.get("Element", "element").strip() or "element",
+        "description": description,
+        "type": element_type,
+    }
+    if element_type in ("function", "method"):
+        answer["isAsync"] = context.get("Is Async", "").strip() == "True"
+    parameters = context.get("Parameters", "").strip()
+    if parameters:
+        answer["parameters"] = [
+            {
+                "name": name.strip().rstrip("?"),
+                "type": param_type.strip(),
+                "description": f"The {name.strip().rstrip('?')} argument.",
+            }
+            for name, _, param_type in (
+                part.partition(":") for part in _PARAMETER_SPLIT_PATTERN.split(parameters)
+            )
+        ]
+    return_type = context.get("Return Type", "").strip()
+    if element_type in ("function", "method") and return_type != "void":
+        answer["returns"] = {
+            "type": return_type if return_type not in ("", "unknown", "any") else "string",
+            "description": "The result.",
+        }
+    return answer
+
+
+def _element_block(answer: Dict, index: Optional[int] = None) -> str:
+    opening = f'<element index="{index}">' if index is not None else "<element>"
+    parts = [
+        opening,
+        f"<name>{answer['name']}</name><description>{answer['description']}</description>",
+        f"<type>{answer['type']}</type>",
+    ]
+    if "isAsync" in answer:
+        parts.append(f"<isAsync>{str(answer['isAsync']).lower()}</isAsync>")
+    if answer.get("parameters"):
+        parts.append("<parameters>")
+        parts.extend(
+            f"<param><name>{param['name']}</name><type>{param['type']}</type>"
+            f"<description>{param['description']}</description></param>"
+            for param in answer["parameters"]
+        )
+        parts.append("</parameters>")
+    if "returns" in answer:
+        parts.append(
+            f"<returns><type>{answer['returns']['type']}</type>"
+            f"<description>{answer['returns']['description']}</description></returns>"
+        )
+    parts.append("</element>")
+    return "".join(parts)
+
+
+class RequestPlanner:
+    """Decides each simulated request's delay and whether it fails, deterministically per prompt and attempt."""
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, seed: int):
+        """
+        Initialize the planner.
+
+        Args:
+            latency (float): Seconds each request takes
+            jitter (float): Extra random latency of up to this many seconds
+            error_rate (float): Fraction of requests that fail
+            seed (int): Seed for latency jitter and errors; the same prompt and seed
+                always behave the same
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def plan(self, prompt: str) -> Tuple[float, bool]:
+        """
+        Plan the next attempt at a prompt.
+
+        Args:
+            prompt (str): The prompt being sent
+
+        Returns:
+            Tuple[float, bool]: Seconds the request takes and whether it fails
+        """
+        with self._lock:
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+            self.requests += 1
+        digest = hashlib.sha256(f"{self.seed}:{attempt}:{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        delay = self.latency + rng.uniform(0, self.jitter)
+        failed = rng.random() < self.error_rate
+        with self._lock:
+            self.busy_seconds += delay
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+
+class FakeInference(InferenceBase):
+    """Deterministic stand-in backend with configurable latency, error rate and response size."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        response_chars: int = 200,
+        seed: int = 0,
+        context_window: int = 32768,
+    ):
+        """
+        Initialize the fake backend.
+
+        Args:
+            latency (float): Seconds each request takes
+            jitter (float): Extra random latency of up to this many seconds
+            error_rate (float): Fraction of requests failing with a TransientInferenceError
+            response_chars (int): Approximate length of each generated description
+            seed (int): Seed for latency jitter and errors; the same prompt and seed
+                always behave the same
+            context_window (int): Context window reported to callers
+        """
+        self.response_chars = response_chars
+        self.max_tokens = None
+        self._context_window = context_window
+        self._planner = RequestPlanner(latency, jitter, error_rate, seed)
+
+    @property
+    def calls(self) -> int:
+        return self._planner.requests
+
+    @property
+    def errors(self) -> int:
+        return self._planner.errors
+
+    @property
+    def busy_seconds(self) -> float:
+        return self._planner.busy_seconds
+
+    def context_window(self) -> int:
+        return self._context_window
+
+    def _answer(
+        self, prompt: str, failed: bool, structured: bool = False, system: Optional[str] = None
+    ) -> str:
+        if failed:
+            raise TransientInferenceError("simulated failure")
+        return fake_response(prompt, self.response_chars, structured, system)
+
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        delay, failed = self._planner.plan(prompt)
+        time.sleep(delay)
+        return self._answer(prompt, failed, system=system)
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        delay, failed = self._planner.plan(prompt)
+        await asyncio.sleep(delay)
+        return self._answer(prompt, failed, system=system)
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        delay, failed = self._planner.plan(prompt)
+        time.sleep(delay)
+        return self._answer(prompt, failed, structured=True, system=system)
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        delay, failed = self._planner.plan(prompt)
+        await asyncio.sleep(delay)
+        return self._answer(prompt, failed, structured=True, system=system)
+
+    def stats(self) -> dict:
+        """Return the number of requests, simulated failures and total simulated latency."""
+        return {"calls": self.calls, "errors": self.errors, "busy_seconds": self.busy_seconds}
@@ -0,0 +1,233 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from typing import Dict, Optional
+import click
+from termcolor import colored
+from ..formatters.comment import CommentFormatter
+from ..formatters.readme import ReadmeFormatter
+from ..inferences.ollama import OllamaInference
+from ..inferences.pool import PooledInference
+from ..inferences.scheduler import ScheduledInference
+from ..parsers.typescript import configure_parser
+from ..processing.function import process_file
+from ..processing.readme import process_readme
+from ..processing.repository import process_repository
+from .fake import FakeInference
+from .server import OllamaStubServer
+from .synthetic import generate_repository
+
+SCENARIOS = ("process_file", "process_readme", "process_repository")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def run_scenario(scenario: str, inference, settings: dict) -> Dict[str, float]:
+    """
+    Run one scenario on a freshly generated repository and time its stages.
+
+    Args:
+        scenario (str): One of SCENARIOS
+        inference (InferenceBase): Backend to use
+        settings (dict): Repository shape and run options (files, elements, depth, seed,
+            concurrency, batch_tokens)
+
+    Returns:
+        Dict[str, float]: Seconds per stage, plus "total"
+    """
+    comment_formatter = CommentFormatter("Benchmark")
+    readme_formatter = ReadmeFormatter("Benchmark")
+    parser = configure_parser(use_cache=False)
+    timings = {}
+    with tempfile.TemporaryDirectory(prefix="commenter-bench-") as root:
+        with _stage(timings, "generate_repository"):
+            paths = generate_repository(
+                root, settings["files"], settings["elements"], settings["depth"], settings["seed"]
+            )
+        # Progress output would dominate the measurement on a terminal
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            if scenario == "process_file":
+                with _stage(timings, "parse"):
+                    elements = parser.parse_file(paths[0])
+                with _stage(timings, "comment"):
+                    process_file(
+                        inference,
+                        comment_formatter,
+                        paths[0],
+                        parser,
+                        elements,
+                        concurrency=settings["concurrency"],
+                        batch_tokens=settings["batch_tokens"],
+                    )
+            elif scenario == "process_readme":
+                with _stage(timings, "summarize"):
+                    process_readme(inference, readme_formatter, root)
+            else:
+                with _stage(timings, "repository"):
+                    process_repository(
+                        inference,
+                        comment_formatter,
+                        readme_formatter,
+                        root,
+                        concurrency=settings["concurrency"],
+                        batch_tokens=settings["batch_tokens"],
+                    )
+            timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float):
+    """
+    Find stages that got slower than the baseline by more than `tolerance`.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): Scenario -> stage -> seconds for this run
+        baseline (Dict[str, Dict[str, float]]): The same, from the stored baseline
+        tolerance (float): Allowed slowdown as a fraction (0.2 = 20%)
+
+    Returns:
+        List[str]: One description per regression
+    """
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, seconds in stages.items():
+            previous = baseline.get(scenario, {}).get(stage)
+            # Sub-10ms stages are too noisy to judge
+            if previous and seconds > 0.01 and seconds > previous * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}.{stage}: {seconds:.3f}s vs {previous:.3f}s baseline "
+                    f"(+{(seconds / previous - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+@click.command()
+@click.option("--scenario", "scenarios", type=click.Choice(SCENARIOS), multiple=True, help="Scenario to run (default: all)")
+@click.option("--backend", type=click.Choice(["fake", "http"]), default="fake", help="In-process fake backend or the Ollama stub server")
+@click.option("--endpoints", type=click.IntRange(min=1), default=1, help="Stub servers behind a PooledInference (http backend only)")
+@click.option("--files", type=click.IntRange(min=1), default=20, help="Files in the synthetic repository")
+@click.option("--elements", type=click.IntRange(min=1), default=10, help="Elements per file")
+@click.option("--depth", type=click.IntRange(min=0), default=2, help="Directory nesting depth")
+@click.option("--latency", type=click.FloatRange(min=0), default=0.01, help="Simulated seconds per request")
+@click.option("--jitter", type=click.FloatRange(min=0), default=0.0, help="Extra random latency of up to this many seconds")
+@click.option("--error-rate", type=click.FloatRange(min=0, max=1), default=0.0, help="Fraction of requests that fail transiently")
+@click.option("--response-chars", type=click.IntRange(min=1), default=200, help="Approximate length of each generated description")
+@click.option("--concurrency", type=click.IntRange(min=1), default=1, help="In-flight inference requests per file")
+@click.option("--batch-tokens", type=click.IntRange(min=1), default=None, help="Pack small elements into shared prompts")
+@click.option("--repeat", type=click.IntRange(min=1), default=3, help="Runs per scenario; the median is reported")
+@click.option("--seed", type=int, default=0, help="Seed for the repository and simulated failures")
+@click.option("--baseline", "baseline_path", default=DEFAULT_BASELINE, help="Baseline JSON file")
+@click.option("--save-baseline", is_flag=True, help="Store this run's results as the baseline for its configuration")
+@click.option("--tolerance", type=click.FloatRange(min=0), default=0.2, help="Allowed slowdown before a stage counts as a regression")
+def main(
+    scenarios,
+    backend: str,
+    endpoints: int,
+    files: int,
+    elements: int,
+    depth: int,
+    latency: float,
+    jitter: float,
+    error_rate: float,
+    response_chars: int,
+    concurrency: int,
+    batch_tokens: Optional[int],
+    repeat: int,
+    seed: int,
+    baseline_path: str,
+    save_baseline: bool,
+    tolerance: float,
+):
+    """Benchmark the documentation pipeline offline against a simulated inference backend."""
+    settings = {
+        "files": files,
+        "elements": elements,
+        "depth": depth,
+        "seed": seed,
+        "concurrency": concurrency,
+        "batch_tokens": batch_tokens,
+    }
+    # Baselines are only comparable between runs with the same configuration
+    config_key = json.dumps(
+        dict(
+            settings,
+            backend=backend,
+            endpoints=endpoints if backend == "http" else 1,
+            latency=latency,
+            jitter=jitter,
+            error_rate=error_rate,
+            response_chars=response_chars,
+        ),
+        sort_keys=True,
+    )
+
+    servers = []
+    if backend == "http":
+        servers = [
+            OllamaStubServer(latency, jitter, error_rate, response_chars, seed=seed + index).start()
+            for index in range(endpoints)
+        ]
+        if endpoints > 1:
+            inner = PooledInference([OllamaInference(host=server.url) for server in servers])
+        else:
+            inner = OllamaInference(host=servers[0].url)
+    else:
+        inner = FakeInference(latency, jitter, error_rate, response_chars, seed)
+    inference = ScheduledInference(
+        inner, base_delay=0.01, max_delay=0.1, max_concurrency=concurrency * len(servers or [inner])
+    )
+
+    results = {}
+    try:
+        for scenario in scenarios or SCENARIOS:
+            runs = [run_scenario(scenario, inference, settings) for _ in range(repeat)]
+            results[scenario] = {
+                stage: statistics.median(run[stage] for run in runs) for stage in runs[0]
+            }
+            stages = ", ".join(
+                f"{stage} {seconds:.3f}s" for stage, seconds in results[scenario].items()
+            )
+            print(colored(f"{scenario}: {stages}", "cyan"))
+    finally:
+        for server in servers:
+            server.stop()
+
+    requests = sum(server.requests for server in servers) if servers else inner.calls
+    print(colored(f"Inference requests: {requests}, retries: {inference.retries}", "cyan"))
+
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    regressions = compare(results, baselines.get(config_key, {}), tolerance)
+    for regression in regressions:
+        print(colored(f"Regression: {regression}", "red"))
+    if config_key not in baselines and not save_baseline:
+        print(colored("No baseline for this configuration; use --save-baseline to store one", "yellow"))
+
+    if save_baseline:
+        baselines[config_key] = results
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(colored(f"Baseline saved to {baseline_path}", "green"))
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .fake import RequestPlanner, fake_response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/api/generate":
+            self._send(404, {"error": "not found"})
+            return
+        request = json.loads(body)
+        prompt = request.get("prompt", "")
+
+        delay, failed = server.planner.plan(prompt)
+        time.sleep(delay)
+        if failed:
+            self._send(503, {"error": "simulated overload"})
+            return
+
+        text = fake_response(
+            prompt, server.response_chars, structured="format" in request, system=request.get("system")
+        )
+        if not request.get("stream", True):
+            self._send(200, {"model": request.get("model"), "response": text, "done": True})
+            return
+
+        # Ollama streams newline-delimited JSON objects, one per generated fragment
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for start in range(0, len(text), server.chunk_chars):
+                piece = {"response": text[start : start + server.chunk_chars], "done": False}
+                self._write_chunk(json.dumps(piece).encode("utf-8") + b"\n")
+            self._write_chunk(json.dumps({"response": "", "done": True}).encode("utf-8") + b"\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early, as streaming callers may
+            pass
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        try:
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request, e.g. a hedged duplicate that lost the race
+            pass
+
+
+class OllamaStubServer:
+    """Local HTTP server speaking the Ollama /api/generate protocol with simulated latency and errors."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        response_chars: int = 200,
+        chunk_chars: int = 16,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        """
+        Initialize the server (call start() to begin serving).
+
+        Args:
+            latency (float): Seconds each request takes before answering
+            jitter (float): Extra random latency of up to this many seconds
+            error_rate (float): Fraction of requests answered with HTTP 503
+            response_chars (int): Approximate length of each generated description
+            chunk_chars (int): Characters per fragment of a streamed response
+            seed (int): Seed for latency jitter and errors
+            port (int): Port to listen on (0 picks a free one)
+        """
+        self.response_chars = response_chars
+        self.chunk_chars = max(1, chunk_chars)
+        self.planner = RequestPlanner(latency, jitter, error_rate, seed)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 256
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as the Ollama host."""
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def requests(self) -> int:
+        """Requests received so far."""
+        return self.planner.requests
+
+    @property
+    def errors(self) -> int:
+        """Requests answered with a simulated failure."""
+        return self.planner.errors
+
+    def start(self) -> "OllamaStubServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="ollama-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
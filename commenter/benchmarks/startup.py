@@ -0,0 +1,128 @@
+"""Startup-time benchmark: how long the CLI takes to start and which modules it loads.
+
+Run with `python -m commenter.benchmarks.startup --help`."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Set
+import click
+from termcolor import colored
+from .run import compare
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing the CLI and the chosen backend, as main() does once the options are parsed
+_LOAD_BACKEND = "import commenter.main; from commenter.inferences.registry import load_backend; load_backend({!r})"
+
+# Scenario -> (child interpreter arguments, modules it must not load)
+SCENARIOS = {
+    "interpreter": (["-c", "pass"], set()),
+    "help": (
+        ["-m", "commenter.main", "--help"],
+        {"anthropic", "openai", "httpx", "commenter.parsers.typescript", "commenter.processing.repository"},
+    ),
+    "ollama": (["-c", _LOAD_BACKEND.format("ollama")], {"anthropic", "openai"}),
+    "claude": (["-c", _LOAD_BACKEND.format("claude")], {"openai"}),
+    "gpt": (["-c", _LOAD_BACKEND.format("gpt")], {"anthropic"}),
+}
+
+
+def _run(arguments: List[str], import_time: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if import_time else []) + arguments
+    return subprocess.run(command, cwd=PACKAGE_ROOT, capture_output=True, text=True)
+
+
+def loaded_modules(arguments: List[str]) -> Set[str]:
+    """
+    List the modules a child interpreter imports, from its `-X importtime` report.
+
+    Args:
+        arguments (List[str]): Interpreter arguments, e.g. ["-m", "commenter.main", "--help"]
+
+    Returns:
+        Set[str]: Names of every module imported
+    """
+    result = _run(arguments, import_time=True)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            if name != "package":
+                modules.add(name)
+    return modules
+
+
+def time_startup(arguments: List[str], repeat: int) -> Optional[float]:
+    """
+    Time a child interpreter from launch to exit.
+
+    Args:
+        arguments (List[str]): Interpreter arguments
+        repeat (int): Runs to take the median of
+
+    Returns:
+        Optional[float]: Median seconds, or None if the child failed (e.g. a missing SDK)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = _run(arguments)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None
+    return statistics.median(timings)
+
+
+@click.command()
+@click.option("--scenario", "scenarios", type=click.Choice(list(SCENARIOS)), multiple=True, help="Scenario to run (default: all)")
+@click.option("--repeat", type=click.IntRange(min=1), default=5, help="Runs per scenario; the median is reported")
+@click.option("--baseline", "baseline_path", default=DEFAULT_BASELINE, help="Baseline JSON file")
+@click.option("--save-baseline", is_flag=True, help="Store this run's results as the baseline for this interpreter")
+@click.option("--tolerance", type=click.FloatRange(min=0), default=0.2, help="Allowed slowdown before a scenario counts as a regression")
+def main(scenarios, repeat: int, baseline_path: str, save_baseline: bool, tolerance: float):
+    """Benchmark CLI startup time and check that unused backends and modules stay unloaded."""
+    results: Dict[str, float] = {}
+    failures = []
+    for scenario in scenarios or SCENARIOS:
+        arguments, forbidden = SCENARIOS[scenario]
+        seconds = time_startup(arguments, repeat)
+        if seconds is None:
+            print(colored(f"{scenario}: failed to start (is its SDK installed?)", "yellow"))
+            continue
+        modules = loaded_modules(arguments)
+        unexpected = sorted(forbidden & modules)
+        if unexpected:
+            failures.append(f"{scenario} imports {', '.join(unexpected)}")
+        results[scenario] = seconds
+        print(colored(f"{scenario}: {seconds * 1000:.0f}ms, {len(modules)} modules", "cyan"))
+
+    # Startup times are only comparable on the same interpreter
+    config_key = f"{platform.python_implementation()} {platform.python_version()}"
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    regressions = compare({"startup": results}, baselines.get(config_key, {}), tolerance)
+    for failure in failures + regressions:
+        print(colored(f"Regression: {failure}", "red"))
+    if config_key not in baselines and not save_baseline:
+        print(colored("No baseline for this interpreter; use --save-baseline to store one", "yellow"))
+
+    if save_baseline:
+        baselines[config_key] = {"startup": results}
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(colored(f"Baseline saved to {baseline_path}", "green"))
+
+    if failures or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
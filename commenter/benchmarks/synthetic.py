@@ -0,0 +1,84 @@
+import os
+import random
+from typing import List
+
+_TEMPLATES = [
+    "export function {name}(value: number, factor: number): number {{\n"
+    "    const scaled = value * factor;\n"
+    "    return Math.round(scaled * 100) / 100;\n"
+    "}}\n",
+    "export async function {name}(url: string): Promise<string> {{\n"
+    "    const response = await fetch(url);\n"
+    "    return response.text();\n"
+    "}}\n",
+    "export const {name} = (items: string[]): string[] => {{\n"
+    "    return items.filter((item) => item.length > 0).map((item) => item.trim());\n"
+    "}};\n",
+    "export interface {name} {{\n"
+    "    id: string;\n"
+    "    createdAt: Date;\n"
+    "    tags: string[];\n"
+    "}}\n",
+    "export type {name} = {{\n"
+    "    status: 'open' | 'closed';\n"
+    "    count: number;\n"
+    "}};\n",
+    "export class {name} {{\n"
+    "    private readonly entries = new Map<string, number>();\n"
+    "\n"
+    "    add(key: string, amount: number): void {{\n"
+    "        this.entries.set(key, (this.entries.get(key) ?? 0) + amount);\n"
+    "    }}\n"
+    "}}\n",
+]
+
+
+def generate_repository(
+    root: str,
+    files: int = 20,
+    elements_per_file: int = 10,
+    depth: int = 2,
+    seed: int = 0,
+) -> List[str]:
+    """
+    Write a synthetic TypeScript repository for benchmarking.
+
+    Files are spread over a directory tree `depth` levels deep (two subdirectories per
+    level). Each file holds a deterministic mix of functions, async functions, arrow
+    functions, interfaces, types and classes.
+
+    Args:
+        root (str): Directory to create the repository in
+        files (int): Number of .ts files
+        elements_per_file (int): Top-level declarations per file
+        depth (int): Levels of nested directories below `root`
+        seed (int): Seed for the element mix
+
+    Returns:
+        List[str]: Paths of the generated files
+    """
+    rng = random.Random(seed)
+    directories = [root]
+    frontier = [root]
+    for level in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for branch in range(2):
+                directory = os.path.join(parent, f"module{level}_{branch}")
+                directories.append(directory)
+                next_frontier.append(directory)
+        frontier = next_frontier
+
+    paths = []
+    for index in range(files):
+        directory = directories[index % len(directories)]
+        os.makedirs(directory, exist_ok=True)
+        blocks = []
+        for element in range(elements_per_file):
+            template = _TEMPLATES[rng.randrange(len(_TEMPLATES))]
+            blocks.append(template.format(name=f"element{index}_{element}"))
+        path = os.path.join(directory, f"file{index}.ts")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(blocks))
+        paths.append(path)
+    return paths
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+def default_cache_dir() -> str:
+    """Return the directory used for on-disk caches ($XDG_CACHE_HOME/commenter)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "commenter")
+
+
+class SQLiteCache:
+    """Persistent key/value store backed by SQLite with LRU eviction and an optional TTL."""
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): Path of the SQLite file
+            max_bytes (int): Total size of stored values before least recently used entries are evicted
+            ttl (Optional[float]): Seconds after which an entry expires, or None to keep entries forever
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        # Triggers keep the total size in one row, so checking the limit on every put is O(1)
+        # even with other processes writing to the same file
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO totals (id, size) "
+                "SELECT 0, COALESCE(SUM(size), 0) FROM entries"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries "
+                "BEGIN UPDATE totals SET size = size + new.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries "
+                "BEGIN UPDATE totals SET size = size - old.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries "
+                "BEGIN UPDATE totals SET size = size - old.size + new.size WHERE id = 0; END"
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a value and mark it as recently used.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[str]: The stored value, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str):
+        """
+        Store a value, evicting least recently used entries when over the size limit.
+
+        Args:
+            key (str): Cache key
+            value (str): Value to store
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: REPLACE deletes without firing triggers
+            self._conn.execute(
+                "INSERT INTO entries (key, value, size, created, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "created = excluded.created, last_used = excluded.last_used",
+                (key, value, size, now, now),
+            )
+            self._evict()
+
+    def delete(self, key: str):
+        """
+        Remove an entry if present.
+
+        Args:
+            key (str): Cache key
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        total = self._total_size()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current entry count and size."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_size()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": size}
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
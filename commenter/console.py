@@ -0,0 +1,21 @@
+from termcolor import colored
+
+_quiet = False
+
+
+def set_quiet(quiet: bool):
+    """Turn per-element progress messages off (True) or on (False)."""
+    global _quiet
+    _quiet = quiet
+
+
+def detail(message: str, color: str = None):
+    """
+    Print a per-element progress message unless quiet mode is on.
+
+    Args:
+        message (str): Text to print
+        color (str): termcolor color name, or None for plain text
+    """
+    if not _quiet:
+        print(colored(message, color) if color else message)
@@ -1,9 +1,268 @@
 from datetime import datetime
+import hashlib
+import json
 import random
+import re
 import string
 from typing import Dict, List, Optional
 import xml.etree.ElementTree as ET
-from termcolor import colored
+from ..console import detail
+
+
+_HASH_PATTERN = re.compile(r"@generated\s+\w+\s+v\d+\.\d+\s+hash:([0-9a-f]+)")
+_BLOCK_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+_ELEMENT_SCHEMA = """        <element>
+            <name>element_name</name>
+            <description>Brief description of what this element does.</description>
+            <type>element_type (e.g., function, class, interface, type, etc.)</type>
+            <isAsync>true/false (only if applicable)</isAsync>
+            <parameters>
+                <!-- Do not include if there are no parameters in the context explicitly listed -->
+                <param>
+                    <name>param_name</name>
+                    <type>param_type</type>
+                    <description>Detailed description of the parameter.</description>
+                </param>
+                ...
+            </parameters>
+            <returns>
+                <type>return_type</type>
+                <description>Detailed description of the return value.</description>
+            </returns>
+        </element>"""
+
+_RETURN_TYPE_RULES = """        IMPORTANT: For functions, always include the <returns> section with a specific return type. If the function's return type is not explicitly declared or is marked as 'any', please infer the actual return type by analyzing the function body:
+        
+        - For validation functions (names starting with 'is', 'has', 'valid', etc.), use 'boolean'
+        - For string processing functions, use 'string'
+        - For calculation functions, use 'number'
+        - For functions that collect or filter items, use 'Array<type>' or 'type[]'
+        - For functions that construct objects, use the specific type or 'object'
+        
+        Never use 'any' as a return type in your response - always try to infer a more specific type."""
+
+_DESCRIPTION_RULES = """        Writing the description:
+
+        - Start with a verb in the third person ("Calculates", "Stores", "Represents") and describe what the element does or represents, not how it is implemented line by line.
+        - Keep it to one or two sentences. Mention side effects (network calls, writes to storage, mutation of arguments or shared state) and the errors it throws, if any.
+        - Do not repeat the element's name or its parameter list in the description, and do not speculate about callers or about code that is not shown.
+        - For classes and interfaces, say what the type models and what it is used for; for type aliases, say what values the type admits.
+
+        Parameters:
+
+        - List exactly the parameters named in the "Parameters" line of the context, in that order and with the names given there. Never invent parameters, and leave parameters out entirely when the context lists none.
+        - Use the declared type of each parameter as written in the code. If a parameter has no declared type, infer the most specific type you can from how it is used.
+        - Describe what each parameter means for the caller, including its unit or allowed values when the code makes them clear (e.g. "Percentage from 0 to 100").
+
+        Element types:
+
+        - Use one of: function, method, class, interface, type, enum, variable. Arrow functions and function expressions assigned to a variable are functions.
+        - Only report isAsync for functions and methods; it is true when the element is declared async or returns a Promise that it awaits."""
+
+# Worked examples shown in every system prompt, rendered as XML or JSON by the helpers below
+_EXAMPLES = [
+    {
+        "context": "File: pricing.ts\nElement: applyDiscount\nType: function\nReturn Type: number\n"
+        "Is Async: False\nParameters: price: number, percent: number",
+        "code": "export function applyDiscount(price: number, percent: number): number {\n"
+        "  if (percent < 0 || percent > 100) throw new RangeError('percent out of range');\n"
+        "  return price * (1 - percent / 100);\n}",
+        "answer": {
+            "name": "applyDiscount",
+            "description": "Reduces a price by a percentage discount. Throws a RangeError when the percentage is outside 0-100.",
+            "type": "function",
+            "isAsync": False,
+            "parameters": [
+                {"name": "price", "type": "number", "description": "Original price before the discount."},
+                {"name": "percent", "type": "number", "description": "Discount as a percentage from 0 to 100."},
+            ],
+            "returns": {"type": "number", "description": "The discounted price."},
+        },
+    },
+    {
+        "context": "File: users.ts\nElement: fetchUser\nType: function\nReturn Type: any\n"
+        "Is Async: True\nParameters: id: string",
+        "code": "export async function fetchUser(id: string) {\n"
+        "  const response = await fetch(`/api/users/${id}`);\n"
+        "  if (!response.ok) return null;\n  return (await response.json()) as User;\n}",
+        "answer": {
+            "name": "fetchUser",
+            "description": "Loads a user from the users API. Resolves to null when the request fails.",
+            "type": "function",
+            "isAsync": True,
+            "parameters": [
+                {"name": "id", "type": "string", "description": "Identifier of the user to load."},
+            ],
+            "returns": {"type": "Promise<User | null>", "description": "The user, or null if it could not be loaded."},
+        },
+    },
+    {
+        "context": "File: limiter.ts\nElement: RateLimiter\nType: class\nReturn Type: unknown\n"
+        "Is Async: False\nParameters: ",
+        "code": "export class RateLimiter {\n  private used = 0;\n"
+        "  constructor(private readonly limit: number) {}\n"
+        "  tryAcquire(): boolean {\n    if (this.used >= this.limit) return false;\n"
+        "    this.used += 1;\n    return true;\n  }\n}",
+        "answer": {
+            "name": "RateLimiter",
+            "description": "Hands out a fixed number of permits and refuses further requests once they are used up.",
+            "type": "class",
+        },
+    },
+    {
+        "context": "File: cart.ts\nElement: CartItem\nType: interface\nReturn Type: unknown\n"
+        "Is Async: False\nParameters: ",
+        "code": "export interface CartItem {\n  sku: string;\n  quantity: number;\n  unitPrice: number;\n}",
+        "answer": {
+            "name": "CartItem",
+            "description": "Represents one product line in a shopping cart, with its quantity and unit price.",
+            "type": "interface",
+        },
+    },
+]
+
+
+def _element_section(code: str, context: Optional[str]) -> str:
+    """The element-specific end of a prompt: its context and code."""
+    return f"""        Context:
+        {context if context else 'No additional context provided'}
+
+        Code:
+        {code}"""
+
+
+def _xml_answer(answer: dict, index: Optional[int] = None) -> str:
+    """Render an example answer in the XML response format."""
+    opening = f'<element index="{index}">' if index is not None else "<element>"
+    lines = [
+        f"        {opening}",
+        f"            <name>{answer['name']}</name>",
+        f"            <description>{answer['description']}</description>",
+        f"            <type>{answer['type']}</type>",
+    ]
+    if "isAsync" in answer:
+        lines.append(f"            <isAsync>{str(answer['isAsync']).lower()}</isAsync>")
+    if answer.get("parameters"):
+        lines.append("            <parameters>")
+        for param in answer["parameters"]:
+            lines.extend(
+                [
+                    "                <param>",
+                    f"                    <name>{param['name']}</name>",
+                    f"                    <type>{param['type']}</type>",
+                    f"                    <description>{param['description']}</description>",
+                    "                </param>",
+                ]
+            )
+        lines.append("            </parameters>")
+    if "returns" in answer:
+        lines.extend(
+            [
+                "            <returns>",
+                f"                <type>{answer['returns']['type']}</type>",
+                f"                <description>{answer['returns']['description']}</description>",
+                "            </returns>",
+            ]
+        )
+    lines.append("        </element>")
+    return "\n".join(lines)
+
+
+def _example_sections(render) -> str:
+    """Show every example's input and its expected answer as rendered by `render`."""
+    return "\n\n".join(
+        f"        Example {number}:\n\n{_element_section(example['code'], example['context'])}\n\n"
+        f"        Answer:\n{render(example['answer'])}"
+        for number, example in enumerate(_EXAMPLES, start=1)
+    )
+
+
+# Fixed instructions go into the system message and the element into the user message, so
+# every request of a run starts with the same tokens and providers can reuse the cached prefix.
+# Anthropic and OpenAI only cache prefixes of at least 1024 tokens, which the rules and worked
+# examples below are sized to clear; keep them above that when editing.
+_SYSTEM_PROMPT = f"""Analyze the TypeScript element you are given and generate a structured XML response with the following format:
+        
+{_ELEMENT_SCHEMA}
+
+{_RETURN_TYPE_RULES}
+
+{_DESCRIPTION_RULES}
+
+{_example_sections(_xml_answer)}
+
+        Please return only the XML response without any additional formatting or explanations."""
+
+_STRUCTURED_SYSTEM_PROMPT = f"""Analyze the TypeScript element you are given and describe it as a JSON object with these fields:
+
+        name: the element's name
+        description: brief description of what this element does
+        type: element type (e.g., function, class, interface, type, etc.)
+        isAsync: whether it is async (only if applicable)
+        parameters: one {{"name", "type", "description"}} object per parameter explicitly listed in the context; omit if there are none
+        returns: {{"type", "description"}} of the return value
+
+{_RETURN_TYPE_RULES}
+
+{_DESCRIPTION_RULES}
+
+{_example_sections(lambda answer: "        " + json.dumps(answer))}
+
+        Please return only the JSON object without any additional formatting or explanations."""
+
+_BATCH_SYSTEM_PROMPT = f"""Analyze each of the TypeScript elements you are given and generate one structured XML block per element, in the same order, each with the following format:
+
+{_ELEMENT_SCHEMA}
+
+        Put the element's number in an index attribute on each block, e.g. <element index="1">, and wrap all blocks in a single <elements> root.
+
+{_RETURN_TYPE_RULES}
+
+{_DESCRIPTION_RULES}
+
+        Examples of single blocks (in a batch, each block also carries its index attribute):
+
+{_example_sections(_xml_answer)}
+
+        Please return only the XML response without any additional formatting or explanations."""
+
+_STRUCTURED_FIELDS = {
+    "name": {"type": "string"},
+    "description": {"type": "string"},
+    "type": {"type": "string"},
+    "isAsync": {"type": "boolean"},
+    "parameters": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "type": {"type": "string"},
+                "description": {"type": "string"},
+            },
+            "required": ["name", "type", "description"],
+        },
+    },
+    "returns": {
+        "type": "object",
+        "properties": {"type": {"type": "string"}, "description": {"type": "string"}},
+        "required": ["type", "description"],
+    },
+}
+
+_JSON_STRING_FIELD_PATTERNS = {
+    field: re.compile(rf'"{field}"\s*:\s*"((?:[^"\\]|\\.)*)"')
+    for field in ("name", "description", "type")
+}
+_JSON_ASYNC_PATTERN = re.compile(r'"isAsync"\s*:\s*(true|false)')
+_JSON_RETURNS_PATTERN = re.compile(r'"returns"\s*:\s*(\{[^{}]*\}?)')
+_JSON_PARAMETERS_PATTERN = re.compile(r'"parameters"\s*:\s*\[([^\[\]]*)\]?')
+_JSON_FLAT_OBJECT_PATTERN = re.compile(r"\{[^{}]*\}?")
+
+_BATCH_BLOCK_PATTERN = re.compile(r"<element\b([^>]*)>.*?</element>", re.DOTALL)
+_INDEX_ATTRIBUTE_PATTERN = re.compile(r"index\s*=\s*[\"']?(\d+)")
+_NAME_PATTERN = re.compile(r"<name>(.*?)</name>", re.DOTALL)
 
 
 class CommentFormatter:
@@ -27,6 +286,34 @@ class CommentFormatter:
         """Get current date in yyyy-MM-dd HH:mm:ss format."""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    @staticmethod
+    def code_hash(code: str) -> str:
+        """
+        Hash an element's code so that whitespace-only edits do not count as changes.
+
+        Comments this tool generated inside the element (e.g. on a class's methods) are left
+        out, so commenting or re-commenting nested members does not change the hash.
+
+        Args:
+            code (str): The element's source code
+
+        Returns:
+            str: 12-character hex digest of the normalized code
+        """
+        code = _BLOCK_COMMENT_PATTERN.sub(
+            lambda match: "" if "@generated" in match.group(0) else match.group(0), code
+        )
+        normalized = "\n".join(line.strip() for line in code.splitlines() if line.strip())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:12]
+
+    @staticmethod
+    def extract_code_hash(comment: Optional[str]) -> Optional[str]:
+        """Return the code hash recorded in a comment's @generated line, if any."""
+        if not comment:
+            return None
+        match = _HASH_PATTERN.search(comment)
+        return match.group(1) if match else None
+
     def _parse_inference_output(self, inference_output: str) -> Dict:
         """
         Parse the AI inference XML output into structured components.
@@ -90,7 +377,7 @@ class CommentFormatter:
                 }
 
         except ET.ParseError as e:
-            print(f"XML Parsing Error: {e}")
+            detail(f"XML Parsing Error: {e}")
 
         return result
 
@@ -99,6 +386,7 @@ class CommentFormatter:
         inference_output: str,
         previous_comment: Optional[str] = None,
         metadata: dict = None,
+        code_hash: Optional[str] = None,
     ) -> str:
         """
         Format the inference output into a TypeScript comment with metadata, maintaining versioning.
@@ -107,24 +395,43 @@ class CommentFormatter:
             inference_output (str): Raw output from the inference service
             previous_comment (Optional[str]): The previous comment for version tracking
             metadata (dict): Metadata about the TypeScript element
+            code_hash (Optional[str]): Hash of the element's code (see code_hash) to record
 
         Returns:
             str: Formatted TypeScript comment
         """
         parsed = self._parse_inference_output(inference_output)
         if parsed["description"] == "":
-            print(parsed)
-            print(inference_output)
-            print(colored(f"Could not parse, will not format, trying again", "red"))
+            detail(str(parsed))
+            detail(inference_output)
+            detail(f"Could not parse, will not format, trying again", "red")
             return "None"
+        return self.render_comment(parsed, previous_comment, metadata, code_hash)
+
+    def render_comment(
+        self,
+        parsed: Dict,
+        previous_comment: Optional[str] = None,
+        metadata: dict = None,
+        code_hash: Optional[str] = None,
+    ) -> str:
+        """
+        Lay out already parsed element details as a TypeScript comment with metadata.
+
+        Args:
+            parsed (Dict): Element details with name, description, parameters and returns
+            previous_comment (Optional[str]): The previous comment for version tracking
+            metadata (dict): Metadata about the TypeScript element
+            code_hash (Optional[str]): Hash of the element's code (see code_hash) to record
 
+        Returns:
+            str: Formatted TypeScript comment
+        """
         # Extract previous slug and version if available
         slug = None
         space = False
         version = "v1.0"
         if previous_comment:
-            import re
-
             # Extract slug
             slug_match = re.search(r"@generated\s+(\w+)\s+v\d+\.\d+", previous_comment)
             if slug_match:
@@ -173,16 +480,27 @@ class CommentFormatter:
             if space: comment_lines.append(" *")
 
         # Add metadata with versioning
+        hash_part = f" hash:{code_hash}" if code_hash else ""
         comment_lines.append(
-            f" * @generated {slug} {version} Generated on: {self._format_date()} by {self.model_name}"
+            f" * @generated {slug} {version}{hash_part} Generated on: {self._format_date()} by {self.model_name}"
         )
         comment_lines.append(" */")
 
         return "\n".join(comment_lines)
 
+    @staticmethod
+    def system_prompt() -> str:
+        """
+        Instructions for create_prompt, to send as the system message.
+
+        Returns:
+            str: The fixed instructions asking for an XML element description
+        """
+        return _SYSTEM_PROMPT
+
     def create_prompt(self, code: str, context: Optional[str] = None) -> str:
         """
-        Create a standardized prompt for inference services using XML format.
+        Create the per-element part of an XML-format prompt (see system_prompt).
 
         Args:
             code (str): The TypeScript code to analyze
@@ -191,37 +509,78 @@ class CommentFormatter:
         Returns:
             str: Formatted prompt
         """
-        return f"""Analyze the following TypeScript element and generate a structured XML response with the following format:
-        
-        <element>
-            <name>element_name</name>
-            <description>Brief description of what this element does.</description>
-            <type>element_type (e.g., function, class, interface, type, etc.)</type>
-            <isAsync>true/false (only if applicable)</isAsync>
-            <parameters>
-                <!-- Do not include if there are no parameters in the context explicitly listed -->
-                <param>
-                    <name>param_name</name>
-                    <type>param_type</type>
-                    <description>Detailed description of the parameter.</description>
-                </param>
-                ...
-            </parameters>
-            <returns>
-                <type>return_type</type>
-                <description>Detailed description of the return value.</description>
-            </returns>
-        </element>
+        return _element_section(code, context)
 
-        IMPORTANT: For functions, always include the <returns> section with a specific return type. If the function's return type is not explicitly declared or is marked as 'any', please infer the actual return type by analyzing the function body:
-        
-        - For validation functions (names starting with 'is', 'has', 'valid', etc.), use 'boolean'
-        - For string processing functions, use 'string'
-        - For calculation functions, use 'number'
-        - For functions that collect or filter items, use 'Array<type>' or 'type[]'
-        - For functions that construct objects, use the specific type or 'object'
-        
-        Never use 'any' as a return type in your response - always try to infer a more specific type.
+    @staticmethod
+    def element_schema(fields: Optional[List[str]] = None) -> dict:
+        """
+        JSON schema of a structured element description.
+
+        Args:
+            fields (Optional[List[str]]): Only ask for these fields (all of them if None)
+
+        Returns:
+            dict: The JSON schema
+        """
+        if fields is None:
+            fields = list(_STRUCTURED_FIELDS)
+            required = ["name", "description", "type"]
+        else:
+            required = list(fields)
+        return {
+            "type": "object",
+            "properties": {field: _STRUCTURED_FIELDS[field] for field in fields},
+            "required": required,
+        }
+
+    @staticmethod
+    def structured_system_prompt() -> str:
+        """
+        Instructions for create_structured_prompt, to send as the system message.
+
+        Returns:
+            str: The fixed instructions asking for a JSON element description
+        """
+        return _STRUCTURED_SYSTEM_PROMPT
+
+    def create_structured_prompt(self, code: str, context: Optional[str] = None) -> str:
+        """
+        Create the per-element part of a JSON-format prompt (see structured_system_prompt and element_schema).
+
+        Args:
+            code (str): The TypeScript code to analyze
+            context (Optional[str]): Additional context about the code
+
+        Returns:
+            str: Formatted prompt
+        """
+        return _element_section(code, context)
+
+    def create_fields_prompt(
+        self, code: str, context: Optional[str], fields: List[str], partial: Dict
+    ) -> str:
+        """
+        Create a prompt asking only for the fields missing from an earlier structured answer.
+
+        Args:
+            code (str): The TypeScript code to analyze
+            context (Optional[str]): Additional context about the code
+            fields (List[str]): Fields still needed (keys of element_schema)
+            partial (Dict): What is already known about the element
+
+        Returns:
+            str: Formatted prompt
+        """
+        known = {
+            key: value
+            for key, value in partial.items()
+            if key not in fields and value not in ("", [], {})
+        }
+        return f"""The following TypeScript element has been partly described as:
+
+        {json.dumps(known)}
+
+        Complete the description with a JSON object containing only these fields: {", ".join(fields)}.
 
         Context:
         {context if context else 'No additional context provided'}
@@ -229,4 +588,191 @@ class CommentFormatter:
         Code:
         {code}
 
-        Please return only the XML response without any additional formatting or explanations."""
\ No newline at end of file
+        Please return only the JSON object without any additional formatting or explanations."""
+
+    @staticmethod
+    def parse_structured_output(inference_output: str) -> Dict:
+        """
+        Parse a JSON element description, recovering what it can from truncated or invalid JSON.
+
+        Args:
+            inference_output (str): JSON text from the inference service
+
+        Returns:
+            Dict: Same shape as the XML parser's result; fields that could not be read
+                are empty
+        """
+        result = {"name": "", "description": "", "parameters": [], "returns": {}}
+        start = inference_output.find("{")
+        if start == -1:
+            return result
+        text = inference_output[start:]
+
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text)
+        except ValueError:
+            data = _recover_json_fields(text)
+        if not isinstance(data, dict):
+            return result
+
+        for field in ("name", "description", "type"):
+            if isinstance(data.get(field), str):
+                result[field] = data[field].strip()
+        if isinstance(data.get("isAsync"), bool):
+            result["isAsync"] = data["isAsync"]
+        for param in data.get("parameters") or []:
+            if isinstance(param, dict) and param.get("name"):
+                result["parameters"].append(
+                    {key: str(param.get(key, "")).strip() for key in ("name", "type", "description")}
+                )
+        returns = data.get("returns")
+        if isinstance(returns, dict):
+            result["returns"] = {
+                key: str(returns[key]).strip() for key in ("type", "description") if key in returns
+            }
+        return result
+
+    @staticmethod
+    def missing_fields(parsed: Dict, metadata: Optional[dict] = None) -> List[str]:
+        """
+        List the fields a parsed description still needs before it can be rendered.
+
+        Args:
+            parsed (Dict): Result of parse_structured_output
+            metadata (Optional[dict]): Metadata about the TypeScript element
+
+        Returns:
+            List[str]: Missing fields, in element_schema order
+        """
+        metadata = metadata or {}
+        missing = []
+        if not parsed.get("description"):
+            missing.append("description")
+        expected_params = len(metadata.get("params", []))
+        params = parsed.get("parameters", [])
+        if len(params) < expected_params or any(not p.get("description") for p in params):
+            missing.append("parameters")
+        if (
+            metadata.get("type") == "function"
+            and metadata.get("returnType") != "void"
+            and not parsed.get("returns", {}).get("type")
+        ):
+            missing.append("returns")
+        return missing
+
+    @staticmethod
+    def batch_system_prompt() -> str:
+        """
+        Instructions for create_batch_prompt, to send as the system message.
+
+        Returns:
+            str: The fixed instructions asking for one indexed <element> block per element
+        """
+        return _BATCH_SYSTEM_PROMPT
+
+    def create_batch_prompt(self, items: List[Dict[str, str]]) -> str:
+        """
+        Create the per-batch part of a prompt covering several elements (see batch_system_prompt).
+
+        Args:
+            items (List[Dict[str, str]]): Elements to describe, each with "code" and optional "context"
+
+        Returns:
+            str: Formatted prompt listing the numbered elements
+        """
+        sections = "\n\n".join(
+            f"""        Element {index}:
+{_element_section(item["code"], item.get("context"))}"""
+            for index, item in enumerate(items, start=1)
+        )
+        return f"""Describe these {len(items)} elements:
+
+{sections}"""
+
+    @staticmethod
+    def split_batch_output(inference_output: str, names: List[str]) -> Dict[int, str]:
+        """
+        Map the <element> blocks of a batched response back to the elements they describe.
+
+        Blocks are matched by their index attribute, then by <name>, then by position.
+
+        Args:
+            inference_output (str): Raw output from the inference service
+            names (List[str]): Element names in prompt order
+
+        Returns:
+            Dict[int, str]: 0-based element position -> that element's XML block; elements
+                without a block are missing from the result
+        """
+        blocks = [
+            (match.group(0), match.group(1))
+            for match in _BATCH_BLOCK_PATTERN.finditer(inference_output)
+        ]
+        assigned = {}
+        unmatched = []
+        for ordinal, (block, attributes) in enumerate(blocks):
+            index_match = _INDEX_ATTRIBUTE_PATTERN.search(attributes)
+            if index_match:
+                position = int(index_match.group(1)) - 1
+                if 0 <= position < len(names) and position not in assigned:
+                    assigned[position] = block
+                    continue
+            unmatched.append((ordinal, block))
+
+        remaining = []
+        for ordinal, block in unmatched:
+            name_match = _NAME_PATTERN.search(block)
+            name = name_match.group(1).strip() if name_match else None
+            candidates = [
+                position
+                for position, element_name in enumerate(names)
+                if element_name == name and position not in assigned
+            ]
+            if candidates:
+                assigned[candidates[0]] = block
+            else:
+                remaining.append((ordinal, block))
+
+        # Last resort: the n-th block of the response describes the n-th element
+        for ordinal, block in remaining:
+            if ordinal < len(names) and ordinal not in assigned:
+                assigned[ordinal] = block
+        return assigned
+
+
+def _recover_json_fields(text: str) -> Dict:
+    """Pull whichever fields are complete out of truncated or otherwise invalid JSON."""
+    data = {}
+    remainder = text
+
+    parameters_match = _JSON_PARAMETERS_PATTERN.search(remainder)
+    if parameters_match:
+        params = []
+        for match in _JSON_FLAT_OBJECT_PATTERN.finditer(parameters_match.group(1)):
+            try:
+                params.append(json.loads(match.group(0)))
+            except ValueError:
+                break
+        data["parameters"] = params
+        remainder = remainder[: parameters_match.start()] + remainder[parameters_match.end():]
+
+    returns_match = _JSON_RETURNS_PATTERN.search(remainder)
+    if returns_match:
+        try:
+            data["returns"] = json.loads(returns_match.group(1))
+        except ValueError:
+            pass
+        remainder = remainder[: returns_match.start()] + remainder[returns_match.end():]
+
+    # Nested objects are cut out above so these only see top-level fields
+    for field, pattern in _JSON_STRING_FIELD_PATTERNS.items():
+        match = pattern.search(remainder)
+        if match:
+            try:
+                data[field] = json.loads(f'"{match.group(1)}"')
+            except ValueError:
+                pass
+    async_match = _JSON_ASYNC_PATTERN.search(remainder)
+    if async_match:
+        data["isAsync"] = async_match.group(1) == "true"
+    return data
@@ -1,7 +1,10 @@
 from datetime import datetime
 import random
+import re
 import string
-from typing import Dict
+from typing import Dict, Optional
+
+_FOLDER_HEADING = re.compile(r"^### (.+)$", re.MULTILINE)
 
 
 class ReadmeFormatter:
@@ -67,3 +70,52 @@ class ReadmeFormatter:
         ]
 
         return "\n\n".join(sections)
+
+    @staticmethod
+    def parse_overview(content: str) -> Optional[str]:
+        """
+        Read the summary back out of a README written by format_readme.
+
+        Args:
+            content (str): README content
+
+        Returns:
+            Optional[str]: The text of the Overview section, or None if it has none
+        """
+        start = content.find("## Overview")
+        if start == -1:
+            return None
+        start += len("## Overview")
+        end = content.find("## Project Structure", start)
+        overview = content[start:end if end != -1 else len(content)].strip()
+        return overview or None
+
+    @staticmethod
+    def parse_folder_summaries(content: str) -> Dict[str, str]:
+        """
+        Read the per-folder summaries back out of a README written by format_readme.
+
+        Args:
+            content (str): README content
+
+        Returns:
+            Dict[str, str]: Folder -> summary, in the order they appear
+        """
+        structure = content.find("## Project Structure")
+        if structure == -1:
+            return {}
+        # The folder sections follow the fenced tree output and end at the footer rule
+        fence = content.find("```", structure)
+        fence = content.find("```", fence + 3) if fence != -1 else -1
+        if fence == -1:
+            return {}
+        end = content.rfind("\n---\n")
+        sections = content[fence + 3:end if end > fence else len(content)]
+        headings = list(_FOLDER_HEADING.finditer(sections))
+        summaries = {}
+        for index, heading in enumerate(headings):
+            stop = headings[index + 1].start() if index + 1 < len(headings) else len(sections)
+            summary = sections[heading.end():stop].strip()
+            if summary:
+                summaries[heading.group(1).strip()] = summary
+        return summaries
@@ -0,0 +1,115 @@
+import re
+
+CONTINUE = "continue"
+COMPLETE = "complete"
+MALFORMED = "malformed"
+
+_ALLOWED_TAGS = {"element", "name", "description", "type", "isAsync", "parameters", "param", "returns"}
+# Tags whose content is free text; only their own closing tag ends them
+_TEXT_TAGS = {"name", "description", "type", "isAsync"}
+_PREAMBLE_PATTERN = re.compile(r"\s*(?:```(?:xml)?\s*)?(?:<\?xml[^>]*\?>\s*)?")
+# Beginnings of output that may still turn into a valid preamble or root tag
+_PREAMBLE_PREFIXES = ("<element", "<?xml", "xml")
+_TAG_PATTERN = re.compile(r"<(/?)([A-Za-z][\w-]*)([^<>]*?)(/?)>")
+
+
+class ElementStreamParser:
+    """
+    Incrementally checks a streamed <element> response so generation can stop as soon as
+    the element is complete or the output is clearly not going to parse.
+    """
+
+    def __init__(self, max_chars: int = 16384):
+        """
+        Initialize the parser.
+
+        Args:
+            max_chars (int): Output length after which an unfinished element counts as malformed
+        """
+        self.max_chars = max_chars
+        self.state = CONTINUE
+        self._buffer = ""
+        self._position = None  # None until the root <element tag has been seen
+        self._start = 0  # Where the root element begins, after any fence or XML declaration
+        self._stack = []
+
+    @property
+    def text(self) -> str:
+        """The output from the root element on, without a leading fence or XML declaration, up to its end once complete."""
+        return self._buffer[self._start:]
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a streamed chunk and re-check the output.
+
+        Args:
+            chunk (str): Next piece of model output
+
+        Returns:
+            str: "continue" while more output is needed, "complete" once the root element
+                has closed, or "malformed" when the output cannot become a valid element
+        """
+        if self.state != CONTINUE:
+            return self.state
+        self._buffer += chunk
+        self.state = self._scan()
+        if self.state == CONTINUE and len(self._buffer) > self.max_chars:
+            self.state = MALFORMED
+        return self.state
+
+    def _scan(self) -> str:
+        buffer = self._buffer
+        if self._position is None:
+            preamble = _PREAMBLE_PATTERN.match(buffer)
+            start = preamble.end()
+            rest = buffer[start:]
+            if not rest.startswith("<element"):
+                # The root tag, the fence's language or an XML declaration may still be arriving
+                if any(prefix.startswith(rest) for prefix in _PREAMBLE_PREFIXES):
+                    return CONTINUE
+                if rest.startswith("<?") and "?>" not in rest:
+                    return CONTINUE
+                return MALFORMED
+            self._position = self._start = start
+
+        while True:
+            if self._stack and self._stack[-1] in _TEXT_TAGS:
+                closing = f"</{self._stack[-1]}>"
+                end = buffer.find(closing, self._position)
+                if end == -1:
+                    return CONTINUE
+                self._stack.pop()
+                self._position = end + len(closing)
+                continue
+
+            start = buffer.find("<", self._position)
+            if start == -1:
+                return CONTINUE
+            if buffer.startswith("<!--", start):
+                end = buffer.find("-->", start)
+                if end == -1:
+                    return CONTINUE
+                self._position = end + 3
+                continue
+            end = buffer.find(">", start)
+            if end == -1:
+                return CONTINUE
+            match = _TAG_PATTERN.fullmatch(buffer, start, end + 1)
+            if match is None:
+                return MALFORMED
+            closing, tag, _, self_closing = match.groups()
+            if tag not in _ALLOWED_TAGS:
+                return MALFORMED
+            self._position = end + 1
+            if self_closing:
+                continue
+            if closing:
+                if not self._stack or self._stack.pop() != tag:
+                    return MALFORMED
+                if not self._stack:
+                    self._buffer = buffer[: self._position]
+                    return COMPLETE
+            else:
+                if not self._stack and tag != "element":
+                    return MALFORMED
+                self._stack.append(tag)
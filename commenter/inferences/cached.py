@@ -0,0 +1,132 @@
+import hashlib
+import json
+from typing import AsyncIterator, Iterator, Optional
+from ..cache import SQLiteCache
+from ..metrics import get_metrics
+from ..models.base import InferenceBase, WrappedInference
+
+
+class CachedInference(WrappedInference):
+    """Wraps any backend with a persistent response cache."""
+
+    def __init__(self, inner: InferenceBase, cache: SQLiteCache):
+        """
+        Initialize the cache wrapper.
+
+        Args:
+            inner (InferenceBase): Backend that answers cache misses
+            cache (SQLiteCache): Store for responses (its TTL and size limit apply)
+        """
+        self.inner = inner
+        self.cache = cache
+        self._identity = json.dumps(inner.cache_identity(), sort_keys=True)
+
+    def _key(
+        self, prompt: str, schema: Optional[dict] = None, system: Optional[str] = None, partial: bool = False
+    ) -> str:
+        digest = hashlib.sha256()
+        digest.update(self._identity.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        if schema is not None:
+            digest.update(b"\0")
+            digest.update(json.dumps(schema, sort_keys=True).encode("utf-8"))
+        if system:
+            digest.update(b"\0system\0")
+            digest.update(system.encode("utf-8"))
+        # A stream the caller stopped early is kept apart, so generate() never returns it as complete
+        return f"llm-partial:{digest.hexdigest()}" if partial else f"llm:{digest.hexdigest()}"
+
+    def reject(self, prompt: str, schema: Optional[dict] = None, system: Optional[str] = None):
+        self.cache.delete(self._key(prompt, schema, system))
+        if schema is None:
+            self.cache.delete(self._key(prompt, system=system, partial=True))
+        self.inner.reject(prompt, schema, system)
+
+    def _cached_stream(self, prompt: str, system: Optional[str]) -> Optional[str]:
+        """A complete response, or else the prefix a stream consumer stopped at before."""
+        cached = self.cache.get(self._key(prompt, system=system))
+        if cached is None:
+            cached = self.cache.get(self._key(prompt, system=system, partial=True))
+        get_metrics().record_cache("llm", cached is not None)
+        return cached
+
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        key = self._key(prompt, system=system)
+        cached = self.cache.get(key)
+        get_metrics().record_cache("llm", cached is not None)
+        if cached is not None:
+            return cached
+        response = self.inner.generate(prompt, system)
+        self.cache.put(key, response)
+        return response
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        key = self._key(prompt, system=system)
+        cached = self.cache.get(key)
+        get_metrics().record_cache("llm", cached is not None)
+        if cached is not None:
+            return cached
+        response = await self.inner.agenerate(prompt, system)
+        self.cache.put(key, response)
+        return response
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        key = self._key(prompt, schema, system)
+        cached = self.cache.get(key)
+        get_metrics().record_cache("llm", cached is not None)
+        if cached is not None:
+            return cached
+        response = self.inner.generate_structured(prompt, schema, system)
+        self.cache.put(key, response)
+        return response
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        key = self._key(prompt, schema, system)
+        cached = self.cache.get(key)
+        get_metrics().record_cache("llm", cached is not None)
+        if cached is not None:
+            return cached
+        response = await self.inner.agenerate_structured(prompt, schema, system)
+        self.cache.put(key, response)
+        return response
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        cached = self._cached_stream(prompt, system)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        try:
+            for chunk in self.inner.stream(prompt, system):
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # The consumer stopped early because it had what it needed; keep that much for
+            # later streams only, under the partial key
+            if chunks:
+                self.cache.put(self._key(prompt, system=system, partial=True), "".join(chunks))
+            raise
+        self.cache.put(self._key(prompt, system=system), "".join(chunks))
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        cached = self._cached_stream(prompt, system)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        try:
+            async for chunk in self.inner.astream(prompt, system):
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            if chunks:
+                self.cache.put(self._key(prompt, system=system, partial=True), "".join(chunks))
+            raise
+        self.cache.put(self._key(prompt, system=system), "".join(chunks))
+
+    def stats(self) -> dict:
+        """Return the cache's hit/miss counters and size."""
+        return self.cache.stats()
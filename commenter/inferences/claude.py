@@ -1,25 +1,174 @@
-from typing import Optional
+import json
+from typing import AsyncIterator, Iterator, Optional
 import anthropic
-from ..models.base import InferenceBase
+from ..models.base import InferenceBase, header_number
+from .transport import ConnectionPoolMixin, raise_transient
 
+_TOOL_NAME = "structured_output"
 
-class ClaudeInference(InferenceBase):
+
+class ClaudeInference(ConnectionPoolMixin, InferenceBase):
     """Claude API implementation for code commenting."""
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-opus-20240229",
+        max_tokens: int = 1000,
+        pool_size: int = 10,
+        timeout: Optional[float] = 120.0,
+        max_retries: int = 2,
+        context_window: int = 200000,
+    ):
         """
         Initialize Claude client.
 
         Args:
             api_key (str): Anthropic API key
+            model (str): Model to use
+            max_tokens (int): Maximum number of tokens to generate per request
+            pool_size (int): Maximum number of pooled keep-alive connections
+            timeout (Optional[float]): Request timeout in seconds, or None for no limit
+            max_retries (int): Retries done by the SDK itself (0 when a scheduler handles them)
+            context_window (int): Context window of the model in tokens
         """
-        self.client = anthropic.Client(api_key=api_key)
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._context_window = context_window
+        self.client = anthropic.Anthropic(
+            api_key=api_key,
+            timeout=timeout,
+            max_retries=max_retries,
+            http_client=anthropic.DefaultHttpxClient(limits=self._limits()),
+        )
+        self._async_client = None
+
+    def context_window(self) -> int:
+        return self._context_window
+
+    def cache_identity(self) -> dict:
+        return {"backend": "claude", "model": self.model, "max_tokens": self.max_tokens}
+
+    def _request(self, prompt: str, system: Optional[str] = None) -> dict:
+        request = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if system:
+            # Mark the shared instructions as a cache breakpoint: later requests with the same
+            # prefix read it from the prompt cache instead of paying for it again
+            request["system"] = [
+                {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}
+            ]
+        return request
 
-    def generate(self, prompt: str) -> str:
-        response = self.client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}],
+    def _structured_request(self, prompt: str, schema: dict, system: Optional[str] = None) -> dict:
+        # Forcing a single tool call makes the model answer with arguments matching the schema
+        request = self._request(prompt, system)
+        request["tools"] = [
+            {"name": _TOOL_NAME, "description": "Record the answer.", "input_schema": schema}
+        ]
+        request["tool_choice"] = {"type": "tool", "name": _TOOL_NAME}
+        return request
+
+    def _report_headers(self, headers):
+        self._report_rate_limits(
+            {
+                "requests_limit": header_number(headers, "anthropic-ratelimit-requests-limit"),
+                "requests_remaining": header_number(headers, "anthropic-ratelimit-requests-remaining"),
+                "tokens_limit": header_number(headers, "anthropic-ratelimit-tokens-limit"),
+                "tokens_remaining": header_number(headers, "anthropic-ratelimit-tokens-remaining"),
+                "retry_after": header_number(headers, "retry-after"),
+            }
         )
 
-        return response.content[0].text
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        try:
+            raw = self.client.messages.with_raw_response.create(**self._request(prompt, system))
+        except anthropic.APIError as e:
+            raise_transient(e, anthropic)
+            raise
+        self._report_headers(raw.headers)
+
+        return raw.parse().content[0].text
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        try:
+            raw = self.client.messages.with_raw_response.create(
+                **self._structured_request(prompt, schema, system)
+            )
+        except anthropic.APIError as e:
+            raise_transient(e, anthropic)
+            raise
+        self._report_headers(raw.headers)
+
+        return _tool_input(raw.parse())
+
+    def _get_async_client(self) -> anthropic.AsyncAnthropic:
+        if self._async_client is None:
+            self._async_client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=self._limits()),
+            )
+        return self._async_client
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        self._get_async_client()
+        try:
+            raw = await self._async_client.messages.with_raw_response.create(
+                **self._request(prompt, system)
+            )
+        except anthropic.APIError as e:
+            raise_transient(e, anthropic)
+            raise
+        self._report_headers(raw.headers)
+
+        return raw.parse().content[0].text
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        client = self._get_async_client()
+        try:
+            raw = await client.messages.with_raw_response.create(
+                **self._structured_request(prompt, schema, system)
+            )
+        except anthropic.APIError as e:
+            raise_transient(e, anthropic)
+            raise
+        self._report_headers(raw.headers)
+
+        return _tool_input(raw.parse())
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        try:
+            with self.client.messages.stream(**self._request(prompt, system)) as stream:
+                yield from stream.text_stream
+        except anthropic.APIError as e:
+            raise_transient(e, anthropic)
+            raise
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        client = self._get_async_client()
+        try:
+            async with client.messages.stream(**self._request(prompt, system)) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        except anthropic.APIError as e:
+            raise_transient(e, anthropic)
+            raise
+
+
+def _tool_input(message) -> str:
+    """Return the arguments of the forced tool call as JSON text, or the plain text if there is none."""
+    for block in message.content:
+        if block.type == "tool_use":
+            return json.dumps(block.input)
+    return "".join(block.text for block in message.content if block.type == "text")
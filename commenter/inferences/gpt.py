@@ -1,23 +1,234 @@
-from typing import Optional
+import json
+from typing import AsyncIterator, Iterator, Optional
 import openai
-from ..models.base import InferenceBase
+from ..models.base import InferenceBase, header_number
+from .transport import ConnectionPoolMixin, raise_transient
 
+# Model families whose response_format accepts a JSON schema (Structured Outputs)
+_JSON_SCHEMA_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+# Snapshots of those families that predate Structured Outputs but have JSON mode
+_JSON_OBJECT_ONLY_MODELS = ("gpt-4o-2024-05-13", "o1-preview", "o1-mini")
+# Models with JSON mode (any JSON object, no schema)
+_JSON_OBJECT_MODELS = ("gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-3.5-turbo")
 
-class GPTInference(InferenceBase):
+
+class GPTInference(ConnectionPoolMixin, InferenceBase):
     """OpenAI GPT implementation for code commenting."""
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4",
+        max_tokens: Optional[int] = None,
+        pool_size: int = 10,
+        timeout: Optional[float] = 120.0,
+        max_retries: int = 2,
+        context_window: int = 8192,
+        json_mode: Optional[str] = None,
+    ):
         """
         Initialize OpenAI client.
 
         Args:
             api_key (str): OpenAI API key
+            model (str): Model to use
+            max_tokens (Optional[int]): Maximum number of tokens to generate per request
+            pool_size (int): Maximum number of pooled keep-alive connections
+            timeout (Optional[float]): Request timeout in seconds, or None for no limit
+            max_retries (int): Retries done by the SDK itself (0 when a scheduler handles them)
+            context_window (int): Context window of the model in tokens
+            json_mode (Optional[str]): How structured requests ask for JSON: "json_schema",
+                "json_object" or "prompt"; detected from the model name if None
         """
-        openai.api_key = api_key
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._context_window = context_window
+        self.json_mode = json_mode or _json_mode(model)
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            timeout=timeout,
+            max_retries=max_retries,
+            http_client=openai.DefaultHttpxClient(limits=self._limits()),
+        )
+        self._async_client = None
+
+    def context_window(self) -> int:
+        return self._context_window
 
-    def generate(self, prompt: str) -> str:
-        response = openai.ChatCompletion.create(
-            model="gpt-4", messages=[{"role": "user", "content": prompt}]
+    def cache_identity(self) -> dict:
+        return {
+            "backend": "gpt",
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "json_mode": self.json_mode,
+        }
+
+    def _request(self, prompt: str, system: Optional[str] = None) -> dict:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            # OpenAI caches long prompt prefixes automatically; the shared instructions come
+            # first so every request in a run starts with the same tokens
+            messages.insert(0, {"role": "system", "content": system})
+        request = {"model": self.model, "messages": messages}
+        if self.max_tokens is not None:
+            request["max_tokens"] = self.max_tokens
+        return request
+
+    def _structured_request(self, prompt: str, schema: dict, system: Optional[str] = None) -> dict:
+        if self.json_mode == "json_schema":
+            request = self._request(prompt, system)
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "structured_output",
+                    "schema": _strict_schema(schema),
+                    "strict": True,
+                },
+            }
+            return request
+        # Without schema support the schema goes into the prompt; JSON mode at least
+        # guarantees the answer parses
+        request = self._request(
+            f"{prompt}\n\nRespond with a JSON object matching this JSON schema:\n{json.dumps(schema)}",
+            system,
         )
+        if self.json_mode == "json_object":
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _report_headers(self, headers):
+        self._report_rate_limits(
+            {
+                "requests_limit": header_number(headers, "x-ratelimit-limit-requests"),
+                "requests_remaining": header_number(headers, "x-ratelimit-remaining-requests"),
+                "tokens_limit": header_number(headers, "x-ratelimit-limit-tokens"),
+                "tokens_remaining": header_number(headers, "x-ratelimit-remaining-tokens"),
+                "retry_after": header_number(headers, "retry-after"),
+            }
+        )
+
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(
+                **self._request(prompt, system)
+            )
+        except openai.APIError as e:
+            raise_transient(e, openai)
+            raise
+        self._report_headers(raw.headers)
+
+        return raw.parse().choices[0].message.content
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(
+                **self._structured_request(prompt, schema, system)
+            )
+        except openai.APIError as e:
+            raise_transient(e, openai)
+            raise
+        self._report_headers(raw.headers)
+
+        return raw.parse().choices[0].message.content
+
+    def _get_async_client(self) -> openai.AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+                http_client=openai.DefaultAsyncHttpxClient(limits=self._limits()),
+            )
+        return self._async_client
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        self._get_async_client()
+        try:
+            raw = await self._async_client.chat.completions.with_raw_response.create(
+                **self._request(prompt, system)
+            )
+        except openai.APIError as e:
+            raise_transient(e, openai)
+            raise
+        self._report_headers(raw.headers)
+
+        return raw.parse().choices[0].message.content
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        client = self._get_async_client()
+        try:
+            raw = await client.chat.completions.with_raw_response.create(
+                **self._structured_request(prompt, schema, system)
+            )
+        except openai.APIError as e:
+            raise_transient(e, openai)
+            raise
+        self._report_headers(raw.headers)
+
+        return raw.parse().choices[0].message.content
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        try:
+            with self.client.chat.completions.create(
+                **self._request(prompt, system), stream=True
+            ) as stream:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except openai.APIError as e:
+            raise_transient(e, openai)
+            raise
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        client = self._get_async_client()
+        try:
+            async with await client.chat.completions.create(
+                **self._request(prompt, system), stream=True
+            ) as stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except openai.APIError as e:
+            raise_transient(e, openai)
+            raise
+
+
+def _json_mode(model: str) -> str:
+    """Pick the strongest way of getting JSON that a model supports."""
+    if model.startswith(_JSON_OBJECT_ONLY_MODELS):
+        return "json_object"
+    if model.startswith(_JSON_SCHEMA_MODELS):
+        return "json_schema"
+    if model.startswith(_JSON_OBJECT_MODELS):
+        return "json_object"
+    return "prompt"
+
+
+def _strict_schema(schema: dict) -> dict:
+    """
+    Adapt a JSON schema to Structured Outputs' strict mode.
 
-        return response.choices[0].message.content
+    Strict mode needs every property listed as required and no additional properties, so
+    optional properties become required but nullable.
+    """
+    schema = dict(schema)
+    if schema.get("type") == "object":
+        required = set(schema.get("required", []))
+        properties = {}
+        for name, subschema in schema.get("properties", {}).items():
+            subschema = _strict_schema(subschema)
+            if name not in required:
+                subschema["type"] = [subschema["type"], "null"]
+            properties[name] = subschema
+        schema["properties"] = properties
+        schema["required"] = list(properties)
+        schema["additionalProperties"] = False
+    elif schema.get("type") == "array" and "items" in schema:
+        schema["items"] = _strict_schema(schema["items"])
+    return schema
@@ -1,24 +1,161 @@
-from typing import Optional
-import requests
-from ..models.base import InferenceBase
+import json
+from typing import AsyncIterator, Iterator, Optional, Union
+import httpx
+from ..models.base import InferenceBase, TransientInferenceError, header_number
+from .transport import ConnectionPoolMixin
 
 
-class OllamaInference(InferenceBase):
+class OllamaInference(ConnectionPoolMixin, InferenceBase):
     """Ollama implementation for code commenting."""
 
-    def __init__(self, host: str = "http://localhost:11434"):
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        model: str = "qwen2.5:7b-instruct",
+        num_ctx: int = 32768,
+        keep_alive: Optional[Union[str, int]] = None,
+        max_tokens: Optional[int] = None,
+        pool_size: int = 10,
+        timeout: Optional[float] = None,
+    ):
         """
         Initialize Ollama client.
 
         Args:
             host (str): Ollama API host address
+            model (str): Model to use
+            num_ctx (int): Context window size in tokens
+            keep_alive (Optional[Union[str, int]]): How long Ollama keeps the model loaded (e.g. "10m")
+            max_tokens (Optional[int]): Maximum number of tokens to generate (num_predict)
+            pool_size (int): Maximum number of pooled keep-alive connections
+            timeout (Optional[float]): Request timeout in seconds, or None for no limit
         """
         self.host = host
-
-    def generate(self, prompt: str) -> str:
-        response = requests.post(
-            f"{self.host}/api/generate",
-            json={"model": "qwen2.5:7b-instruct", "prompt": prompt, "stream": False, "options": { "num_ctx": 32768 }},
+        self.model = model
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.max_tokens = max_tokens
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.client = httpx.Client(
+            base_url=host, limits=self._limits(), timeout=timeout
         )
+        self._async_client = None
+
+    def context_window(self) -> int:
+        return self.num_ctx
+
+    def cache_identity(self) -> dict:
+        return {
+            "backend": "ollama",
+            "model": self.model,
+            "num_ctx": self.num_ctx,
+            "max_tokens": self.max_tokens,
+        }
+
+    def _request(
+        self,
+        prompt: str,
+        stream: bool = False,
+        schema: Optional[dict] = None,
+        system: Optional[str] = None,
+    ) -> dict:
+        options = {"num_ctx": self.num_ctx}
+        if self.max_tokens is not None:
+            options["num_predict"] = self.max_tokens
+        request = {"model": self.model, "prompt": prompt, "stream": stream, "options": options}
+        if system:
+            # The runner keeps the KV cache of the previous prompt and only evaluates the part
+            # after the longest shared prefix, so identical instructions up front are nearly free
+            request["system"] = system
+        if schema is not None:
+            # Constrained decoding: Ollama only samples tokens that keep the output valid for the schema
+            request["format"] = schema
+        if self.keep_alive is not None:
+            request["keep_alive"] = self.keep_alive
+        return request
+
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        return self._post(self._request(prompt, system=system))
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        return self._post(self._request(prompt, schema=schema, system=system))
+
+    def _post(self, request: dict) -> str:
+        try:
+            response = self.client.post("/api/generate", json=request)
+        except httpx.TransportError as e:
+            raise TransientInferenceError(str(e)) from e
+
+        return _read_response(response)["response"]
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.host, limits=self._limits(), timeout=self.timeout
+            )
+        return self._async_client
 
-        return response.json()["response"]
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        return await self._apost(self._request(prompt, system=system))
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        return await self._apost(self._request(prompt, schema=schema, system=system))
+
+    async def _apost(self, request: dict) -> str:
+        client = self._get_async_client()
+        try:
+            response = await client.post("/api/generate", json=request)
+        except httpx.TransportError as e:
+            raise TransientInferenceError(str(e)) from e
+
+        return _read_response(response)["response"]
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        try:
+            with self.client.stream(
+                "POST", "/api/generate", json=self._request(prompt, stream=True, system=system)
+            ) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    _read_response(response)
+                for line in response.iter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        yield chunk.get("response", "")
+                        if chunk.get("done"):
+                            return
+        except httpx.TransportError as e:
+            raise TransientInferenceError(str(e)) from e
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        client = self._get_async_client()
+        try:
+            async with client.stream(
+                "POST", "/api/generate", json=self._request(prompt, stream=True, system=system)
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    _read_response(response)
+                async for line in response.aiter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        yield chunk.get("response", "")
+                        if chunk.get("done"):
+                            return
+        except httpx.TransportError as e:
+            raise TransientInferenceError(str(e)) from e
+
+
+def _read_response(response: httpx.Response) -> dict:
+    """Decode an Ollama response, raising TransientInferenceError for 429s and 5xx responses."""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TransientInferenceError(
+            f"Ollama returned HTTP {response.status_code}: {response.text[:200]}",
+            retry_after=header_number(response.headers, "retry-after"),
+            throttled=response.status_code == 429,
+        )
+    response.raise_for_status()
+    return response.json()
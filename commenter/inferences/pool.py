@@ -0,0 +1,272 @@
+import asyncio
+import collections
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+from termcolor import colored
+from .. import runtime
+from ..metrics import percentile
+from ..models.base import InferenceBase, TransientInferenceError, WrappedInference
+
+
+class _Endpoint:
+    """Load and health bookkeeping for one backend of a pool."""
+
+    def __init__(self, backend: InferenceBase, name: str, window: int):
+        self.backend = backend
+        self.name = name
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class PooledInference(WrappedInference):
+    """
+    Spreads requests over several interchangeable backends (e.g. one Ollama instance per host).
+
+    Each request goes to the healthy endpoint with the fewest requests in flight. An endpoint
+    that fails `failure_threshold` times in a row is taken out of rotation for `eject_seconds`,
+    then gets one trial request. Once enough latencies are known, a request still running
+    after the `hedge_percentile` latency is duplicated on another endpoint and whichever
+    answer arrives first wins; the other request is cancelled.
+    """
+
+    _inner_attribute = "endpoints"
+
+    def __init__(
+        self,
+        endpoints: List[InferenceBase],
+        hedge_percentile: Optional[float] = 0.95,
+        hedge_min_samples: int = 20,
+        failure_threshold: int = 3,
+        eject_seconds: float = 30.0,
+        latency_window: int = 200,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            endpoints (List[InferenceBase]): Backends serving the same model
+            hedge_percentile (Optional[float]): Latency percentile after which a request is
+                hedged, or None to never hedge
+            hedge_min_samples (int): Latencies to observe before hedging starts
+            failure_threshold (int): Consecutive transient failures that eject an endpoint
+            eject_seconds (float): How long an ejected endpoint stays out of rotation
+            latency_window (int): Recent latencies kept per endpoint for the percentile
+        """
+        if not endpoints:
+            raise ValueError("PooledInference needs at least one endpoint")
+        self.endpoints = [
+            _Endpoint(backend, getattr(backend, "host", f"endpoint-{index}"), latency_window)
+            for index, backend in enumerate(endpoints)
+        ]
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._turn = 0
+
+    def wrapped(self) -> InferenceBase:
+        # Every endpoint serves the same model, so the first one speaks for the pool
+        return self.endpoints[0].backend
+
+    @property
+    def rate_limit_listener(self):
+        return self.endpoints[0].backend.rate_limit_listener
+
+    @rate_limit_listener.setter
+    def rate_limit_listener(self, listener):
+        for endpoint in self.endpoints:
+            endpoint.backend.rate_limit_listener = listener
+
+    def context_window(self) -> int:
+        return min(endpoint.backend.context_window() for endpoint in self.endpoints)
+
+    def reject(self, prompt: str, schema: Optional[dict] = None, system: Optional[str] = None):
+        for endpoint in self.endpoints:
+            endpoint.backend.reject(prompt, schema, system)
+
+    def stats(self) -> dict:
+        """
+        Report per-endpoint load and health.
+
+        Returns:
+            dict: "endpoints" (name -> requests, errors, outstanding, healthy),
+                "hedges" and "hedge_wins" (hedged requests answered first by the duplicate)
+        """
+        now = time.monotonic()
+        return {
+            "endpoints": {
+                endpoint.name: {
+                    "requests": endpoint.requests,
+                    "errors": endpoint.errors,
+                    "outstanding": endpoint.outstanding,
+                    "healthy": endpoint.healthy(now),
+                }
+                for endpoint in self.endpoints
+            },
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+    def _pick(self, exclude=()) -> Optional[_Endpoint]:
+        """
+        Reserve the healthy endpoint with the fewest outstanding requests, fewer recent failures breaking ties.
+
+        The reservation counts as outstanding right away, so requests started in the same
+        event-loop step spread out instead of all landing on the same endpoint.
+        """
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude and e.healthy(now)]
+        if not candidates:
+            if exclude:
+                return None
+            # Everything is ejected: try the endpoint that is due back first rather than fail outright
+            candidates = [min(self.endpoints, key=lambda e: e.ejected_until)]
+        # Rotate the starting point so ties do not always favour the first endpoint
+        self._turn = (self._turn + 1) % len(candidates)
+        candidates = candidates[self._turn:] + candidates[:self._turn]
+        endpoint = min(candidates, key=lambda e: (e.outstanding, e.failures))
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.endpoints) < 2:
+            return None
+        latencies = [latency for endpoint in self.endpoints for latency in endpoint.latencies]
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return percentile(latencies, self.hedge_percentile)
+
+    def _succeeded(self, endpoint: _Endpoint, started: float):
+        endpoint.failures = 0
+        endpoint.ejected_until = 0.0
+        endpoint.latencies.append(time.perf_counter() - started)
+
+    def _failed(self, endpoint: _Endpoint, error: Exception):
+        endpoint.errors += 1
+        # Only failures of the endpoint itself count against its health, not bad prompts
+        if not isinstance(error, TransientInferenceError):
+            return
+        endpoint.failures += 1
+        if endpoint.failures >= self.failure_threshold and endpoint.healthy(time.monotonic()):
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            print(
+                colored(
+                    f"Endpoint {endpoint.name} failed {endpoint.failures} times in a row; "
+                    f"out of rotation for {self.eject_seconds:g}s",
+                    "yellow",
+                )
+            )
+
+    def _start(self, endpoint: _Endpoint, request: Callable) -> asyncio.Future:
+        """Run `request` on an endpoint reserved by _pick as a task that releases it when done."""
+
+        async def send():
+            started = time.perf_counter()
+            try:
+                result = await request(endpoint.backend)
+            except Exception as e:
+                self._failed(endpoint, e)
+                raise
+            self._succeeded(endpoint, started)
+            return result
+
+        def release(_):
+            endpoint.outstanding -= 1
+
+        task = asyncio.ensure_future(send())
+        # A done callback also runs for a task cancelled before it started
+        task.add_done_callback(release)
+        return task
+
+    async def _call(self, request: Callable):
+        """Run `request(backend)` (a coroutine factory) on the pool, hedging slow calls."""
+        primary = self._pick()
+        first = self._start(primary, request)
+        delay = self._hedge_delay()
+        if delay is None:
+            return await first
+
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done:
+            return first.result()
+        secondary = self._pick(exclude=(primary,))
+        if secondary is None:
+            return await first
+
+        self.hedges += 1
+        second = self._start(secondary, request)
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        return await self._call(lambda backend: backend.agenerate(prompt, system))
+
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        return runtime.run(self.agenerate(prompt, system))
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        return await self._call(
+            lambda backend: backend.agenerate_structured(prompt, schema, system)
+        )
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        return runtime.run(self.agenerate_structured(prompt, schema, system))
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        # Streams are not hedged: text already passed on cannot be swapped for another endpoint's
+        endpoint = None
+        try:
+            # Reserve inside the try, so the finally releases every reservation this stream made
+            endpoint = self._pick()
+            started = time.perf_counter()
+            async for chunk in endpoint.backend.astream(prompt, system):
+                yield chunk
+        except Exception as e:
+            if endpoint is not None:
+                self._failed(endpoint, e)
+            raise
+        else:
+            self._succeeded(endpoint, started)
+        finally:
+            if endpoint is not None:
+                endpoint.outstanding -= 1
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        stream = self.astream(prompt, system)
+        try:
+            while True:
+                try:
+                    yield runtime.run(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            runtime.run(stream.aclose())
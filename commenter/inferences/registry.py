@@ -0,0 +1,63 @@
+import importlib
+from typing import TYPE_CHECKING, Dict, List, Type
+
+if TYPE_CHECKING:
+    from ..models.base import InferenceBase
+
+# Entry point group other packages register backends under, e.g. in their setup.py:
+#     entry_points={"commenter.backends": ["vllm = my_package.vllm:VLLMInference"]}
+ENTRY_POINT_GROUP = "commenter.backends"
+
+# Built-in backends as "module:Class"; a backend's SDK is only imported once it is chosen
+BUILTIN_BACKENDS = {
+    "claude": "commenter.inferences.claude:ClaudeInference",
+    "gpt": "commenter.inferences.gpt:GPTInference",
+    "ollama": "commenter.inferences.ollama:OllamaInference",
+}
+
+
+class UnknownBackendError(LookupError):
+    """No built-in or installed backend has the requested name."""
+
+
+def _entry_points() -> Dict[str, str]:
+    """Map the name of every installed plugin backend to its "module:Class" target."""
+    # Scanning installed distributions is slow enough to only do it when a plugin is needed
+    from importlib.metadata import entry_points
+
+    return {entry_point.name: entry_point.value for entry_point in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+def available_backends() -> List[str]:
+    """
+    List the backends that can be passed to load_backend.
+
+    Returns:
+        List[str]: Built-in backend names followed by installed plugin backends
+    """
+    plugins = sorted(name for name in _entry_points() if name not in BUILTIN_BACKENDS)
+    return list(BUILTIN_BACKENDS) + plugins
+
+
+def load_backend(name: str) -> Type["InferenceBase"]:
+    """
+    Import and return the backend class registered under a name.
+
+    Only the chosen backend's module (and so its SDK) is imported.
+
+    Args:
+        name (str): Built-in backend name or the name of a `commenter.backends` entry point
+
+    Returns:
+        Type[InferenceBase]: The backend class
+
+    Raises:
+        UnknownBackendError: If no backend has this name
+    """
+    target = BUILTIN_BACKENDS.get(name) or _entry_points().get(name)
+    if target is None:
+        raise UnknownBackendError(
+            f"Unknown service {name!r}; available: {', '.join(available_backends())}"
+        )
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
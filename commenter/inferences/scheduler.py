@@ -0,0 +1,271 @@
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Iterator, Optional
+from termcolor import colored
+from .. import runtime
+from ..metrics import CHARS_PER_TOKEN, estimate_tokens, get_metrics
+from ..models.base import InferenceBase, TransientInferenceError, WrappedInference
+
+
+def _sent_text(prompt: str, system: Optional[str]) -> str:
+    """Everything a request sends, for token estimates and budgets."""
+    return f"{system}\n\n{prompt}" if system else prompt
+
+
+class _TokenBucket:
+    """Continuously refilling budget of `rate` units per minute."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.available = rate
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float):
+        # A single request larger than the whole budget waits for a full bucket instead of forever
+        amount = min(amount, self.rate)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(
+                    self.rate, self.available + (now - self.updated) * self.rate / 60.0
+                )
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                await asyncio.sleep((amount - self.available) * 60.0 / self.rate)
+
+
+class _AdaptiveLimiter:
+    """Caps in-flight requests, growing the cap on success and shrinking it under pressure."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def grow(self):
+        # Additive increase: roughly +1 once a full window of requests has succeeded
+        self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def shrink(self, factor: float):
+        self.limit = max(self.minimum, self.limit * factor)
+
+
+class ScheduledInference(WrappedInference):
+    """Wraps any backend with rate limiting, retries with backoff and adaptive concurrency."""
+
+    def __init__(
+        self,
+        inner: InferenceBase,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            inner (InferenceBase): Backend that performs the requests
+            requests_per_minute (Optional[float]): Request budget, or None for no limit
+            tokens_per_minute (Optional[float]): Token budget (prompt estimate plus max_tokens), or None for no limit
+            max_retries (int): Retries for transient errors before giving up
+            base_delay (float): First backoff step in seconds
+            max_delay (float): Upper bound of a single backoff in seconds
+            max_concurrency (int): Most requests allowed in flight at once
+            min_concurrency (int): Fewest requests allowed in flight when backing off
+        """
+        self.inner = inner
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._request_bucket = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._token_bucket = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._limiter = _AdaptiveLimiter(max_concurrency, min_concurrency, max_concurrency)
+        self._latest_limits = None
+        self._backend_name = inner.cache_identity().get("backend", type(inner).__name__)
+        inner.rate_limit_listener = self._on_rate_limits
+
+    def reject(self, prompt: str, schema: Optional[dict] = None, system: Optional[str] = None):
+        self.inner.reject(prompt, schema, system)
+
+    def _on_rate_limits(self, limits: dict):
+        # May be called from a worker thread; only store the snapshot here
+        self._latest_limits = limits
+
+    def _estimate_tokens(self, prompt: str) -> int:
+        return estimate_tokens(prompt) + (getattr(self.inner, "max_tokens", None) or 0)
+
+    def _adjust_concurrency(self):
+        """Shrink the in-flight cap when the provider reports less than 10% of its budget left."""
+        limits, self._latest_limits = self._latest_limits, None
+        if not limits:
+            self._limiter.grow()
+            return
+        for kind in ("requests", "tokens"):
+            limit = limits.get(f"{kind}_limit")
+            remaining = limits.get(f"{kind}_remaining")
+            if limit and remaining is not None and remaining < 0.1 * limit:
+                self._limiter.shrink(0.75)
+                return
+        self._limiter.grow()
+
+    def _backoff(self, attempt: int, error: TransientInferenceError) -> float:
+        # Full jitter, but never sooner than the provider asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+        return delay
+
+    async def _call(self, prompt: str, request):
+        """Run `request()` (a coroutine factory) under the rate limits, retrying transient errors.
+
+        `prompt` is only used to estimate the request's size."""
+        attempt = 0
+        while True:
+            if self._request_bucket is not None:
+                await self._request_bucket.acquire(1)
+            if self._token_bucket is not None:
+                await self._token_bucket.acquire(self._estimate_tokens(prompt))
+
+            await self._limiter.acquire()
+            started = time.perf_counter()
+            try:
+                result = await request()
+            except TransientInferenceError as e:
+                get_metrics().record_request(
+                    self._backend_name, time.perf_counter() - started, estimate_tokens(prompt), 0, ok=False
+                )
+                if e.throttled:
+                    self._limiter.shrink(0.5)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                get_metrics().record_retry(self._backend_name)
+                print(
+                    colored(
+                        f"Transient inference error ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s",
+                        "yellow",
+                    )
+                )
+            except Exception:
+                get_metrics().record_request(
+                    self._backend_name, time.perf_counter() - started, estimate_tokens(prompt), 0, ok=False
+                )
+                raise
+            else:
+                get_metrics().record_request(
+                    self._backend_name,
+                    time.perf_counter() - started,
+                    estimate_tokens(prompt),
+                    estimate_tokens(result),
+                )
+                self._adjust_concurrency()
+                return result
+            finally:
+                await self._limiter.release()
+
+            await asyncio.sleep(delay)
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        return await self._call(
+            _sent_text(prompt, system), lambda: self.inner.agenerate(prompt, system)
+        )
+
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
+        return runtime.run(self.agenerate(prompt, system))
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        return await self._call(
+            _sent_text(prompt, system),
+            lambda: self.inner.agenerate_structured(prompt, schema, system),
+        )
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        return runtime.run(self.agenerate_structured(prompt, schema, system))
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        attempt = 0
+        while True:
+            if self._request_bucket is not None:
+                await self._request_bucket.acquire(1)
+            if self._token_bucket is not None:
+                await self._token_bucket.acquire(self._estimate_tokens(_sent_text(prompt, system)))
+
+            await self._limiter.acquire()
+            started = time.perf_counter()
+            received = 0
+            failed = False
+            try:
+                async for chunk in self.inner.astream(prompt, system):
+                    received += len(chunk)
+                    yield chunk
+            except TransientInferenceError as e:
+                failed = True
+                if e.throttled:
+                    self._limiter.shrink(0.5)
+                # Text already handed to the caller cannot be taken back, so only retry before the first chunk
+                if received or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                get_metrics().record_retry(self._backend_name)
+                print(
+                    colored(
+                        f"Transient inference error ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s",
+                        "yellow",
+                    )
+                )
+            except Exception:
+                failed = True
+                raise
+            else:
+                self._adjust_concurrency()
+                return
+            finally:
+                # Also reached when the caller closes the stream early
+                get_metrics().record_request(
+                    self._backend_name,
+                    time.perf_counter() - started,
+                    estimate_tokens(_sent_text(prompt, system)),
+                    received // CHARS_PER_TOKEN,
+                    ok=not failed,
+                )
+                await self._limiter.release()
+
+            await asyncio.sleep(delay)
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        stream = self.astream(prompt, system)
+        try:
+            while True:
+                try:
+                    yield runtime.run(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            runtime.run(stream.aclose())
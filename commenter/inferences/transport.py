@@ -0,0 +1,34 @@
+import httpx
+from ..models.base import TransientInferenceError, header_number
+
+
+class ConnectionPoolMixin:
+    """Keep-alive connection pool settings shared by the HTTP backends; expects `self.pool_size`."""
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.pool_size, max_keepalive_connections=self.pool_size
+        )
+
+
+def raise_transient(error: Exception, sdk):
+    """
+    Re-raise timeouts, connection drops, 429s and 5xx responses of a provider SDK as TransientInferenceError.
+
+    Returns normally for other errors so the caller can re-raise them unchanged.
+
+    Args:
+        error (Exception): Error raised by the SDK
+        sdk (module): The `anthropic` or `openai` module; both define APIConnectionError
+            and APIStatusError
+    """
+    if isinstance(error, sdk.APIConnectionError):
+        raise TransientInferenceError(str(error)) from error
+    if isinstance(error, sdk.APIStatusError) and (
+        error.status_code == 429 or error.status_code >= 500
+    ):
+        raise TransientInferenceError(
+            str(error),
+            retry_after=header_number(error.response.headers, "retry-after"),
+            throttled=error.status_code == 429,
+        ) from error
@@ -0,0 +1,441 @@
+import click
+import os
+import sys
+from typing import Optional, Tuple
+from commenter.cache import default_cache_dir
+from commenter.console import set_quiet
+from commenter.inferences.registry import UnknownBackendError, load_backend
+from commenter.metrics import get_metrics
+from termcolor import colored
+
+# Backends, the parser and the processing modules are imported inside main() once the
+# options are known, so a run only loads the SDKs and code its --type and --service use.
+
+def _parse_stage_workers(value: Optional[str]) -> Optional[dict]:
+    """Turn 'parse=8,infer=4' into {"parse": 8, "infer": 4}, exiting on unknown stages."""
+    if not value:
+        return None
+    from commenter.processing.repository import PIPELINE_STAGES
+
+    workers = {}
+    for part in value.split(","):
+        name, _, count = part.partition("=")
+        name = name.strip()
+        if name not in PIPELINE_STAGES or not count.strip().isdigit() or int(count) < 1:
+            print(colored(f"Invalid --stage-workers entry: {part!r}", "red"))
+            sys.exit(1)
+        workers[name] = int(count)
+    return workers
+
+
+def _stage_workers_for(workers: Optional[dict], host_count: int) -> dict:
+    """Fill in the infer stage's thread count: at least one per pooled host unless set explicitly."""
+    from commenter.processing.repository import DEFAULT_STAGE_WORKERS
+
+    workers = dict(workers or {})
+    workers.setdefault("infer", max(DEFAULT_STAGE_WORKERS["infer"], host_count))
+    return workers
+
+
+@click.command()
+@click.option(
+    "--type",
+    type=click.Choice(["repository", "functions", "readme", "slug"]),
+    required=True,
+    help="Type of documentation to generate",
+)
+@click.option(
+    "--service",
+    required=True,
+    help="AI service to use: claude, gpt, ollama or a backend installed under the 'commenter.backends' entry point group",
+)
+@click.option("--api-key", help="API key for Claude or GPT services", required=False)
+@click.option("--input-path", required=True, help="Path to code file or directory")
+@click.option(
+    "--slug-code",
+    required=False,
+    help="Comma-separated slug(s) to document (required if type is 'slug'); --input-path may be the file or a directory to search",
+)
+@click.option(
+    "--parse-workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of node parser workers for repository runs (defaults to the CPU count)",
+)
+@click.option(
+    "--stage-workers",
+    required=False,
+    help="Per-stage thread counts for repository runs, e.g. 'parse=8,infer=4' (stages: parse, prompt, infer, apply, write)",
+)
+@click.option("--queue-size", type=click.IntRange(min=1), default=8, help="Files held between pipeline stages in repository runs")
+@click.option("--no-parse-cache", is_flag=True, help="Always re-parse files instead of using the on-disk parse cache")
+@click.option("--parse-cache-size", type=click.IntRange(min=1), default=256, help="Parse cache size limit in MB")
+@click.option("--cache-dir", required=False, help="Directory for on-disk caches (defaults to ~/.cache/commenter)")
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Continue an interrupted repository run, skipping work its journal records as finished",
+)
+@click.option(
+    "--since",
+    required=False,
+    help="Repository runs only: process just what changed in git since this revision (e.g. origin/main)",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep running and re-document changed elements whenever files under --input-path are saved",
+)
+@click.option("--debounce", type=click.FloatRange(min=0), default=1.0, help="Seconds of quiet after a burst of saves before --watch reacts")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Keep existing comments, without an LLM call, for elements whose code has not changed",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Maximum number of in-flight inference requests per file (1 = sequential)",
+)
+@click.option(
+    "--batch-tokens",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Pack small elements into shared prompts of about this many code tokens",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Stream responses and stop generating as soon as a comment is complete or malformed",
+)
+@click.option(
+    "--structured",
+    is_flag=True,
+    help="Ask the backend for schema-constrained JSON instead of XML (ignores --batch-tokens and --stream)",
+)
+@click.option(
+    "--max-file-size",
+    type=click.IntRange(min=1),
+    default=512,
+    help="Largest file (in KB) summarized for READMEs; larger files are skipped",
+)
+@click.option("--model", required=False, help="Model name (defaults to the backend's default model)")
+@click.option(
+    "--host",
+    "hosts",
+    multiple=True,
+    help="Ollama host address (defaults to http://localhost:11434); repeat it to balance requests over several instances",
+)
+@click.option("--no-hedge", is_flag=True, help="With several --host values, never duplicate slow requests on a second host")
+@click.option("--num-ctx", type=click.IntRange(min=1), default=None, help="Ollama context window size in tokens")
+@click.option("--keep-alive", required=False, help="How long Ollama keeps the model loaded, e.g. '10m' or -1")
+@click.option("--max-tokens", type=click.IntRange(min=1), default=None, help="Maximum number of tokens to generate per request")
+@click.option("--pool-size", type=click.IntRange(min=1), default=None, help="Maximum number of pooled keep-alive HTTP connections")
+@click.option("--timeout", type=click.FloatRange(min=0), default=None, help="Inference request timeout in seconds")
+@click.option("--rpm", type=click.FloatRange(min=0, min_open=True), default=None, help="Requests-per-minute limit for the inference backend")
+@click.option("--tpm", type=click.FloatRange(min=0, min_open=True), default=None, help="Tokens-per-minute limit for the inference backend")
+@click.option("--max-retries", type=click.IntRange(min=0), default=5, help="Retries for rate-limited, timed-out or failed inference requests")
+@click.option("--no-llm-cache", is_flag=True, help="Always send prompts to the backend instead of using the response cache")
+@click.option("--llm-cache-size", type=click.IntRange(min=1), default=512, help="Response cache size limit in MB")
+@click.option("--llm-cache-ttl", type=click.FloatRange(min=0, min_open=True), default=None, help="Hours before a cached response expires (default: never)")
+@click.option("--quiet", is_flag=True, help="Do not print per-element progress messages")
+@click.option("--report", "report_path", required=False, help="Write a JSON report of the run's metrics to this file")
+@click.option("--prometheus", "prometheus_path", required=False, help="Write the run's metrics in Prometheus text format to this file")
+
+def main(
+    type: str,
+    service: str,
+    api_key: Optional[str],
+    input_path: str,
+    slug_code: Optional[str],
+    parse_workers: Optional[int],
+    stage_workers: Optional[str],
+    queue_size: int,
+    no_parse_cache: bool,
+    parse_cache_size: int,
+    cache_dir: Optional[str],
+    resume: bool,
+    since: Optional[str],
+    watch: bool,
+    debounce: float,
+    incremental: bool,
+    concurrency: int,
+    batch_tokens: Optional[int],
+    stream: bool,
+    structured: bool,
+    max_file_size: int,
+    model: Optional[str],
+    hosts: Tuple[str, ...],
+    no_hedge: bool,
+    num_ctx: Optional[int],
+    keep_alive: Optional[str],
+    max_tokens: Optional[int],
+    pool_size: Optional[int],
+    timeout: Optional[float],
+    rpm: Optional[float],
+    tpm: Optional[float],
+    max_retries: int,
+    no_llm_cache: bool,
+    llm_cache_size: int,
+    llm_cache_ttl: Optional[float],
+    quiet: bool,
+    report_path: Optional[str],
+    prometheus_path: Optional[str],
+):
+    """Generate code comments using AI services."""
+    if since and (type != "repository" or watch):
+        raise click.UsageError("--since only applies to --type repository runs without --watch")
+    if resume and (type != "repository" or watch):
+        raise click.UsageError("--resume only applies to --type repository runs without --watch")
+
+    print(colored(f"Initializing documentation generation for {type}...", "cyan"))
+    set_quiet(quiet)
+
+    # Options left unset fall back to each backend's own defaults
+    backend_options = {
+        name: value
+        for name, value in {
+            "model": model,
+            "max_tokens": max_tokens,
+            "pool_size": pool_size,
+            "timeout": timeout,
+        }.items()
+        if value is not None
+    }
+
+    # Initialize the appropriate inference service
+    try:
+        backend = load_backend(service)
+    except UnknownBackendError as e:
+        print(colored(str(e), "red"))
+        sys.exit(1)
+    pool = None
+    if service == "claude":
+        if not api_key:
+            print(colored("API key required for Claude service", "red"))
+            sys.exit(1)
+        inference = backend(api_key, max_retries=0, **backend_options)
+        model_name = "Claude"
+    elif service == "gpt":
+        if not api_key:
+            print(colored("API key required for GPT service", "red"))
+            sys.exit(1)
+        inference = backend(api_key, max_retries=0, **backend_options)
+        model_name = "GPT-4"
+    elif service == "ollama":
+        if num_ctx is not None:
+            backend_options["num_ctx"] = num_ctx
+        if keep_alive is not None:
+            # Ollama takes either a duration string ("10m") or a number of seconds (-1 = forever)
+            backend_options["keep_alive"] = (
+                int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+            )
+        if len(hosts) > 1:
+            from commenter.inferences.pool import PooledInference
+
+            inference = pool = PooledInference(
+                [backend(host=h, **backend_options) for h in hosts],
+                hedge_percentile=None if no_hedge else 0.95,
+            )
+        else:
+            if hosts:
+                backend_options["host"] = hosts[0]
+            inference = backend(**backend_options)
+        model_name = "Ollama"
+    else:  # plugin backend
+        if api_key:
+            backend_options["api_key"] = api_key
+        inference = backend(**backend_options)
+        model_name = getattr(inference, "model", None) or service
+
+    # Repository runs have several files in the infer stage at once, each with up to
+    # --concurrency requests in flight
+    pipeline_workers = None
+    infer_workers = 1
+    if type == "repository" and not watch:
+        pipeline_workers = _stage_workers_for(_parse_stage_workers(stage_workers), len(hosts))
+        infer_workers = pipeline_workers["infer"]
+
+    from commenter.inferences.scheduler import ScheduledInference
+
+    # Retries, backoff and rate limits are handled here rather than inside each SDK
+    inference = ScheduledInference(
+        inference,
+        requests_per_minute=rpm,
+        tokens_per_minute=tpm,
+        max_retries=max_retries,
+        # Every pooled host gets its own share of in-flight requests
+        max_concurrency=infer_workers * concurrency * max(1, len(hosts)),
+    )
+
+    # Cache in front of the scheduler so cache hits skip rate limiting entirely
+    if not no_llm_cache:
+        from commenter.cache import SQLiteCache
+        from commenter.inferences.cached import CachedInference
+
+        inference = CachedInference(
+            inference,
+            SQLiteCache(
+                os.path.join(cache_dir or default_cache_dir(), "llm.sqlite"),
+                max_bytes=llm_cache_size * 1024 * 1024,
+                ttl=llm_cache_ttl * 3600 if llm_cache_ttl else None,
+            ),
+        )
+
+    print(colored(f"Using {model_name} model for inference.", "green"))
+
+    if watch and type not in ("functions", "repository"):
+        print(colored("--watch works with --type functions or repository", "red"))
+        sys.exit(1)
+
+    # Set when some of the work failed; reports are still written before exiting with it
+    exit_code = 0
+
+    if type == "readme":
+        from commenter.formatters.readme import ReadmeFormatter
+        from commenter.processing.readme import process_readme
+
+        if not process_readme(inference, ReadmeFormatter(model_name), input_path, max_file_size * 1024):
+            exit_code = 1
+    else:
+        from commenter.formatters.comment import CommentFormatter
+        from commenter.parsers.typescript import configure_parser
+        from commenter.processing.slug_index import SlugIndex
+
+        configure_parser(
+            workers=parse_workers,
+            use_cache=not no_parse_cache,
+            cache_dir=cache_dir,
+            cache_max_bytes=parse_cache_size * 1024 * 1024,
+        )
+        slug_index = SlugIndex(os.path.join(cache_dir or default_cache_dir(), "slugs.sqlite"))
+        comment_formatter = CommentFormatter(model_name)
+
+    if watch:
+        from commenter.processing.watch import watch as watch_tree
+
+        watch_tree(
+            inference,
+            comment_formatter,
+            input_path,
+            debounce=debounce,
+            incremental=incremental,
+            concurrency=concurrency,
+            slug_index=slug_index,
+            batch_tokens=batch_tokens,
+            stream=stream,
+            structured=structured,
+        )
+    elif type == "repository":
+        from commenter.formatters.readme import ReadmeFormatter
+        from commenter.processing.changes import GitError, changed_lines
+        from commenter.processing.journal import RunJournal, journal_path
+        from commenter.processing.repository import process_repository
+
+        changed = None
+        if since:
+            try:
+                changed = changed_lines(input_path, since)
+            except GitError as e:
+                print(colored(f"Cannot list changes since {since}: {e}", "red"))
+                sys.exit(1)
+        journal = RunJournal(
+            journal_path(cache_dir or default_cache_dir(), input_path), resume=resume
+        )
+        if journal.resumed:
+            print(colored(f"Resuming from journal {journal.path}", "cyan"))
+        try:
+            failures = process_repository(
+                inference,
+                comment_formatter,
+                ReadmeFormatter(model_name),
+                input_path,
+                parse_workers,
+                incremental,
+                concurrency,
+                slug_index,
+                batch_tokens,
+                max_file_size * 1024,
+                stream,
+                structured,
+                pipeline_workers,
+                queue_size,
+                journal,
+                changed,
+            )
+        except BaseException:
+            journal.close()
+            print(colored("Run interrupted; continue it with --resume", "yellow"))
+            raise
+        if failures:
+            # Keep the journal: the finished work is recorded and the failed work is not
+            journal.close()
+            print(colored("Retry the failed work with --resume", "yellow"))
+            exit_code = 1
+        else:
+            journal.complete()
+    elif type == "functions":
+        from commenter.processing.function import process_file
+
+        process_file(
+            inference,
+            comment_formatter,
+            input_path,
+            incremental=incremental,
+            concurrency=concurrency,
+            slug_index=slug_index,
+            batch_tokens=batch_tokens,
+            stream=stream,
+            structured=structured,
+        )
+    elif type == "slug":
+        from commenter.processing.function import process_slugs
+
+        if not slug_code:
+            print(colored("Error: --slug-code is required when type is 'slug'", "red"))
+            sys.exit(1)
+        slugs = [slug.strip() for slug in slug_code.split(",") if slug.strip()]
+        process_slugs(
+            inference,
+            comment_formatter,
+            input_path,
+            slugs,
+            incremental=incremental,
+            slug_index=slug_index,
+            stream=stream,
+            structured=structured,
+        )
+
+    if not no_llm_cache:
+        stats = inference.stats()
+        print(
+            colored(
+                f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries",
+                "cyan",
+            )
+        )
+
+    if pool is not None:
+        stats = pool.stats()
+        for name, endpoint in stats["endpoints"].items():
+            print(
+                colored(
+                    f"Endpoint {name}: {endpoint['requests']} requests, {endpoint['errors']} errors",
+                    "cyan",
+                )
+            )
+        print(colored(f"Hedged requests: {stats['hedges']} ({stats['hedge_wins']} won by the hedge)", "cyan"))
+
+    metrics = get_metrics()
+    if report_path:
+        metrics.write_report(report_path)
+        print(colored(f"Run report written to {report_path}", "cyan"))
+    if prometheus_path:
+        metrics.write_prometheus(prometheus_path)
+        print(colored(f"Prometheus metrics written to {prometheus_path}", "cyan"))
+    if exit_code:
+        sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
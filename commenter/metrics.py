@@ -0,0 +1,276 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+# The characters-per-token ratio behind rate limits, batching, ETA and reported token counts;
+# prompt chunking uses the more conservative scanner.CHUNK_CHARS_PER_TOKEN
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estimate the token count of a piece of text."""
+    return len(text) // CHARS_PER_TOKEN if text else 0
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the value below which `fraction` of `values` fall (0.0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    """Thread-safe record of one run: parse times, LLM requests, cache use, writes and per-element results."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._files: Dict[str, dict] = {}
+        self._elements: List[dict] = []
+        self._backends: Dict[str, dict] = {}
+        self._caches: Dict[str, dict] = {}
+
+    def _file(self, file_path: str) -> dict:
+        return self._files.setdefault(
+            file_path,
+            {"parse_seconds": 0.0, "parse_cached": False, "elements": 0, "bytes_written": 0},
+        )
+
+    def _backend(self, backend: str) -> dict:
+        return self._backends.setdefault(
+            backend,
+            {
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+                "prompt_tokens": 0,
+                "response_tokens": 0,
+                "latencies": [],
+            },
+        )
+
+    def record_parse(self, file_path: str, seconds: float, cached: bool):
+        """
+        Record how long parsing a file took.
+
+        Args:
+            file_path (str): The parsed file
+            seconds (float): Parse duration
+            cached (bool): Whether the result came from the parse cache
+        """
+        with self._lock:
+            entry = self._file(file_path)
+            entry["parse_seconds"] += seconds
+            entry["parse_cached"] = cached
+
+    def record_request(
+        self, backend: str, seconds: float, prompt_tokens: int, response_tokens: int, ok: bool = True
+    ):
+        """
+        Record one LLM request.
+
+        Args:
+            backend (str): Backend name (see InferenceBase.cache_identity)
+            seconds (float): Request latency
+            prompt_tokens (int): Estimated prompt tokens
+            response_tokens (int): Estimated response tokens
+            ok (bool): Whether the request succeeded
+        """
+        with self._lock:
+            entry = self._backend(backend)
+            entry["requests"] += 1
+            entry["latencies"].append(seconds)
+            entry["prompt_tokens"] += prompt_tokens
+            entry["response_tokens"] += response_tokens
+            if not ok:
+                entry["errors"] += 1
+
+    def record_retry(self, backend: str):
+        """Record that a failed request to `backend` is being retried."""
+        with self._lock:
+            self._backend(backend)["retries"] += 1
+
+    def record_cache(self, cache: str, hit: bool):
+        """
+        Record a cache lookup.
+
+        Args:
+            cache (str): Cache name ("llm" or "parse")
+            hit (bool): Whether the lookup found an entry
+        """
+        with self._lock:
+            entry = self._caches.setdefault(cache, {"hits": 0, "misses": 0})
+            entry["hits" if hit else "misses"] += 1
+
+    def record_write(self, file_path: str, written: int):
+        """
+        Record a file written by the tool.
+
+        Args:
+            file_path (str): The written file
+            written (int): Characters written
+        """
+        with self._lock:
+            self._file(file_path)["bytes_written"] += written
+
+    def record_element(
+        self,
+        file_path: str,
+        name: str,
+        status: str,
+        prompt_tokens: int = 0,
+        seconds: float = 0.0,
+    ):
+        """
+        Record the outcome for one element.
+
+        Args:
+            file_path (str): File containing the element
+            name (str): Element name
+            status (str): "generated", "failed" or "unchanged"
+            prompt_tokens (int): Estimated prompt tokens
+            seconds (float): Time spent generating its comment
+        """
+        with self._lock:
+            self._file(file_path)["elements"] += 1
+            self._elements.append(
+                {
+                    "file": file_path,
+                    "name": name,
+                    "status": status,
+                    "prompt_tokens": prompt_tokens,
+                    "seconds": round(seconds, 4),
+                }
+            )
+
+    def report(self) -> dict:
+        """
+        Summarize the run.
+
+        Returns:
+            dict: JSON-serializable report with totals, per-backend, per-cache,
+                per-file and per-element sections
+        """
+        with self._lock:
+            backends = {}
+            for name, entry in self._backends.items():
+                latencies = entry["latencies"]
+                backends[name] = {
+                    key: value for key, value in entry.items() if key != "latencies"
+                }
+                backends[name]["latency_seconds"] = {
+                    "total": round(sum(latencies), 4),
+                    "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+                    "p50": round(percentile(latencies, 0.5), 4),
+                    "p95": round(percentile(latencies, 0.95), 4),
+                    "max": round(max(latencies), 4) if latencies else 0.0,
+                }
+            statuses = {}
+            for element in self._elements:
+                statuses[element["status"]] = statuses.get(element["status"], 0) + 1
+            totals = {
+                "duration_seconds": round(time.time() - self.started, 3),
+                "files": len(self._files),
+                "elements": statuses,
+                "parse_seconds": round(sum(f["parse_seconds"] for f in self._files.values()), 4),
+                "requests": sum(b["requests"] for b in self._backends.values()),
+                "retries": sum(b["retries"] for b in self._backends.values()),
+                "prompt_tokens": sum(b["prompt_tokens"] for b in self._backends.values()),
+                "response_tokens": sum(b["response_tokens"] for b in self._backends.values()),
+                "bytes_written": sum(f["bytes_written"] for f in self._files.values()),
+            }
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "totals": totals,
+                "backends": backends,
+                "caches": {name: dict(entry) for name, entry in self._caches.items()},
+                "files": {path: dict(entry) for path, entry in self._files.items()},
+                "elements": list(self._elements),
+            }
+
+    def write_report(self, path: str):
+        """Write report() as JSON to `path`."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def prometheus(self) -> str:
+        """
+        Render the run's totals in the Prometheus text exposition format.
+
+        Returns:
+            str: Metric families, one sample per line
+        """
+        report = self.report()
+        totals = report["totals"]
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                # (labels, value), or (suffix, labels, value) for a summary's _sum and _count
+                suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                sample_name = name + suffix
+                lines.append(
+                    f"{sample_name}{{{label_text}}} {value}" if label_text else f"{sample_name} {value}"
+                )
+
+        family("commenter_run_duration_seconds", "gauge", "Wall-clock duration of the run.",
+               [({}, totals["duration_seconds"])])
+        family("commenter_files_total", "counter", "Files parsed or written.", [({}, totals["files"])])
+        family("commenter_elements_total", "counter", "Elements by outcome.",
+               [({"status": status}, count) for status, count in totals["elements"].items()])
+        family("commenter_parse_seconds_total", "counter", "Time spent parsing files.",
+               [({}, totals["parse_seconds"])])
+        family("commenter_bytes_written_total", "counter", "Characters written to files.",
+               [({}, totals["bytes_written"])])
+        family("commenter_llm_requests_total", "counter", "LLM requests, including failed ones.",
+               [({"backend": name}, b["requests"]) for name, b in report["backends"].items()])
+        family("commenter_llm_errors_total", "counter", "Failed LLM requests.",
+               [({"backend": name}, b["errors"]) for name, b in report["backends"].items()])
+        family("commenter_llm_retries_total", "counter", "Retried LLM requests.",
+               [({"backend": name}, b["retries"]) for name, b in report["backends"].items()])
+        latency_samples = []
+        for name, b in report["backends"].items():
+            latency = b["latency_seconds"]
+            latency_samples.extend(
+                [
+                    ({"backend": name, "quantile": "0.5"}, latency["p50"]),
+                    ({"backend": name, "quantile": "0.95"}, latency["p95"]),
+                    ("_sum", {"backend": name}, latency["total"]),
+                    ("_count", {"backend": name}, b["requests"]),
+                ]
+            )
+        family("commenter_llm_request_seconds", "summary", "LLM request latency.", latency_samples)
+        family("commenter_llm_prompt_tokens_total", "counter", "Estimated prompt tokens sent.",
+               [({"backend": name}, b["prompt_tokens"]) for name, b in report["backends"].items()])
+        family("commenter_llm_response_tokens_total", "counter", "Estimated response tokens received.",
+               [({"backend": name}, b["response_tokens"]) for name, b in report["backends"].items()])
+        family("commenter_cache_hits_total", "counter", "Cache hits.",
+               [({"cache": name}, c["hits"]) for name, c in report["caches"].items()])
+        family("commenter_cache_misses_total", "counter", "Cache misses.",
+               [({"cache": name}, c["misses"]) for name, c in report["caches"].items()])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write prometheus() to `path`, e.g. for the node exporter's textfile collector."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics of the current run."""
+    return _metrics
+
+
+def reset_metrics() -> Metrics:
+    """Start a fresh record (e.g. between benchmark runs) and return it."""
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
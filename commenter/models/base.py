@@ -1,19 +1,205 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+
+def header_number(headers, name: str) -> Optional[float]:
+    """Read a numeric HTTP header, returning None when it is absent or not a plain number."""
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TransientInferenceError(Exception):
+    """A failure worth retrying: rate limiting, timeouts, dropped connections or server overload."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, throttled: bool = False):
+        """
+        Args:
+            message (str): Description of the failure
+            retry_after (Optional[float]): Seconds the provider asked us to wait, if it said
+            throttled (bool): Whether the provider rejected the request for exceeding a rate limit
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
 
 
 class InferenceBase(ABC):
     """Base class for AI inference implementations."""
 
+    rate_limit_listener: Optional[Callable[[dict], None]] = None
+
+    def _report_rate_limits(self, limits: dict):
+        """
+        Pass the provider's rate-limit state to the registered listener, if any.
+
+        Args:
+            limits (dict): Any of requests_limit, requests_remaining, tokens_limit,
+                tokens_remaining and retry_after, as numbers
+        """
+        if self.rate_limit_listener is not None:
+            self.rate_limit_listener({k: v for k, v in limits.items() if v is not None})
+
     @abstractmethod
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: str, system: Optional[str] = None) -> str:
         """
         Generate a response via a LLM
 
         Args:
             code (str): The question
+            system (Optional[str]): Instructions shared by many requests, sent ahead of the
+                prompt as a system message so providers can cache that prefix
 
         Returns:
             str: Generated text
         """
         pass
+
+    async def agenerate(self, prompt: str, system: Optional[str] = None) -> str:
+        """
+        Generate a response via a LLM without blocking the event loop.
+
+        Backends with a native async client override this; the default runs
+        generate() in a worker thread.
+
+        Args:
+            prompt (str): The question
+            system (Optional[str]): Shared instructions (see generate())
+
+        Returns:
+            str: Generated text
+        """
+        return await asyncio.to_thread(self.generate, prompt, system)
+
+    def generate_structured(self, prompt: str, schema: dict, system: Optional[str] = None) -> str:
+        """
+        Generate a JSON document that follows `schema`.
+
+        Backends with constrained decoding or tool use override this; the default
+        relies on the prompt alone to ask for JSON.
+
+        Args:
+            prompt (str): The question, asking for a JSON answer
+            schema (dict): JSON schema the answer must follow
+            system (Optional[str]): Shared instructions (see generate())
+
+        Returns:
+            str: Generated JSON text
+        """
+        return self.generate(prompt, system)
+
+    async def agenerate_structured(
+        self, prompt: str, schema: dict, system: Optional[str] = None
+    ) -> str:
+        """
+        Async variant of generate_structured().
+
+        Args:
+            prompt (str): The question, asking for a JSON answer
+            schema (dict): JSON schema the answer must follow
+            system (Optional[str]): Shared instructions (see generate())
+
+        Returns:
+            str: Generated JSON text
+        """
+        return await asyncio.to_thread(self.generate_structured, prompt, schema, system)
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        """
+        Generate a response as a stream of text fragments.
+
+        Closing the iterator early cancels the request. Backends without native
+        streaming yield the whole response at once.
+
+        Args:
+            prompt (str): The question
+            system (Optional[str]): Shared instructions (see generate())
+
+        Yields:
+            str: Successive fragments of the generated text
+        """
+        yield self.generate(prompt, system)
+
+    async def astream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Async variant of stream(); closing the iterator early cancels the request.
+
+        Args:
+            prompt (str): The question
+            system (Optional[str]): Shared instructions (see generate())
+
+        Yields:
+            str: Successive fragments of the generated text
+        """
+        yield await self.agenerate(prompt, system)
+
+    def context_window(self) -> int:
+        """
+        Return how many tokens (prompt plus response) one request may use.
+
+        Returns:
+            int: Context window size in tokens
+        """
+        return 8192
+
+    def cache_identity(self) -> dict:
+        """
+        Describe everything besides the prompt that shapes a response.
+
+        Response caches key on this, so backends include their model and
+        generation parameters.
+
+        Returns:
+            dict: JSON-serializable description of the backend
+        """
+        return {"backend": type(self).__name__}
+
+    def reject(self, prompt: str, schema: Optional[dict] = None, system: Optional[str] = None):
+        """
+        Signal that the response to `prompt` was unusable.
+
+        Wrappers that remember responses (such as a cache) drop them so a retry
+        asks the model again; plain backends ignore this.
+
+        Args:
+            prompt (str): The prompt whose response was rejected
+            schema (Optional[dict]): The schema, if the response came from generate_structured()
+            system (Optional[str]): The system instructions the prompt was sent with
+        """
+        pass
+
+
+class WrappedInference(InferenceBase):
+    """
+    Base class for wrappers that add behaviour (caching, scheduling, pooling) around a backend.
+
+    Settings the wrapper does not define itself (model, max_tokens, ...) are read from the
+    backend returned by wrapped(), as are its cache identity and context window.
+    """
+
+    # Attribute that wrapped() reads; never delegated, so a half-initialized wrapper cannot recurse
+    _inner_attribute = "inner"
+
+    def wrapped(self) -> InferenceBase:
+        """
+        Return the backend whose settings this wrapper exposes.
+
+        Returns:
+            InferenceBase: The wrapped backend
+        """
+        return self.inner
+
+    def __getattr__(self, name):
+        # Only reached for attributes the wrapper lacks
+        if name.startswith("_") or name == self._inner_attribute:
+            raise AttributeError(name)
+        return getattr(self.wrapped(), name)
+
+    def cache_identity(self) -> dict:
+        return self.wrapped().cache_identity()
+
+    def context_window(self) -> int:
+        return self.wrapped().context_window()
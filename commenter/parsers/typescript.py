@@ -1,8 +1,149 @@
+import atexit
+import hashlib
+import itertools
 import os
-from typing import List, Tuple
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple
 import subprocess
 import json
 import tempfile
+from ..cache import SQLiteCache, default_cache_dir
+from ..metrics import get_metrics
+
+
+class _NodeWorker:
+    """A long-lived node process that answers one parse request per line."""
+
+    def __init__(self, script: str, timeout: float = 60.0):
+        """
+        Prepare the worker; the node process itself is started lazily.
+
+        Args:
+            script (str): Source of the AST generator script to run
+            timeout (float): Seconds to wait for an answer before node is considered hung
+        """
+        self._script = script
+        self.timeout = timeout
+        self._temp_dir = None
+        self._process = None
+        self._lines = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Write the generator script to disk and spawn node."""
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="commenter-")
+            with open(os.path.join(self._temp_dir, "parser.js"), "w") as f:
+                f.write(self._script)
+
+        self._process = subprocess.Popen(
+            ["node", os.path.join(self._temp_dir, "parser.js")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        # stdout is read on its own thread so a hung node cannot block a request forever;
+        # every process gets a fresh queue, so a killed one's late output is never mistaken for an answer
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._read_lines, args=(self._process.stdout, self._lines), name="node-worker-reader", daemon=True
+        ).start()
+
+    @staticmethod
+    def _read_lines(stdout, lines: queue.Queue):
+        try:
+            for line in stdout:
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            lines.put(None)
+            stdout.close()
+
+    def _is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _round_trip(self, file_path: str) -> Optional[str]:
+        """Send one request and read one answer; returns None if node died and raises queue.Empty if it hung."""
+        if not self._is_alive():
+            self._start()
+        try:
+            self._process.stdin.write(json.dumps(file_path) + "\n")
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return None
+        return self._lines.get(timeout=self.timeout)
+
+    def request(self, file_path: str) -> list:
+        """
+        Ask the worker for the raw element list of a file.
+
+        Args:
+            file_path (str): Path to the TypeScript file
+
+        Returns:
+            list: Element dictionaries as produced by the generator script
+        """
+        with self._lock:
+            try:
+                line = self._round_trip(os.path.abspath(file_path))
+                if line is None:
+                    # The process crashed (or was killed); restart it once and retry.
+                    self._kill()
+                    line = self._round_trip(os.path.abspath(file_path))
+            except queue.Empty:
+                # A hung node is not retried on the same file; the next request starts a new one
+                self._kill()
+                raise Exception(
+                    f"Failed to parse TypeScript file: node worker did not answer within "
+                    f"{self.timeout:g}s while parsing {file_path}"
+                )
+            if line is None:
+                self._kill()
+                raise Exception(
+                    f"Failed to parse TypeScript file: node worker exited while parsing {file_path}"
+                )
+
+        try:
+            response = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise Exception(f"Failed to parse TypeScript file: {str(e)}")
+        if not response.get("ok"):
+            raise Exception(f"Failed to parse TypeScript file: {response.get('error')}")
+        return response["elements"]
+
+    def _kill(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            # The reader thread closes stdout once it sees the end of the output
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            self._process = None
+
+    def close(self):
+        """Stop the node process and remove the generator script."""
+        with self._lock:
+            if self._is_alive():
+                # Closing stdin ends the readline loop so node exits on its own.
+                try:
+                    self._process.stdin.close()
+                    self._process.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+            if self._temp_dir is not None:
+                shutil.rmtree(self._temp_dir, ignore_errors=True)
+                self._temp_dir = None
 
 
 class TypeScriptParser:
@@ -14,17 +155,9 @@ class TypeScriptParser:
         return """
     const ts = require('typescript');
 const fs = require('fs');
+const readline = require('readline');
 
-const fileName = process.argv[2];
-const sourceCode = fs.readFileSync(fileName, 'utf-8');
-const sourceFile = ts.createSourceFile(
-    fileName,
-    sourceCode,
-    ts.ScriptTarget.Latest,
-    true
-);
-
-function getNodePosition(node) {
+function getNodePosition(sourceFile, node) {
     const { line, character } = sourceFile.getLineAndCharacterOfPosition(node.getStart());
     return {
         startLine: line + 1,
@@ -34,7 +167,7 @@ function getNodePosition(node) {
     };
 }
 
-function extractElements(node) {
+function extractElements(sourceFile) {
     const elements = [];
     
     function visit(node) {
@@ -46,7 +179,7 @@ function extractElements(node) {
                 if (declaration.initializer && 
                     (ts.isArrowFunction(declaration.initializer) || ts.isFunctionExpression(declaration.initializer))) {
                     const name = declaration.name.getText();
-                    const pos = getNodePosition(node);
+                    const pos = getNodePosition(sourceFile, node);
                     const params = declaration.initializer.parameters.map(p => ({
                         name: p.name.getText(),
                         type: p.type ? p.type.getText() : 'any'
@@ -72,7 +205,7 @@ function extractElements(node) {
         
         if (ts.isFunctionDeclaration(node) || ts.isMethodDeclaration(node)) {
             const name = node.name ? node.name.getText() : 'anonymous';
-            const pos = getNodePosition(node);
+            const pos = getNodePosition(sourceFile, node);
             const params = node.parameters.map(p => ({
                 name: p.name.getText(),
                 type: p.type ? p.type.getText() : 'any'
@@ -90,19 +223,19 @@ function extractElements(node) {
             element = {
                 type: 'class',
                 name: node.name.getText(),
-                pos: getNodePosition(node)
+                pos: getNodePosition(sourceFile, node)
             };
         } else if (ts.isTypeAliasDeclaration(node)) {
             element = {
                 type: 'type',
                 name: node.name.getText(),
-                pos: getNodePosition(node)
+                pos: getNodePosition(sourceFile, node)
             };
         } else if (ts.isInterfaceDeclaration(node)) {
             element = {
                 type: 'interface',
                 name: node.name.getText(),
-                pos: getNodePosition(node)
+                pos: getNodePosition(sourceFile, node)
             };
         }
         
@@ -117,8 +250,28 @@ function extractElements(node) {
     return elements;
 }
 
-const elements = extractElements(sourceFile);
-console.log(JSON.stringify(elements, null, 2));
+// Each stdin line is a JSON-encoded file path; each stdout line is the JSON answer.
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+rl.on('line', (line) => {
+    if (!line.trim()) {
+        return;
+    }
+    let response;
+    try {
+        const fileName = JSON.parse(line);
+        const sourceCode = fs.readFileSync(fileName, 'utf-8');
+        const sourceFile = ts.createSourceFile(
+            fileName,
+            sourceCode,
+            ts.ScriptTarget.Latest,
+            true
+        );
+        response = { ok: true, elements: extractElements(sourceFile) };
+    } catch (e) {
+        response = { ok: false, error: String(e && e.message ? e.message : e) };
+    }
+    process.stdout.write(JSON.stringify(response) + '\\n');
+});
 """
 
     @staticmethod
@@ -127,42 +280,193 @@ console.log(JSON.stringify(elements, null, 2));
         lines = file_content.split("\n")
         return "\n".join(lines[start_line - 1 : end_line])
 
-    def parse_file(self, file_path: str) -> List[Tuple[str, str, dict]]:
+    def __init__(
+        self, workers: Optional[int] = None, cache: Optional[SQLiteCache] = None, timeout: float = 60.0
+    ):
+        """
+        Initialize the parser; node workers are started on first use.
+
+        Args:
+            workers (Optional[int]): Default number of node workers used by
+                parse_files (defaults to the CPU count)
+            cache (Optional[SQLiteCache]): Parse result cache, or None to always run node
+            timeout (float): Seconds a node worker may take on one file before it is killed
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.cache = cache
+        self.timeout = timeout
+        self._script = self._create_ast_generator_script()
+        self._script_hash = hashlib.sha256(self._script.encode("utf-8")).hexdigest()
+        self._idle_workers = queue.LifoQueue()
+        self._all_workers = []
+        self._pool_lock = threading.Lock()
+
+    def _acquire_worker(self, limit: int) -> _NodeWorker:
+        """Take an idle worker, spawning a new one while fewer than `limit` exist."""
+        try:
+            return self._idle_workers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._all_workers) < limit:
+                worker = _NodeWorker(self._script, self.timeout)
+                self._all_workers.append(worker)
+                return worker
+        return self._idle_workers.get()
+
+    def _release_worker(self, worker: _NodeWorker):
+        self._idle_workers.put(worker)
+
+    def close(self):
+        """Shut down every node worker and the parse cache."""
+        with self._pool_lock:
+            for worker in self._all_workers:
+                worker.close()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def parse_file(self, file_path: str, workers: int = 1) -> List[Tuple[str, str, dict]]:
         """
         Parse a TypeScript file and extract function, class, type, and interface information.
 
         Args:
             file_path (str): Path to the TypeScript file
+            workers (int): Node workers the pool may grow to, for callers parsing from several threads
 
         Returns:
             List[Tuple[str, str, dict]]: List of tuples containing
                 (element_name, element_code, metadata)
         """
-        with tempfile.TemporaryDirectory() as temp_dir:
-            parser_path = os.path.join(temp_dir, "parser.js")
-            with open(parser_path, "w") as f:
-                f.write(self._create_ast_generator_script())
+        return self._parse_with_limit(file_path, max(1, workers))
 
-            with open(file_path, "r") as f:
-                file_content = f.read()
+    def _parse_with_limit(self, file_path: str, limit: int) -> List[Tuple[str, str, dict]]:
+        started = time.perf_counter()
+        with open(file_path, "r") as f:
+            file_content = f.read()
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(file_path, file_content)
+            cached = self.cache.get(cache_key)
+            get_metrics().record_cache("parse", cached is not None)
+            if cached is not None:
+                get_metrics().record_parse(file_path, time.perf_counter() - started, True)
+                return [tuple(element) for element in json.loads(cached)]
+
+        worker = self._acquire_worker(limit)
+        try:
+            elements_data = worker.request(file_path)
+        finally:
+            self._release_worker(worker)
+
+        elements = []
+        for elem in elements_data:
+            code = self._extract_code_segment(
+                file_content, elem["pos"]["startLine"], elem["pos"]["endLine"]
+            )
+            metadata = {k: v for k, v in elem.items()}
+            elements.append((elem["name"], code, metadata))
+
+        if cache_key is not None:
+            self.cache.put(cache_key, json.dumps(elements))
+        get_metrics().record_parse(file_path, time.perf_counter() - started, False)
+        return elements
+
+    def _cache_key(self, file_path: str, file_content: str) -> str:
+        """Key a parse on the file content, its extension (ts vs tsx syntax) and the generator script."""
+        content_hash = hashlib.sha256(file_content.encode("utf-8")).hexdigest()
+        extension = os.path.splitext(file_path)[1].lower()
+        return f"parse:{self._script_hash}:{extension}:{content_hash}"
+
+    def parse_files(
+        self, file_paths: Iterable[str], workers: Optional[int] = None
+    ) -> Iterator[Tuple[str, Optional[List[Tuple[str, str, dict]]], Optional[Exception]]]:
+        """
+        Parse many TypeScript files across a pool of node workers.
+
+        Results are yielded in completion order. A file that fails to parse is
+        reported with its exception instead of stopping the batch. `file_paths` is
+        consumed lazily and at most two files per worker are parsed ahead of the
+        consumer, so a slow consumer does not pile up parse results in memory.
+
+        Args:
+            file_paths (Iterable[str]): Paths to the TypeScript files
+            workers (Optional[int]): Number of node workers (defaults to self.workers)
+
+        Yields:
+            Tuple[str, Optional[list], Optional[Exception]]: (file_path, elements, error)
+                where exactly one of elements and error is set
+        """
+        limit = max(1, workers or self.workers)
+        paths = iter(file_paths)
+        with ThreadPoolExecutor(max_workers=limit) as executor:
+            futures = {}
+            while True:
+                for path in itertools.islice(paths, 2 * limit - len(futures)):
+                    futures[executor.submit(self._parse_with_limit, path, limit)] = path
+                if not futures:
+                    return
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = futures.pop(future)
+                    try:
+                        yield path, future.result(), None
+                    except Exception as e:
+                        yield path, None, e
+
+
+_shared_parser: Optional[TypeScriptParser] = None
+_shared_lock = threading.RLock()
+
+
+def configure_parser(
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+    cache_dir: Optional[str] = None,
+    cache_max_bytes: int = 256 * 1024 * 1024,
+) -> TypeScriptParser:
+    """
+    Replace the process-wide parser with one built from the given settings.
+
+    Args:
+        workers (Optional[int]): Default number of node workers for parse_files
+        use_cache (bool): Whether to keep parse results in the on-disk cache
+        cache_dir (Optional[str]): Cache directory (defaults to default_cache_dir())
+        cache_max_bytes (int): Size limit of the parse cache before LRU eviction
+
+    Returns:
+        TypeScriptParser: The new shared parser
+    """
+    global _shared_parser
+    cache = None
+    if use_cache:
+        cache = SQLiteCache(
+            os.path.join(cache_dir or default_cache_dir(), "parse.sqlite"),
+            max_bytes=cache_max_bytes,
+        )
+    with _shared_lock:
+        if _shared_parser is not None:
+            _shared_parser.close()
+        _shared_parser = TypeScriptParser(workers=workers, cache=cache)
+        return _shared_parser
+
+
+def get_parser() -> TypeScriptParser:
+    """Return the process-wide parser so every caller reuses one node worker pool."""
+    with _shared_lock:
+        if _shared_parser is None:
+            configure_parser()
+        return _shared_parser
 
-            try:
-                result = subprocess.run(
-                    ["node", parser_path, file_path],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                )
-                elements_data = json.loads(result.stdout)
-            except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
-                raise Exception(f"Failed to parse TypeScript file: {str(e)}")
-
-            elements = []
-            for elem in elements_data:
-                code = self._extract_code_segment(
-                    file_content, elem["pos"]["startLine"], elem["pos"]["endLine"]
-                )
-                metadata = {k: v for k, v in elem.items()}
-                elements.append((elem["name"], code, metadata))
 
-            return elements
+@atexit.register
+def _close_shared_parser():
+    if _shared_parser is not None:
+        _shared_parser.close()
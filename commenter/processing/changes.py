@@ -0,0 +1,145 @@
+import difflib
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, Iterable, List, Set, Tuple
+
+_HUNK_PATTERN = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# Per changed file (absolute path with symlinks resolved, as os.path.realpath returns it),
+# the 1-based inclusive line ranges touched in its current version
+ChangedLines = Dict[str, List[Tuple[int, int]]]
+
+
+class GitError(RuntimeError):
+    """Raised when git is missing, the path is not in a repository or the revision is unknown."""
+
+
+def _git(repo_path: str, *args: str) -> str:
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo_path, *args], capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError as e:
+        raise GitError("git is not installed") from e
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.strip() or f"git {args[0]} failed") from e
+    return result.stdout
+
+
+def parse_diff(diff: str, root: str) -> ChangedLines:
+    """
+    Collect the changed line ranges of every file in a `git diff --unified=0` output.
+
+    Pure deletions count as touching the line they were removed before, so an element
+    that only lost lines is still seen as changed. Deleted files are left out.
+
+    Args:
+        diff (str): Output of git diff with zero context lines
+        root (str): Directory the diff's paths are relative to (the repository top level)
+
+    Returns:
+        ChangedLines: Per absolute file path, its changed line ranges
+    """
+    changed: ChangedLines = {}
+    current = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            target = line[4:]
+            if target == "/dev/null":
+                current = None
+            else:
+                # Strip the b/ prefix git puts on the new side
+                current = os.path.join(root, target[2:] if target.startswith("b/") else target)
+                changed.setdefault(current, [])
+        elif current is not None and line.startswith("@@"):
+            match = _HUNK_PATTERN.match(line)
+            if match:
+                start = int(match.group(1))
+                count = 1 if match.group(2) is None else int(match.group(2))
+                if count == 0:
+                    changed[current].append((max(start, 1), max(start, 1)))
+                else:
+                    changed[current].append((start, start + count - 1))
+    return changed
+
+
+def changed_lines(repo_path: str, since: str) -> ChangedLines:
+    """
+    Ask git which files under `repo_path` changed since a revision, and where.
+
+    Committed and uncommitted changes are both included; untracked files count as
+    changed throughout.
+
+    Args:
+        repo_path (str): Directory inside a git repository
+        since (str): Base revision (commit, branch, tag, e.g. "origin/main" or "HEAD~1")
+
+    Returns:
+        ChangedLines: Per real file path (see os.path.realpath), its changed line ranges
+    """
+    # git reports the top level with symlinks resolved; callers must look files up by realpath
+    root = _git(repo_path, "rev-parse", "--show-toplevel").strip()
+    scope = os.path.abspath(repo_path)
+    diff = _git(
+        repo_path,
+        "diff", "--unified=0", "--no-color", "--no-ext-diff", "--no-renames", since, "--", scope,
+    )
+    changed = parse_diff(diff, root)
+    untracked = _git(repo_path, "ls-files", "--others", "--exclude-standard", "--full-name", "--", scope)
+    for name in untracked.splitlines():
+        changed[os.path.join(root, name)] = [(1, sys.maxsize)]
+    return {os.path.realpath(path): ranges for path, ranges in changed.items()}
+
+
+def diff_lines(old_lines: List[str], new_lines: List[str]) -> List[Tuple[int, int]]:
+    """
+    Compute changed line ranges between two versions of a file without git.
+
+    Ranges follow the same rules as parse_diff: they refer to `new_lines`, and a pure
+    deletion touches the line before it.
+
+    Args:
+        old_lines (List[str]): Earlier version of the file
+        new_lines (List[str]): Current version of the file
+
+    Returns:
+        List[Tuple[int, int]]: 1-based inclusive line ranges
+    """
+    ranges = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, _, _, start, end in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if end > start:
+            ranges.append((start + 1, end))
+        else:
+            ranges.append((max(start, 1), max(start, 1)))
+    return ranges
+
+
+def overlaps(ranges: Iterable[Tuple[int, int]], start_line: int, end_line: int) -> bool:
+    """Whether any changed range touches the inclusive line span [start_line, end_line]."""
+    return any(start <= end_line and start_line <= end for start, end in ranges)
+
+
+def affected_directories(files: Iterable[str], repo_path: str) -> Set[str]:
+    """
+    Return the directories containing `files` and all their ancestors up to `repo_path`.
+
+    Args:
+        files (Iterable[str]): Changed file paths
+        repo_path (str): Root of the processed tree
+
+    Returns:
+        Set[str]: Directory paths with symlinks resolved (see os.path.realpath)
+    """
+    root = os.path.realpath(repo_path)
+    directories = {root}
+    for file_path in files:
+        directory = os.path.dirname(os.path.realpath(file_path))
+        while directory not in directories and directory.startswith(root + os.sep):
+            directories.add(directory)
+            directory = os.path.dirname(directory)
+    return directories
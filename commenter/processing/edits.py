@@ -0,0 +1,152 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence, Tuple
+from ..metrics import get_metrics
+
+# The umask can only be read by setting it; do that once, before any writer threads start
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class FileChangedError(RuntimeError):
+    """Raised instead of overwriting a file that changed since its content was read."""
+
+
+@contextmanager
+def atomic_open(file_path: str, expected: Optional[str] = None):
+    """
+    Open a text file for writing so that it is replaced in one step when the block ends.
+
+    The content goes to a temporary file in the same directory, which is fsynced and then
+    renamed over `file_path`; an interrupted write leaves the original file untouched.
+
+    Args:
+        file_path (str): Destination path
+        expected (Optional[str]): Content the file must still have right before it is
+            replaced; if someone else saved it in the meantime, FileChangedError is raised
+            and the file is left as they saved it
+
+    Yields:
+        TextIO: The temporary file to write to
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".commenter-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if expected is not None and _read_text(file_path) != expected:
+            raise FileChangedError(f"{file_path} changed while it was being processed")
+        try:
+            mode = os.stat(file_path).st_mode & 0o7777
+        except FileNotFoundError:
+            # mkstemp creates the file as 0600; give a new file the mode open() would have
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_text(file_path: str) -> Optional[str]:
+    try:
+        with open(file_path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class EditConflictError(ValueError):
+    """Raised when two edits in a plan touch the same lines."""
+
+
+class EditPlan:
+    """Collects line-range replacements for a file and applies them in one linear pass."""
+
+    # Above this many bytes the result is streamed to disk instead of joined in memory
+    STREAM_THRESHOLD = 1024 * 1024
+
+    def __init__(self):
+        self._edits: List[Tuple[int, int, List[str]]] = []
+
+    def __len__(self) -> int:
+        return len(self._edits)
+
+    def replace(self, start: int, end: int, new_lines: Sequence[str]):
+        """
+        Schedule replacing lines[start:end] of the original file with `new_lines`.
+
+        Args:
+            start (int): First original line (0-based) to replace
+            end (int): Line after the last one to replace; equal to start for a pure insertion
+            new_lines (Sequence[str]): Replacement lines, each ending in a newline
+        """
+        if not 0 <= start <= end:
+            raise ValueError(f"Invalid edit span [{start}, {end})")
+        self._edits.append((start, end, list(new_lines)))
+
+    def _sorted_edits(self) -> List[Tuple[int, int, List[str]]]:
+        edits = sorted(self._edits, key=lambda edit: (edit[0], edit[1]))
+        for previous, current in zip(edits, edits[1:]):
+            # Spans may touch but not overlap, and two edits may not claim the same insertion point
+            if current[0] < previous[1] or current[0] == previous[0]:
+                raise EditConflictError(
+                    f"Edits [{previous[0]}, {previous[1]}) and [{current[0]}, {current[1]}) overlap"
+                )
+        return edits
+
+    def iter_lines(self, lines: Sequence[str]) -> Iterator[str]:
+        """
+        Yield the edited file line by line.
+
+        Args:
+            lines (Sequence[str]): The original lines the edit spans refer to
+
+        Yields:
+            str: Lines of the edited file
+        """
+        edits = self._sorted_edits()
+        if edits and edits[-1][1] > len(lines):
+            raise ValueError(f"Edit span ends at line {edits[-1][1]} past the end of the file")
+        position = 0
+        for start, end, new_lines in edits:
+            yield from lines[position:start]
+            yield from new_lines
+            position = end
+        yield from lines[position:]
+
+    def apply(self, lines: Sequence[str]) -> List[str]:
+        """Return the edited lines as a new list."""
+        return list(self.iter_lines(lines))
+
+    def write(self, lines: Sequence[str], file_path: str) -> int:
+        """
+        Write the edited file atomically, streaming it when it is large.
+
+        The file must still consist of `lines` when it is replaced; otherwise it was saved
+        by someone else in the meantime and FileChangedError is raised without writing.
+
+        Args:
+            lines (Sequence[str]): The original lines the edit spans refer to
+            file_path (str): Destination path
+
+        Returns:
+            int: Number of characters written
+        """
+        size = sum(len(line) for line in lines)
+        size += sum(len(line) for _, _, new_lines in self._edits for line in new_lines)
+        written = 0
+        with atomic_open(file_path, expected="".join(lines)) as f:
+            if size > self.STREAM_THRESHOLD:
+                for line in self.iter_lines(lines):
+                    written += f.write(line)
+            else:
+                written = f.write("".join(self.iter_lines(lines)))
+        get_metrics().record_write(file_path, written)
+        return written
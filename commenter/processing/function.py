@@ -1,7 +1,16 @@
+import asyncio
 import os
+import time
+from typing import List, Optional, Tuple
 from ..models.base import InferenceBase
 from ..formatters.comment import CommentFormatter
-from ..parsers.typescript import TypeScriptParser
+from ..formatters.stream import COMPLETE, MALFORMED, ElementStreamParser
+from ..parsers.typescript import TypeScriptParser, get_parser
+from .. import runtime
+from ..console import detail
+from ..metrics import estimate_tokens, get_metrics
+from .edits import EditPlan
+from .slug_index import SlugIndex
 from termcolor import colored
 
 def process_element(
@@ -9,118 +18,205 @@ def process_element(
     formatter: CommentFormatter,
     file_path: str,
     slug: str,
+    parser: Optional[TypeScriptParser] = None,
+    incremental: bool = False,
+    slug_index: Optional[SlugIndex] = None,
+    stream: bool = False,
+    structured: bool = False,
 ):
     """Processes an element (function, interface, class, type, etc.) in a TypeScript file by adding/updating its comment using the provided slug."""
-    parser = TypeScriptParser()
+    process_slugs(
+        inference, formatter, file_path, [slug], parser, incremental, slug_index, stream, structured
+    )
 
-    # Read file content
-    with open(file_path, "r") as f:
-        lines = f.readlines()
+def process_slugs(
+    inference: InferenceBase,
+    formatter: CommentFormatter,
+    search_path: str,
+    slugs: List[str],
+    parser: Optional[TypeScriptParser] = None,
+    incremental: bool = False,
+    slug_index: Optional[SlugIndex] = None,
+    stream: bool = False,
+    structured: bool = False,
+):
+    """Processes the elements with the given slugs, parsing and writing each affected file only once.
 
-    # Parse elements from file
-    elements = parser.parse_file(file_path)
+    With a slug index, slugs are located without scanning the repository; unknown slugs trigger an
+    incremental index of `search_path` (a file or directory). Without one, `search_path` must be the file."""
+    parser = parser or get_parser()
 
-    for name, element_code, metadata in elements:
-        comment_slug = extract_slug_from_comment(
-            lines, metadata.get("pos", {}).get("startLine", 1) - 1
-        )
-        if comment_slug != slug:
-            continue
-        if name == "anonymous":
-            print(colored("Skipping anonymous function", "yellow"))
-            continue
+    if slug_index is not None:
+        by_file = slug_index.resolve(slugs, search_path)
+    else:
+        with open(search_path, "r") as f:
+            entries = SlugIndex.scan_lines(f.readlines())
+        wanted_slugs = set(slugs)
+        by_file = {search_path: [entry for entry in entries if entry["slug"] in wanted_slugs]}
 
-        updated_lines, insertion_offsets = insert_comment(
-            inference, formatter, file_path, lines, name, element_code, metadata
-        )
+    found = set()
+    for file_path, entries in by_file.items():
+        wanted = {entry["line"]: entry["slug"] for entry in entries}
 
-        # Write updated content back to the file
-        with open(file_path, "w") as f:
-            f.writelines(updated_lines)
+        with open(file_path, "r") as f:
+            lines = f.readlines()
+        elements = [
+            element
+            for element in parser.parse_file(file_path)
+            if element[2].get("pos", {}).get("startLine") in wanted
+        ]
+        requests = build_comment_requests(formatter, file_path, lines, elements, incremental)
+        plan = EditPlan()
+        generated = {}  # start line -> whether a comment was generated
+        for request in requests:
+            started = time.perf_counter()
+            formatted_comment = generate_comment(inference, formatter, request, stream, structured)
+            request["seconds"] = time.perf_counter() - started
+            record_comment(request, formatted_comment)
+            generated[request["start_line"]] = formatted_comment is not None
+            if formatted_comment is not None:
+                plan_comment(plan, lines, request, formatted_comment)
 
-        print(colored(f"Processed element with slug: {slug} in {file_path}", "green"))
-        return
+        # Write updated content back to the file
+        if plan:
+            plan.write(lines, file_path)
+        if slug_index is not None:
+            slug_index.index_file(file_path)
 
-    print(colored(f"Element with slug {slug} not found in {file_path}", "red"))
+        for _, _, metadata in elements:
+            start_line = metadata["pos"]["startLine"]
+            slug = wanted[start_line]
+            found.add(slug)
+            outcome = generated.get(start_line - 1)
+            if outcome is None:
+                detail(f"Skipped unchanged element with slug: {slug} in {file_path}", "yellow")
+            elif outcome:
+                detail(f"Processed element with slug: {slug} in {file_path}", "green")
+            else:
+                print(colored(f"Failed to document element with slug {slug} in {file_path}", "red"))
 
-def extract_slug_from_comment(lines, start_line):
-    """Extracts the slug from the comment above an element."""
-    for i in range(start_line - 1, -1, -1):
-        line = lines[i].strip()
-        if "@generated" in line:
-            parts = line.split()
-            for part in parts:
-                if len(part) == 6 and part.isalnum():
-                    return part
-    return None
+    for slug in slugs:
+        if slug not in found:
+            print(colored(f"Element with slug {slug} not found in {search_path}", "red"))
 
-def process_file(inference: InferenceBase, formatter: CommentFormatter, file_path: str):
-    """Processes all elements in a TypeScript file by adding/updating comments."""
-    parser = TypeScriptParser()
+def process_file(
+    inference: InferenceBase,
+    formatter: CommentFormatter,
+    file_path: str,
+    parser: Optional[TypeScriptParser] = None,
+    elements: Optional[List[Tuple[str, str, dict]]] = None,
+    incremental: bool = False,
+    concurrency: int = 1,
+    slug_index: Optional[SlugIndex] = None,
+    batch_tokens: Optional[int] = None,
+    stream: bool = False,
+    structured: bool = False,
+):
+    """Processes all elements in a TypeScript file by adding/updating comments. Pass `elements` to reuse an earlier parse.
 
+    Every prompt is built up front and all comment edits are applied to the file in one pass.
+    With `incremental`, elements whose code hash matches their existing comment are left untouched.
+    With `concurrency` above 1, up to that many inference requests run at once.
+    A `slug_index`, if given, is updated with the file's slugs afterwards.
+    With `batch_tokens`, small elements are packed into shared prompts of about that many tokens.
+    With `stream`, responses are checked as they arrive and cut off once the element is complete or malformed.
+    With `structured`, the backend answers in schema-constrained JSON and only missing fields are re-requested."""
     # Read file content
     with open(file_path, "r") as f:
         lines = f.readlines()
 
     # Parse elements from file
-    elements = parser.parse_file(file_path)
+    if elements is None:
+        elements = (parser or get_parser()).parse_file(file_path)
     if not elements:
         print(colored(f"No elements found in {file_path}", "red"))
         return
 
-    updated_lines = lines[:]
-    insertion_offsets = 0
+    requests = build_comment_requests(formatter, file_path, lines, elements, incremental)
+    comments = generate_comments(
+        inference, formatter, requests, concurrency, batch_tokens, stream, structured
+    )
+    plan = plan_comments(lines, requests, comments)
+
+    # Write updated content back to the file
+    if plan:
+        plan.write(lines, file_path)
+    if slug_index is not None:
+        slug_index.index_file(file_path)
+
+    print(colored(f"Finished processing {file_path}", "green"))
+
+def generate_comments(
+    inference, formatter, requests, concurrency=1, batch_tokens=None, stream=False, structured=False
+):
+    """Generates the comments for a file's requests, in request order; failed ones are None."""
+    if concurrency > 1 or batch_tokens:
+        return runtime.run(
+            _agenerate_comments(
+                inference, formatter, requests, concurrency, batch_tokens, stream, structured
+            )
+        )
+    comments = []
+    for request in requests:
+        started = time.perf_counter()
+        comments.append(generate_comment(inference, formatter, request, stream, structured))
+        request["seconds"] = time.perf_counter() - started
+    return comments
+
+def plan_comments(lines, requests, comments):
+    """Records each request's outcome and collects the generated comments into one EditPlan."""
+    plan = EditPlan()
+    for request, formatted_comment in zip(requests, comments):
+        record_comment(request, formatted_comment)
+        if formatted_comment is not None:
+            plan_comment(plan, lines, request, formatted_comment)
+    return plan
 
+def build_comment_requests(formatter, file_path, lines, elements, incremental=False):
+    """Builds comment requests for every element of a file, skipping anonymous and unchanged ones."""
+    requests = {}
     for element_name, element_code, metadata in elements:
         if element_name == "anonymous":
-            print(colored("Skipping anonymous function", "yellow"))
+            detail("Skipping anonymous function", "yellow")
             continue
-        updated_lines, insertion_offsets = insert_comment(
-            inference,
-            formatter,
-            file_path,
-            updated_lines,
-            element_name,
-            element_code,
-            metadata,
-            insertion_offsets,
+        request = build_comment_request(
+            formatter, file_path, lines, element_name, element_code, metadata, incremental
         )
+        if request is not None:
+            # Elements declared on the same line share one comment; the last one wins
+            requests[request["start_line"]] = request
+    return list(requests.values())
 
-    # Write updated content back to the file
-    with open(file_path, "w") as f:
-        f.writelines(updated_lines)
-
-    print(colored(f"Finished processing {file_path}", "green"))
-
-def insert_comment(
-    inference,
+def build_comment_request(
     formatter,
     file_path,
     lines,
     element_name,
     element_code,
     metadata,
-    insertion_offsets=0,
+    incremental=False,
 ):
-    """Inserts or updates a comment for a given element (function, class, interface, type, etc.)."""
-    print(colored(f"Processing element: {element_name}", "cyan"))
+    """Locates an element's existing comment and builds its prompt; returns None when the element can be skipped."""
+    detail(f"Processing element: {element_name}", "cyan")
 
-    start_line = metadata.get("pos", {}).get("startLine", 1) - 1 + insertion_offsets
-    previous_comment = []
-    comment_start = start_line - 1
+    start_line = metadata.get("pos", {}).get("startLine", 1) - 1
+    comment_start = start_line
 
-    while comment_start >= 0 and (
-        lines[comment_start].strip().startswith("/*")
-        or lines[comment_start].strip().startswith("*")
+    while comment_start > 0 and (
+        lines[comment_start - 1].strip().startswith("/*")
+        or lines[comment_start - 1].strip().startswith("*")
     ):
-        previous_comment.insert(0, lines[comment_start])
-        del lines[comment_start]
-        start_line -= 1
-        insertion_offsets -= 1
         comment_start -= 1
 
+    previous_comment = lines[comment_start:start_line]
     previous_comment_text = "".join(previous_comment) if previous_comment else None
-    # print(metadata)
+
+    code_hash = formatter.code_hash(element_code)
+    if incremental and formatter.extract_code_hash(previous_comment_text) == code_hash:
+        detail(f"Unchanged, keeping existing comment: {element_name}", "yellow")
+        get_metrics().record_element(file_path, element_name, "unchanged")
+        return None
+
     param_strings = [
         f"{param.get('name', 'unknown')}: {param.get('type', 'unknown')}"
         for param in metadata.get("params", [])
@@ -138,16 +234,263 @@ def insert_comment(
         f"\nStart Line: {metadata.get('pos', {}).get('startLine', 'unknown')}\n"
         f"End Line: {metadata.get('pos', {}).get('endLine', 'unknown')}"
     )
-    # print(context)
-    prompt = formatter.create_prompt(element_code, context=context)
+
+    return {
+        "file_path": file_path,
+        "name": element_name,
+        "code": element_code,
+        "context": context,
+        "metadata": metadata,
+        "start_line": start_line,
+        "comment_start": comment_start,
+        "previous_comment": previous_comment_text,
+        "code_hash": code_hash,
+        "prompt": formatter.create_prompt(element_code, context=context),
+        "system": formatter.system_prompt(),
+    }
+
+def generate_comment(inference, formatter, request, stream=False, structured=False):
+    """Runs inference for a comment request, retrying unparseable output; returns None on failure."""
+    if structured:
+        return generate_structured_comment(inference, formatter, request)
     formatted_comment = "None"
     retry_count = 0
     while(formatted_comment == "None" and retry_count < 3):
         retry_count += 1
-        raw_comment = inference.generate(prompt)
-        formatted_comment = formatter.format_comment(raw_comment, previous_comment_text, metadata)
+        if stream:
+            raw_comment = stream_element(inference, request["prompt"], request["system"])
+        else:
+            raw_comment = inference.generate(request["prompt"], system=request["system"])
+        if raw_comment is not None:
+            formatted_comment = formatter.format_comment(
+                raw_comment, request["previous_comment"], request["metadata"], request["code_hash"]
+            )
+        if formatted_comment == "None":
+            inference.reject(request["prompt"], system=request["system"])
     if formatted_comment == "None":
-        return lines, insertion_offsets
+        return None
+    return formatted_comment
+
+async def agenerate_comment(inference, formatter, request, stream=False, structured=False):
+    """Async variant of generate_comment built on InferenceBase.agenerate."""
+    if structured:
+        return await agenerate_structured_comment(inference, formatter, request)
+    formatted_comment = "None"
+    retry_count = 0
+    while(formatted_comment == "None" and retry_count < 3):
+        retry_count += 1
+        if stream:
+            raw_comment = await astream_element(inference, request["prompt"], request["system"])
+        else:
+            raw_comment = await inference.agenerate(request["prompt"], system=request["system"])
+        if raw_comment is not None:
+            formatted_comment = formatter.format_comment(
+                raw_comment, request["previous_comment"], request["metadata"], request["code_hash"]
+            )
+        if formatted_comment == "None":
+            inference.reject(request["prompt"], system=request["system"])
+    if formatted_comment == "None":
+        return None
+    return formatted_comment
+
+def generate_structured_comment(inference, formatter, request):
+    """Runs schema-constrained inference for a comment request, re-requesting only the fields
+    missing from the answer; returns None if no description could be obtained."""
+    schema = formatter.element_schema()
+    system = formatter.structured_system_prompt()
+    prompt = formatter.create_structured_prompt(request["code"], request["context"])
+    parsed = formatter.parse_structured_output(
+        inference.generate_structured(prompt, schema, system=system)
+    )
+    missing = formatter.missing_fields(parsed, request["metadata"])
+
+    retry_count = 0
+    while missing and retry_count < 2:
+        retry_count += 1
+        detail(f"Requesting missing {', '.join(missing)} for {request['name']}", "yellow")
+        fields_prompt = formatter.create_fields_prompt(
+            request["code"], request["context"], missing, parsed
+        )
+        fields_schema = formatter.element_schema(missing)
+        update = formatter.parse_structured_output(
+            inference.generate_structured(fields_prompt, fields_schema)
+        )
+        missing = _merge_fields(
+            formatter, inference, parsed, update, missing, request, fields_prompt, fields_schema
+        )
+
+    if not parsed["description"]:
+        print(colored(f"Could not describe {request['name']}", "red"))
+        inference.reject(prompt, schema, system)
+        return None
+    return formatter.render_comment(
+        parsed, request["previous_comment"], request["metadata"], request["code_hash"]
+    )
+
+async def agenerate_structured_comment(inference, formatter, request):
+    """Async variant of generate_structured_comment built on InferenceBase.agenerate_structured."""
+    schema = formatter.element_schema()
+    system = formatter.structured_system_prompt()
+    prompt = formatter.create_structured_prompt(request["code"], request["context"])
+    parsed = formatter.parse_structured_output(
+        await inference.agenerate_structured(prompt, schema, system=system)
+    )
+    missing = formatter.missing_fields(parsed, request["metadata"])
+
+    retry_count = 0
+    while missing and retry_count < 2:
+        retry_count += 1
+        detail(f"Requesting missing {', '.join(missing)} for {request['name']}", "yellow")
+        fields_prompt = formatter.create_fields_prompt(
+            request["code"], request["context"], missing, parsed
+        )
+        fields_schema = formatter.element_schema(missing)
+        update = formatter.parse_structured_output(
+            await inference.agenerate_structured(fields_prompt, fields_schema)
+        )
+        missing = _merge_fields(
+            formatter, inference, parsed, update, missing, request, fields_prompt, fields_schema
+        )
+
+    if not parsed["description"]:
+        print(colored(f"Could not describe {request['name']}", "red"))
+        inference.reject(prompt, schema, system)
+        return None
+    return formatter.render_comment(
+        parsed, request["previous_comment"], request["metadata"], request["code_hash"]
+    )
+
+def _merge_fields(formatter, inference, parsed, update, fields, request, prompt, schema):
+    """Copies the requested fields found in `update` into `parsed`; returns the fields still missing."""
+    for field in fields:
+        if update.get(field):
+            parsed[field] = update[field]
+    missing = formatter.missing_fields(parsed, request["metadata"])
+    if missing == fields:
+        # No progress: do not let the cache replay the same useless answer
+        inference.reject(prompt, schema)
+    return missing
+
+def stream_element(inference, prompt, system=None):
+    """Streams a response until its <element> closes; returns None as soon as the output is malformed."""
+    parser = ElementStreamParser()
+    chunks = inference.stream(prompt, system=system)
+    try:
+        for chunk in chunks:
+            state = parser.feed(chunk)
+            if state == MALFORMED:
+                detail("Malformed response, stopping generation early", "yellow")
+                return None
+            if state == COMPLETE:
+                break
+    finally:
+        chunks.close()
+    return parser.text
+
+async def astream_element(inference, prompt, system=None):
+    """Async variant of stream_element built on InferenceBase.astream."""
+    parser = ElementStreamParser()
+    chunks = inference.astream(prompt, system=system)
+    try:
+        async for chunk in chunks:
+            state = parser.feed(chunk)
+            if state == MALFORMED:
+                detail("Malformed response, stopping generation early", "yellow")
+                return None
+            if state == COMPLETE:
+                break
+    finally:
+        await chunks.aclose()
+    return parser.text
+
+async def _agenerate_comments(
+    inference, formatter, requests, concurrency, batch_tokens=None, stream=False, structured=False
+):
+    """Generates comments for all requests on one event loop with at most `concurrency` prompts in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = (
+        _batch_requests(requests, batch_tokens)
+        if batch_tokens and not structured
+        else [[r] for r in requests]
+    )
+
+    async def bounded(batch):
+        async with semaphore:
+            started = time.perf_counter()
+            if len(batch) == 1:
+                batch_comments = [
+                    await agenerate_comment(inference, formatter, batch[0], stream, structured)
+                ]
+            else:
+                batch_comments = await _agenerate_batch(inference, formatter, batch, stream)
+            # Elements sharing a prompt share its time
+            for request in batch:
+                request["seconds"] = time.perf_counter() - started
+            return batch_comments
+
+    results = await asyncio.gather(*(bounded(batch) for batch in batches))
+    comments = {}
+    for batch, batch_comments in zip(batches, results):
+        for request, formatted_comment in zip(batch, batch_comments):
+            comments[id(request)] = formatted_comment
+    return [comments[id(request)] for request in requests]
+
+def _batch_requests(requests, batch_tokens):
+    """Groups requests so each group's code and context stay within about `batch_tokens` tokens."""
+    batches = []
+    current = []
+    current_tokens = 0
+    for request in requests:
+        tokens = estimate_tokens(request["code"]) + estimate_tokens(request["context"])
+        if current and current_tokens + tokens > batch_tokens:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(request)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+async def _agenerate_batch(inference, formatter, batch, stream=False):
+    """Describes several elements with one prompt; elements missing from the answer are retried alone."""
+    system = formatter.batch_system_prompt()
+    prompt = formatter.create_batch_prompt(
+        [{"code": request["code"], "context": request["context"]} for request in batch]
+    )
+    raw_output = await inference.agenerate(prompt, system=system)
+    blocks = formatter.split_batch_output(raw_output, [request["name"] for request in batch])
+    if not blocks:
+        inference.reject(prompt, system=system)
+
+    comments = []
+    for position, request in enumerate(batch):
+        formatted_comment = "None"
+        if position in blocks:
+            formatted_comment = formatter.format_comment(
+                blocks[position], request["previous_comment"], request["metadata"], request["code_hash"]
+            )
+        if formatted_comment == "None":
+            detail(f"Retrying {request['name']} on its own", "yellow")
+            comments.append(await agenerate_comment(inference, formatter, request, stream))
+        else:
+            comments.append(formatted_comment)
+    return comments
+
+def record_comment(request, formatted_comment):
+    """Records the outcome and cost of one comment request in the run metrics."""
+    get_metrics().record_element(
+        request["file_path"],
+        request["name"],
+        "failed" if formatted_comment is None else "generated",
+        estimate_tokens(request["prompt"]) + estimate_tokens(request.get("system")),
+        request.get("seconds", 0.0),
+    )
+
+def plan_comment(plan, lines, request, formatted_comment):
+    """Schedules replacing the element's previous comment with the new one."""
+    start_line = request["start_line"]
+
     # Detect indentation level from element line
     element_line = lines[start_line]
     indentation = element_line[: len(element_line) - len(element_line.lstrip())]
@@ -155,7 +498,4 @@ def insert_comment(
     # Apply detected indentation to each line of the comment
     comment_lines = [(indentation + line).rstrip() + "\n" for line in formatted_comment.split("\n")]
 
-    lines[start_line:start_line] = comment_lines
-    insertion_offsets += len(comment_lines)
-
-    return lines, insertion_offsets
+    plan.replace(request["comment_start"], start_line, comment_lines)
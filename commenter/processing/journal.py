@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+
+def content_hash(text: str) -> str:
+    """Hash file content to recognize a file the journal already finished."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def journal_path(cache_dir: str, repo_path: str) -> str:
+    """
+    Return where the journal of a repository run lives.
+
+    Args:
+        cache_dir (str): Directory for on-disk caches
+        repo_path (str): Repository being processed
+
+    Returns:
+        str: Path of the journal file
+    """
+    digest = hashlib.sha256(os.path.abspath(repo_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "journals", f"{digest}.jsonl")
+
+
+class RunJournal:
+    """
+    Append-only record of finished work in a repository run, used to resume after a crash.
+
+    Each line is one JSON record: a generated element comment, a written file, a file or
+    folder summary, or a written README. Records are flushed as they are made and file
+    writes are fsynced, so the journal never claims more than what reached the disk.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Open the journal.
+
+        Args:
+            path (str): Journal file
+            resume (bool): Load the records of an earlier run and append to them;
+                otherwise start an empty journal
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._elements: Dict[Tuple[str, str, str], str] = {}
+        self._files: Dict[str, str] = {}
+        self._summaries: Dict[Tuple[str, Optional[str]], str] = {}
+        self._readmes = set()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._file.tell() > 0:
+            # Never append onto a line a crash left unfinished
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half-written
+                    continue
+                kind = record.get("kind")
+                if kind == "element":
+                    key = (record["file"], record["name"], record["code_hash"])
+                    self._elements[key] = record["comment"]
+                elif kind == "file":
+                    self._files[record["file"]] = record["hash"]
+                elif kind == "summary":
+                    self._summaries[(record["path"], record.get("version"))] = record["summary"]
+                elif kind == "readme":
+                    self._readmes.add(record["directory"])
+
+    def _append(self, record: dict, sync: bool = False):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    @property
+    def resumed(self) -> bool:
+        """Whether earlier records were loaded."""
+        return bool(self._elements or self._files or self._summaries or self._readmes)
+
+    def comment(self, request: dict) -> Optional[str]:
+        """Return the comment already generated for a comment request, if any."""
+        return self._elements.get(self._element_key(request))
+
+    @staticmethod
+    def _element_key(request: dict) -> Tuple[str, str, str]:
+        return (os.path.abspath(request["file_path"]), request["name"], request["code_hash"])
+
+    def record_comment(self, request: dict, comment: str):
+        """Record the comment generated for a comment request."""
+        key = self._element_key(request)
+        self._elements[key] = comment
+        self._append(
+            {
+                "kind": "element",
+                "file": key[0],
+                "name": key[1],
+                "code_hash": key[2],
+                "comment": comment,
+            }
+        )
+
+    def file_done(self, file_path: str, current_hash: str) -> bool:
+        """Whether a file was finished and has not changed since."""
+        return self._files.get(os.path.abspath(file_path)) == current_hash
+
+    def record_file(self, file_path: str, written_hash: str):
+        """Record that a file is finished, with the hash of its content on disk."""
+        file_path = os.path.abspath(file_path)
+        self._files[file_path] = written_hash
+        self._append({"kind": "file", "file": file_path, "hash": written_hash}, sync=True)
+
+    def summary(self, path: str, version: Optional[str] = None) -> Optional[str]:
+        """Return the recorded summary of a file or folder, if any."""
+        return self._summaries.get((os.path.abspath(path), version))
+
+    def record_summary(self, path: str, summary: str, version: Optional[str] = None):
+        """
+        Record the summary of a file or folder.
+
+        Args:
+            path (str): The summarized file or folder
+            summary (str): Its summary
+            version (Optional[str]): Identifies the content summarized (e.g. a file's
+                size and mtime), so a changed file is summarized again
+        """
+        path = os.path.abspath(path)
+        self._summaries[(path, version)] = summary
+        self._append({"kind": "summary", "path": path, "version": version, "summary": summary})
+
+    def readme_done(self, directory: str) -> bool:
+        """Whether a folder's README was written."""
+        return os.path.abspath(directory) in self._readmes
+
+    def record_readme(self, directory: str):
+        """Record that a folder's README was written."""
+        directory = os.path.abspath(directory)
+        self._readmes.add(directory)
+        self._append({"kind": "readme", "directory": directory}, sync=True)
+
+    def complete(self):
+        """Close and delete the journal after a run that finished everything."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        """Close the journal file, keeping it for a later resume."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
@@ -0,0 +1,126 @@
+import queue
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+from termcolor import colored
+
+_DONE = object()
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+
+    Every stage has its own pool of threads. A full queue blocks the stage feeding it,
+    so a slow stage throttles everything upstream instead of letting work pile up in memory.
+    A stage function returns the item for the next stage, or None to drop it; an
+    exception drops the item and is reported without stopping the pipeline, and
+    run() returns every such failure so the caller can tell a clean run from a partial one.
+    """
+
+    def __init__(
+        self,
+        stages: List[Tuple[str, Callable, int]],
+        queue_size: int = 8,
+        label: Callable[[object], str] = str,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            stages (List[Tuple[str, Callable, int]]): (name, function, worker count) per stage, in order
+            queue_size (int): Capacity of each queue between stages
+            label (Callable[[object], str]): Names an item in error messages
+        """
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.label = label
+
+    def run(
+        self,
+        items: Iterable,
+        on_complete: Optional[Callable] = None,
+        on_drop: Optional[Callable] = None,
+    ) -> List[Tuple[str, object, Exception]]:
+        """
+        Feed items through every stage and wait until all of them have left the last one.
+
+        Args:
+            items (Iterable): Inputs of the first stage, consumed lazily
+            on_complete (Optional[Callable]): Called with each result of the last stage
+            on_drop (Optional[Callable]): Called with each item a stage dropped or failed on
+
+        The callbacks never run concurrently with each other.
+
+        Returns:
+            List[Tuple[str, object, Exception]]: (stage name, item, error) for every item a
+                stage raised on, empty when everything went through
+        """
+        callback_lock = threading.Lock()
+        failures = []
+
+        def drop(item, stage=None, error=None):
+            with callback_lock:
+                if error is not None:
+                    failures.append((stage, item, error))
+                if on_drop is not None:
+                    on_drop(item)
+
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for index, (name, function, workers) in enumerate(self.stages):
+            workers = max(1, workers)
+            remaining = [workers]
+            remaining_lock = threading.Lock()
+            for number in range(workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(name, function, queues[index], queues[index + 1], remaining, remaining_lock, drop),
+                    name=f"pipeline-{name}-{number}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        def drain():
+            while True:
+                result = queues[-1].get()
+                if result is _DONE:
+                    return
+                if on_complete is not None:
+                    with callback_lock:
+                        on_complete(result)
+
+        drainer = threading.Thread(target=drain, name="pipeline-drain", daemon=True)
+        drainer.start()
+
+        for item in items:
+            queues[0].put(item)
+        queues[0].put(_DONE)
+
+        drainer.join()
+        for thread in threads:
+            thread.join()
+        return failures
+
+    def _work(self, name, function, inbox, outbox, remaining, remaining_lock, drop):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Let sibling workers see the end too; the last one to stop tells the next stage
+                inbox.put(_DONE)
+                with remaining_lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(_DONE)
+                return
+            try:
+                result = function(item)
+            except Exception as e:
+                print(colored(f"{name} stage failed for {self.label(item)}: {e}", "red"))
+                drop(item, name, e)
+                continue
+            if result is None:
+                drop(item)
+            else:
+                outbox.put(result)
@@ -1,36 +1,204 @@
 import os
 import subprocess
+from typing import Dict, Iterable, Optional, Set, Tuple
 from ..models.base import InferenceBase
 from ..formatters.readme import ReadmeFormatter
+from ..metrics import get_metrics
+from .edits import atomic_open
+from .journal import RunJournal
+from .scanner import DEFAULT_MAX_FILE_BYTES, chunk_text, iter_tree, skip_reason
 from termcolor import colored
 
+# Tokens kept free in every request for the instructions and the model's answer
+_PROMPT_RESERVE_TOKENS = 2048
+
 
 def process_readme(
-    inference: InferenceBase, formatter: ReadmeFormatter, repo_path: str
-):
-    """Creates a structured README.md file for the given repository."""
+    inference: InferenceBase,
+    formatter: ReadmeFormatter,
+    repo_path: str,
+    max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+) -> bool:
+    """Creates a structured README.md file for the given repository.
+
+    Returns False, leaving any existing README.md alone, when a summary could not be generated."""
 
     print(colored(f"📂 Scanning repository: {repo_path}", "cyan"))
 
-    readme_path = os.path.join(repo_path, "README.md")
-    if os.path.exists(readme_path):
-        os.remove(readme_path)
-        print(colored("🗑️ Removed existing README.md", "red"))
+    tree = build_summary_tree(inference, repo_path, max_file_bytes=max_file_bytes)
+    if tree[repo_path]["missing"]:
+        print(colored(f"❌ Not writing README.md: {_missing_text(tree, repo_path)}", "red"))
+        return False
+    write_readme(formatter, tree, repo_path)
+    return True
+
+
+def build_summary_tree(
+    inference: InferenceBase,
+    repo_path: str,
+    excluded_dirs: Iterable[str] = (),
+    max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+    journal: Optional[RunJournal] = None,
+    scope: Optional[Set[str]] = None,
+) -> Dict[str, dict]:
+    """
+    Summarize a directory tree in one bottom-up pass.
+
+    Every file is summarized once, and every directory once from its own file
+    summaries plus the summaries of its direct children, so the number of LLM
+    calls grows linearly with the size of the tree. Ignored directories, lockfiles,
+    binaries, files over `max_file_bytes` and existing README.md files (this tool's
+    own output) are skipped without being read in full.
 
-    repo_name = os.path.basename(os.path.abspath(repo_path))
-    tree_structure = _get_repo_tree(repo_path)
+    With a `scope`, directories outside it are not descended into: their summaries and
+    those of the folders below them are read back from the README.md an earlier run
+    wrote there, so only the scoped part of the tree costs LLM calls.
+
+    Args:
+        inference (InferenceBase): Backend used for the summaries
+        repo_path (str): Root of the tree
+        excluded_dirs (Iterable[str]): Directory names not to descend into, besides the scanner's defaults
+        max_file_bytes (int): Largest file to summarize
+        journal (Optional[RunJournal]): Run journal to reuse and record summaries in
+        scope (Optional[Set[str]]): Real paths (see os.path.realpath) of the directories
+            to summarize (must include `repo_path`), or None for the whole tree
+
+    A directory whose files or subfolders could not all be summarized is not summarized
+    either, so no summary built from partial input is recorded in the journal.
+
+    Returns:
+        Dict[str, dict]: Per directory path, a node with "files" (path -> summary),
+            "children" (child directory paths), "summary" (None if there was nothing to
+            summarize) and "missing" (the files and folders in its subtree whose summary
+            failed; a README should only be written for a node where it is empty)
+    """
+    tree = {}
+    reused = set()
+    for root, dirs, files in iter_tree(repo_path, excluded_dirs):
+        if scope is not None and os.path.realpath(root) not in scope:
+            # iter_tree walks the list it yields, so emptying it prunes this subtree
+            dirs[:] = []
+            summary, folders = _readme_summaries(root)
+            folders.pop(root, None)
+            # The README lists the summaries of every folder below it; keep them as leaves
+            # so the READMEs above still show the whole subtree
+            for folder, folder_summary in folders.items():
+                tree.setdefault(
+                    folder,
+                    {"file_paths": [], "children": [], "files": {}, "summary": folder_summary, "missing": []},
+                )
+                reused.add(folder)
+            tree[root] = {
+                "file_paths": [],
+                # write_readme pops children off a stack; reversing keeps the README's order
+                "children": list(reversed(folders)),
+                "files": {},
+                "summary": summary,
+                "missing": [],
+            }
+            reused.add(root)
+            continue
+        file_paths = []
+        for name in files:
+            file_path = os.path.join(root, name)
+            reason = skip_reason(file_path, max_file_bytes)
+            if reason is None:
+                file_paths.append(file_path)
+            else:
+                print(colored(f"⏭️ Skipping {file_path}: {reason}", "yellow"))
+        tree[root] = {
+            "file_paths": file_paths,
+            "children": [os.path.join(root, d) for d in dirs],
+            "files": {},
+            "summary": None,
+            "missing": [],
+        }
 
-    file_summaries = _summarize_files(inference, repo_path)
-    folder_summaries = _summarize_folders(inference, repo_path, file_summaries)
+    print(colored("📄 Summarizing files and folders...", "blue"))
+    for directory in sorted(tree, key=lambda d: d.count(os.sep), reverse=True):
+        if directory in reused:
+            continue
+        node = tree[directory]
+        for file_path in node.pop("file_paths"):
+            version = _file_version(file_path)
+            summary = journal.summary(file_path, version) if journal is not None else None
+            if summary is None:
+                summary = _summarize_file(inference, file_path)
+                if summary is not None and journal is not None:
+                    journal.record_summary(file_path, summary, version)
+            if summary is not None:
+                node["files"][file_path] = summary
+            else:
+                node["missing"].append(file_path)
+        for child in node["children"]:
+            node["missing"].extend(tree[child]["missing"])
+        if node["missing"]:
+            print(colored(f"⚠️ Not summarizing {directory}: {_missing_text(tree, directory)}", "yellow"))
+            node["missing"].append(directory)
+            continue
+        summary = journal.summary(directory) if journal is not None else None
+        if summary is None:
+            try:
+                summary = _summarize_directory(inference, directory, node, tree)
+            except Exception as e:
+                print(colored(f"⚠️ Could not summarize {directory}: {e}", "red"))
+                node["missing"].append(directory)
+                continue
+            if summary is not None and journal is not None:
+                journal.record_summary(directory, summary)
+        node["summary"] = summary
+
+    print(colored("✅ Completed file and folder summaries.", "green"))
+    return tree
+
+
+def _missing_text(tree: Dict[str, dict], directory: str) -> str:
+    missing = tree[directory]["missing"]
+    return f"{len(missing)} summaries failed (first: {missing[0]})"
+
+
+def _readme_summaries(directory: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """Return the summary and folder summaries in a directory's existing README.md, if there is one."""
+    try:
+        with open(os.path.join(directory, "README.md"), "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        return None, {}
+    return ReadmeFormatter.parse_overview(content), ReadmeFormatter.parse_folder_summaries(content)
 
-    full_summary = _summarize_repository(inference, repo_name, folder_summaries)
+
+def write_readme(formatter: ReadmeFormatter, tree: Dict[str, dict], directory: str):
+    """
+    Write README.md for one directory of a tree built by build_summary_tree.
+
+    Args:
+        formatter (ReadmeFormatter): Formatter for the README content
+        tree (Dict[str, dict]): Summary tree containing `directory`
+        directory (str): Directory to write the README for
+    """
+    readme_path = os.path.join(directory, "README.md")
+    repo_name = os.path.basename(os.path.abspath(directory))
+    tree_structure = _get_repo_tree(directory)
+
+    # Deepest folders first, matching the order the summaries were produced in
+    folder_summaries = {}
+    pending = [directory]
+    subtree = []
+    while pending:
+        current = pending.pop()
+        subtree.append(current)
+        pending.extend(tree[current]["children"])
+    for folder in sorted(subtree, key=lambda d: d.count(os.sep), reverse=True):
+        if tree[folder]["summary"]:
+            folder_summaries[folder] = tree[folder]["summary"]
 
     formatted_content = formatter.format_readme(
-        full_summary, repo_name, tree_structure, folder_summaries
+        tree[directory]["summary"] or "", repo_name, tree_structure, folder_summaries
     )
 
-    with open(readme_path, "w") as f:
-        f.write(formatted_content)
+    with atomic_open(readme_path) as f:
+        written = f.write(formatted_content)
+    get_metrics().record_write(readme_path, written)
 
     print(colored(f"✅ Generated new README.md at: {readme_path}", "green"))
 
@@ -47,80 +215,88 @@ def _get_repo_tree(repo_path: str) -> str:
         return "Tree command not available."
 
 
-def _summarize_files(inference: InferenceBase, repo_path: str) -> dict:
-    """Generate summaries for individual files in the repository."""
-    file_summaries = {}
-
-    print(colored("📄 Summarizing files...", "blue"))
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            file_path = os.path.join(root, file)
+def _summarize_file(inference: InferenceBase, file_path: str):
+    """Generate a summary for a single file, or None if it cannot be read.
 
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
+    Files too large for one request are split into chunks that fit the backend's
+    context window, summarized separately and then combined."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
 
-                print(colored(f"🔍 Processing file: {file_path}", "magenta"))
-                summary = inference.generate(
-                    f"Summarize this file. Only include code snippets if absolutely necessary:\n\n{content}"
-                )
-                file_summaries[file_path] = summary
+        print(colored(f"🔍 Processing file: {file_path}", "magenta"))
+        chunks = chunk_text(content, _chunk_tokens(inference))
+        if len(chunks) == 1:
+            return inference.generate(
+                f"Summarize this file. Only include code snippets if absolutely necessary:\n\n{content}"
+            )
 
-            except Exception as e:
-                print(colored(f"⚠️ Skipping {file_path} due to error: {e}", "red"))
+        name = os.path.basename(file_path)
+        print(colored(f"✂️ Splitting {file_path} into {len(chunks)} chunks", "magenta"))
+        partial_summaries = [
+            inference.generate(
+                f"Summarize part {index} of {len(chunks)} of the file '{name}'. "
+                f"Only include code snippets if absolutely necessary:\n\n{chunk}"
+            )
+            for index, chunk in enumerate(chunks, start=1)
+        ]
+        return _combine_summaries(inference, f"the file '{name}'", partial_summaries)
 
-    print(colored("✅ Completed file summaries.", "green"))
-    return file_summaries
+    except Exception as e:
+        print(colored(f"⚠️ Skipping {file_path} due to error: {e}", "red"))
+        return None
 
 
-def _summarize_folders(
-    inference: InferenceBase, repo_path: str, file_summaries: dict
-) -> dict:
-    """Generate summaries for folders, using existing README.md files if available; otherwise, summarize their files."""
-    folder_summaries = {}
+def _file_version(file_path: str) -> str:
+    """Identify a file's current content cheaply, by size and modification time."""
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
 
-    print(colored("📁 Summarizing folders...", "blue"))
-    for root, dirs, _ in os.walk(repo_path, topdown=False):
-        readme_path = os.path.join(root, "README.md")
-        if os.path.exists(readme_path):
-            try:
-                with open(readme_path, "r", encoding="utf-8") as f:
-                    readme_content = f.read()
-                print(colored(f"📖 Using README.md for folder: {root}", "magenta"))
-                folder_summary = inference.generate(
-                    f"Summarize the following README file:\n{readme_content}"
-                )
-                folder_summaries[root] = folder_summary
-                continue  # Skip processing individual files if README.md exists
-            except Exception as e:
-                print(colored(f"⚠️ Error reading {readme_path}: {e}", "red"))
-        content_summaries = [
-            file_summaries[path] for path in file_summaries if path.startswith(root)
-        ]
-        if not content_summaries:
-            continue
 
-        context = "\n".join(content_summaries)
-        print(colored(f"📦 Processing folder: {root}", "magenta"))
-        folder_summary = inference.generate(
-            f"Summarize the purpose of this folder based on its files:\n{context}"
-        )
+def _chunk_tokens(inference: InferenceBase) -> int:
+    """Tokens of file content that fit in one request to this backend."""
+    return max(256, inference.context_window() - _PROMPT_RESERVE_TOKENS)
 
-        folder_summaries[root] = folder_summary
 
-    print(colored("✅ Completed folder summaries.", "green"))
-    return folder_summaries
+def _combine_summaries(inference: InferenceBase, subject: str, summaries: list) -> str:
+    """Reduce partial summaries into one, in several rounds if they do not fit in one request."""
+    budget = _chunk_tokens(inference)
+    while True:
+        groups = chunk_text("\n\n".join(summaries), budget)
+        combined = [
+            inference.generate(
+                f"Combine these partial summaries of {subject} into one summary. "
+                f"Only include code snippets if absolutely necessary:\n\n{group}"
+            )
+            for group in groups
+        ]
+        if len(combined) == 1:
+            return combined[0]
+        summaries = combined
 
-def _summarize_repository(
-    inference: InferenceBase, repo_name: str, folder_summaries: dict
-) -> str:
-    """Generate the final repository summary based on the folder summaries."""
-    full_context = "\n".join(folder_summaries.values())
 
-    print(colored("📝 Generating final repository summary...", "yellow"))
-    summary = inference.generate(
-        f"Summarize the repository '{repo_name}' based on the following folder summaries. Only include code snippets if they are crucial:\n{full_context}"
+def _summarize_directory(
+    inference: InferenceBase, directory: str, node: dict, tree: Dict[str, dict]
+):
+    """Summarize a folder from its own files and its direct children's summaries."""
+    parts = [
+        f"File {os.path.basename(path)}:\n{summary}" for path, summary in node["files"].items()
+    ]
+    parts.extend(
+        f"Folder {os.path.basename(child)}:\n{tree[child]['summary']}"
+        for child in node["children"]
+        if tree[child]["summary"]
     )
+    if not parts:
+        return None
 
-    print(colored("✅ Repository summary generated.", "green"))
-    return summary
+    context = "\n\n".join(parts)
+    print(colored(f"📦 Processing folder: {directory}", "magenta"))
+    name = os.path.basename(os.path.abspath(directory))
+    if len(chunk_text(context, _chunk_tokens(inference))) > 1:
+        # Too many entries for one request: condense them first
+        context = _combine_summaries(inference, f"the contents of the folder '{name}'", parts)
+    return inference.generate(
+        f"Summarize the purpose of the folder '{name}' "
+        f"based on the summaries of its files and subfolders. Only include code snippets if they are crucial:\n{context}"
+    )
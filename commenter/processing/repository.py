@@ -1,18 +1,57 @@
 import os
 import time
+from typing import Dict, Optional
 from ..models.base import InferenceBase
 from ..formatters.comment import CommentFormatter
 from ..formatters.readme import ReadmeFormatter
-from .function import process_file
-from .readme import process_readme
+from ..metrics import CHARS_PER_TOKEN
+from ..parsers.typescript import get_parser
+from .changes import ChangedLines, affected_directories, overlaps
+from .function import build_comment_requests, generate_comments, plan_comments
+from .journal import RunJournal, content_hash
+from .pipeline import Pipeline
+from .scanner import DEFAULT_MAX_FILE_BYTES, IGNORED_DIRS
+from .slug_index import SlugIndex
+from .readme import build_summary_tree, write_readme
 from termcolor import colored
 
+PIPELINE_STAGES = ("parse", "prompt", "infer", "apply", "write")
+# Files in each stage at once; "parse" defaults to the parser's worker count
+DEFAULT_STAGE_WORKERS = {"prompt": 1, "infer": 2, "apply": 1, "write": 1}
 
 def process_repository(
-    inference: InferenceBase, comment_formatter: CommentFormatter, readme_formatter: ReadmeFormatter, repo_path: str
-):
-    """Recursively process all eligible files in a repository, generating READMEs bottom-up."""
-    EXCLUDED_DIRS = {"node_modules", "dist", "build", "venv", "__pycache__", ".next"}
+    inference: InferenceBase,
+    comment_formatter: CommentFormatter,
+    readme_formatter: ReadmeFormatter,
+    repo_path: str,
+    parse_workers: Optional[int] = None,
+    incremental: bool = False,
+    concurrency: int = 1,
+    slug_index: Optional[SlugIndex] = None,
+    batch_tokens: Optional[int] = None,
+    max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+    stream: bool = False,
+    structured: bool = False,
+    stage_workers: Optional[Dict[str, int]] = None,
+    queue_size: int = 8,
+    journal: Optional[RunJournal] = None,
+    changed: Optional[ChangedLines] = None,
+) -> int:
+    """Recursively process all eligible files in a repository, generating READMEs bottom-up.
+
+    Files flow through a pipeline of parse, prompt, infer, apply and write stages, so different
+    files are in different stages at once. `stage_workers` overrides the thread count of any
+    stage (see DEFAULT_STAGE_WORKERS); parsing uses `parse_workers` node workers (defaults to
+    the CPU count). Each queue between stages holds at most `queue_size` files.
+    With a `journal`, finished comments, files, summaries and READMEs are recorded as they
+    complete, and work the journal already holds (from an interrupted run) is skipped.
+    With `changed` (see changes.changed_lines), only the listed files are processed, only
+    their elements overlapping a changed line range get new comments, and READMEs are
+    regenerated only for the directories of changed files and their ancestors.
+
+    Returns the number of failures: files a stage failed on or left with undocumented
+    elements, and READMEs not written because a summary below them failed. Failed work is
+    never recorded in the journal, so a resumed run retries exactly that."""
     ELIGIBLE_EXTENSIONS = {".ts", ".tsx"}
 
     print(colored(f"Scanning repository: {repo_path}", "yellow"))
@@ -22,7 +61,7 @@ def process_repository(
     # First pass: Collect eligible files and directories
     for root, dirs, files in os.walk(repo_path, topdown=True):
         dirs[:] = [
-            d for d in dirs if d not in EXCLUDED_DIRS
+            d for d in dirs if d not in IGNORED_DIRS
         ]  # Exclude specified directories
         eligible_files = [
             os.path.join(root, f)
@@ -34,31 +73,174 @@ def process_repository(
             all_files.extend(eligible_files)
             all_dirs.add(root)
 
+    readme_scope = None
+    if changed is not None:
+        # changed_lines keys files by realpath, so a symlinked repo_path still matches
+        all_files = [path for path in all_files if os.path.realpath(path) in changed]
+        readme_scope = affected_directories(changed, repo_path)
+        all_dirs = {d for d in all_dirs if os.path.realpath(d) in readme_scope}
+        print(
+            colored(
+                f"{len(all_files)} changed files, {len(all_dirs)} READMEs to regenerate",
+                "yellow",
+            )
+        )
+
+    parser = get_parser()
     total_tasks = len(all_files) + len(all_dirs)  # Total progress count
     completed_tasks = 0
     start_time = time.time()
 
-    # Process each file
+    # Weight progress by estimated tokens so a large component counts for more than a type alias.
+    # README summaries read the same files again, so that stage weighs as much as all files together.
+    file_tokens = {path: _estimated_file_tokens(path) for path in all_files}
+    readme_tokens = sum(file_tokens.values())
+    total_tokens = sum(file_tokens.values()) + readme_tokens
+    completed_tokens = 0
+
+    stage_workers = {
+        **DEFAULT_STAGE_WORKERS,
+        "parse": parse_workers or parser.workers,
+        **(stage_workers or {}),
+    }
+
+    # Files an interrupted run already finished are skipped before anything is parsed
+    pending_files = []
     for file_path in all_files:
+        if journal is not None:
+            with open(file_path, "r") as f:
+                if journal.file_done(file_path, content_hash(f.read())):
+                    print(colored(f"Already finished, skipping: {file_path}", "yellow"))
+                    completed_tasks += 1
+                    completed_tokens += file_tokens[file_path]
+                    continue
+        pending_files.append(file_path)
+
+    def parse(job):
+        # parse_files ran node on the file already; this stage picks up its outcome
+        error = job.pop("error")
+        if error is not None:
+            raise error
+        with open(job["file_path"], "r") as f:
+            job["lines"] = f.readlines()
+        return job
+
+    def prompt(job):
+        file_path = job["file_path"]
+        if changed is not None:
+            ranges = changed[os.path.realpath(file_path)]
+            job["elements"] = [
+                element
+                for element in job["elements"]
+                if overlaps(ranges, element[2]["pos"]["startLine"], element[2]["pos"]["endLine"])
+            ]
+        if not job["elements"]:
+            kind = "changed elements" if changed is not None else "elements"
+            print(colored(f"No {kind} found in {file_path}", "red"))
+            if journal is not None:
+                journal.record_file(file_path, content_hash("".join(job["lines"])))
+            return None
         print(colored(f"Processing file: {file_path}", "blue"))
-        process_file(inference, comment_formatter, file_path)
+        job["requests"] = build_comment_requests(
+            comment_formatter, file_path, job["lines"], job.pop("elements"), incremental
+        )
+        return job
+
+    def infer(job):
+        requests = job["requests"]
+        comments = [journal.comment(request) if journal else None for request in requests]
+        pending = [request for request, comment in zip(requests, comments) if comment is None]
+        generated = iter(
+            generate_comments(
+                inference, comment_formatter, pending, concurrency, batch_tokens, stream, structured
+            )
+        )
+        for index, comment in enumerate(comments):
+            if comment is None:
+                comments[index] = next(generated)
+                if comments[index] is not None and journal is not None:
+                    journal.record_comment(requests[index], comments[index])
+        job["comments"] = comments
+        return job
+
+    def apply(job):
+        job["failed"] = sum(comment is None for comment in job["comments"])
+        job["plan"] = plan_comments(job["lines"], job.pop("requests"), job.pop("comments"))
+        return job
+
+    def write(job):
+        if job["plan"]:
+            job["plan"].write(job["lines"], job["file_path"])
+        if slug_index is not None:
+            slug_index.index_file(job["file_path"])
+        if job["failed"]:
+            # Keep the comments that did arrive, but leave the file unfinished in the journal
+            raise RuntimeError(f"{job['failed']} elements could not be documented")
+        if journal is not None:
+            with open(job["file_path"], "r") as f:
+                journal.record_file(job["file_path"], content_hash(f.read()))
+        print(colored(f"Finished processing {job['file_path']}", "green"))
+        return job
+
+    def finished(job):
+        nonlocal completed_tasks, completed_tokens
         completed_tasks += 1
-        show_progress(completed_tasks, total_tasks, start_time)
+        completed_tokens += file_tokens[job["file_path"]]
+        show_progress(completed_tasks, total_tasks, start_time, completed_tokens, total_tokens)
 
-    # Process directories bottom-up for README generation
+    # Parsing, inference and writing of different files overlap; bounded queues between
+    # the stages keep at most a few files' elements and prompts in memory at once
+    functions = {"parse": parse, "prompt": prompt, "infer": infer, "apply": apply, "write": write}
+    pipeline = Pipeline(
+        [(name, functions[name], stage_workers[name]) for name in PIPELINE_STAGES],
+        queue_size=queue_size,
+        label=lambda job: job["file_path"],
+    )
+    parsed = parser.parse_files(pending_files, workers=stage_workers["parse"])
+    jobs = ({"file_path": path, "elements": elements, "error": error} for path, elements, error in parsed)
+    failures = len(pipeline.run(jobs, finished, finished))
+
+    # Summarize the whole tree once, then write a README for every directory with code
+    tree = build_summary_tree(
+        inference, repo_path, max_file_bytes=max_file_bytes, journal=journal, scope=readme_scope
+    )
+    completed_tokens += readme_tokens
     for directory in sorted(all_dirs, key=lambda d: d.count(os.sep), reverse=True):
-        print(colored(f"Generating README for directory: {directory}", "green"))
-        process_readme(inference, readme_formatter, directory)
+        if journal is not None and journal.readme_done(directory):
+            print(colored(f"README already written for directory: {directory}", "yellow"))
+        elif tree[directory]["missing"]:
+            # Overwriting the README with a partial one would lose the summaries it has now
+            print(colored(f"Not writing README for directory {directory}: summaries failed", "red"))
+            failures += 1
+        else:
+            print(colored(f"Generating README for directory: {directory}", "green"))
+            write_readme(readme_formatter, tree, directory)
+            if journal is not None:
+                journal.record_readme(directory)
         completed_tasks += 1
-        show_progress(completed_tasks, total_tasks, start_time)
+        show_progress(completed_tasks, total_tasks, start_time, completed_tokens, total_tokens)
+
+    if failures:
+        print(colored(f"Repository processing finished with {failures} failures", "red"))
+    else:
+        print(colored("Repository processing complete!", "cyan"))
+    return failures
+
 
-    print(colored("Repository processing complete!", "cyan"))
+def _estimated_file_tokens(file_path):
+    try:
+        return max(1, os.path.getsize(file_path) // CHARS_PER_TOKEN)
+    except OSError:
+        return 1
 
 
-def show_progress(completed, total, start_time):
-    """Displays a progress bar with estimated time remaining."""
+def show_progress(completed, total, start_time, completed_tokens=None, total_tokens=None):
+    """Displays a progress bar with estimated time remaining, weighted by estimated tokens when given."""
     elapsed_time = time.time() - start_time
-    progress = completed / total
+    if completed_tokens is not None and total_tokens:
+        progress = completed_tokens / total_tokens
+    else:
+        progress = completed / total
     estimated_total_time = elapsed_time / progress if progress > 0 else 0
     remaining_time = estimated_total_time - elapsed_time
 
@@ -0,0 +1,128 @@
+import os
+from typing import Iterable, List, Optional
+
+IGNORED_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "dist",
+    "build",
+    "coverage",
+    "venv",
+    ".venv",
+    "__pycache__",
+    ".next",
+    ".turbo",
+    ".cache",
+}
+IGNORED_FILES = {
+    "README.md",
+    "package-lock.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lockb",
+    "Cargo.lock",
+    "poetry.lock",
+    "composer.lock",
+    ".DS_Store",
+}
+IGNORED_SUFFIXES = (".lock", ".min.js", ".min.css", ".map", ".snap", ".pyc")
+DEFAULT_MAX_FILE_BYTES = 512 * 1024
+
+# Conservative characters-per-token ratio used to size prompts for a context window.
+# Code often tokenizes at fewer characters per token than metrics.CHARS_PER_TOKEN assumes;
+# that ratio is fine for estimates, but a chunk sized with it can overflow the window.
+CHUNK_CHARS_PER_TOKEN = 3
+
+_SNIFF_BYTES = 8192
+
+
+def is_ignored_file(name: str) -> bool:
+    """Whether a file name is a lockfile, generated artifact or other file not worth summarizing."""
+    return name in IGNORED_FILES or name.endswith(IGNORED_SUFFIXES)
+
+
+def skip_reason(file_path: str, max_bytes: int = DEFAULT_MAX_FILE_BYTES) -> Optional[str]:
+    """
+    Decide cheaply whether a file should be read, using its size and first few KB only.
+
+    Args:
+        file_path (str): File to check
+        max_bytes (int): Largest file size to read
+
+    Returns:
+        Optional[str]: Why the file is skipped, or None if it should be read
+    """
+    if is_ignored_file(os.path.basename(file_path)):
+        return "ignored file"
+    try:
+        size = os.path.getsize(file_path)
+        if size > max_bytes:
+            return f"larger than {max_bytes} bytes"
+        with open(file_path, "rb") as f:
+            head = f.read(_SNIFF_BYTES)
+    except OSError as e:
+        return str(e)
+    if b"\0" in head:
+        return "binary file"
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character may be cut off at the end of the sniffed block
+        if e.start < len(head) - 4:
+            return "not UTF-8 text"
+    return None
+
+
+def iter_tree(root: str, excluded_dirs: Iterable[str] = ()):
+    """
+    Walk a tree top-down like os.walk, pruning ignored directories and files.
+
+    Args:
+        root (str): Directory to walk
+        excluded_dirs (Iterable[str]): Directory names to skip in addition to IGNORED_DIRS
+
+    Yields:
+        Tuple[str, List[str], List[str]]: (directory, child directory names, file names)
+    """
+    excluded = IGNORED_DIRS | set(excluded_dirs)
+    for current, dirs, files in os.walk(root, topdown=True):
+        dirs[:] = sorted(d for d in dirs if d not in excluded)
+        yield current, dirs, sorted(f for f in files if not is_ignored_file(f))
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into pieces of at most about `max_tokens` tokens, on line boundaries where possible.
+
+    Args:
+        text (str): Text to split
+        max_tokens (int): Token budget of a single piece, counted at CHUNK_CHARS_PER_TOKEN
+
+    Returns:
+        List[str]: The pieces, in order
+    """
+    max_chars = max(1, max_tokens * CHUNK_CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = []
+    current_size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            # A single overlong line (e.g. minified code) is cut hard
+            if current:
+                chunks.append("".join(current))
+                current, current_size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current_size + len(line) > max_chars:
+            chunks.append("".join(current))
+            current, current_size = [], 0
+        current.append(line)
+        current_size += len(line)
+    if current:
+        chunks.append("".join(current))
+    return chunks
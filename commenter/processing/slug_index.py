@@ -0,0 +1,193 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+from .scanner import IGNORED_DIRS
+
+_GENERATED_PATTERN = re.compile(
+    r"@generated\s+([A-Za-z0-9]{6})\s+v\d+\.\d+(?:\s+hash:([0-9a-f]+))?"
+)
+ELIGIBLE_EXTENSIONS = {".ts", ".tsx"}
+
+
+class SlugIndex:
+    """Persistent map from comment slug to the file, line and code hash of its element."""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the index database.
+
+        Args:
+            path (str): Path of the SQLite file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slugs ("
+            "slug TEXT PRIMARY KEY, file TEXT NOT NULL, line INTEGER NOT NULL, hash TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS slugs_file ON slugs(file)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "file TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+
+    @staticmethod
+    def scan_lines(lines: List[str]) -> List[dict]:
+        """
+        Find every generated comment in a file without parsing it.
+
+        Args:
+            lines (List[str]): The file's lines
+
+        Returns:
+            List[dict]: One {"slug", "line", "hash"} per comment, where line is the
+                1-based line of the element directly below the comment
+        """
+        entries = []
+        for i, line in enumerate(lines):
+            if "@generated" not in line:
+                continue
+            match = _GENERATED_PATTERN.search(line)
+            if not match:
+                continue
+            end = i
+            while end < len(lines) and "*/" not in lines[end]:
+                end += 1
+            entries.append({"slug": match.group(1), "line": end + 2, "hash": match.group(2)})
+        return entries
+
+    def _is_current(self, file_path: str) -> bool:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        row = self._conn.execute(
+            "SELECT mtime, size FROM files WHERE file = ?", (file_path,)
+        ).fetchone()
+        return row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size
+
+    def index_file(self, file_path: str, lines: Optional[List[str]] = None):
+        """
+        (Re)index the slugs of one file.
+
+        Args:
+            file_path (str): The file to index
+            lines (Optional[List[str]]): The file's current lines, if already read
+        """
+        file_path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(file_path)
+            if lines is None:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+        except (OSError, UnicodeDecodeError):
+            with self._lock:
+                self._conn.execute("DELETE FROM slugs WHERE file = ?", (file_path,))
+                self._conn.execute("DELETE FROM files WHERE file = ?", (file_path,))
+            return
+
+        entries = self.scan_lines(lines)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM slugs WHERE file = ?", (file_path,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO slugs (slug, file, line, hash) VALUES (?, ?, ?, ?)",
+                [(e["slug"], file_path, e["line"], e["hash"]) for e in entries],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (file, mtime, size) VALUES (?, ?, ?)",
+                (file_path, stat.st_mtime, stat.st_size),
+            )
+            self._conn.execute("COMMIT")
+
+    def index_tree(self, root: str, excluded_dirs: Iterable[str] = ()):
+        """
+        Index every TypeScript file under `root` that changed since it was last indexed.
+
+        Args:
+            root (str): Directory to scan
+            excluded_dirs (Iterable[str]): Directory names not to descend into
+        """
+        excluded_dirs = set(excluded_dirs)
+        for current, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in excluded_dirs]
+            for name in files:
+                if os.path.splitext(name)[1] not in ELIGIBLE_EXTENSIONS:
+                    continue
+                file_path = os.path.abspath(os.path.join(current, name))
+                with self._lock:
+                    current_entry = self._is_current(file_path)
+                if not current_entry:
+                    self.index_file(file_path)
+
+    def lookup(self, slug: str) -> Optional[dict]:
+        """
+        Find a slug, re-indexing its file first if the file changed since it was indexed.
+
+        Args:
+            slug (str): The 6-character slug
+
+        Returns:
+            Optional[dict]: {"file", "line", "hash"} or None if the slug is unknown
+        """
+        for _ in range(2):
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT file, line, hash FROM slugs WHERE slug = ?", (slug,)
+                ).fetchone()
+                if row is None:
+                    return None
+                current = self._is_current(row[0])
+            if current:
+                return {"file": row[0], "line": row[1], "hash": row[2]}
+            self.index_file(row[0])
+        return None
+
+    def resolve(self, slugs: Iterable[str], search_path: str) -> Dict[str, List[dict]]:
+        """
+        Locate several slugs and group them by file.
+
+        Slugs missing from the index trigger one incremental index of `search_path`.
+
+        Args:
+            slugs (Iterable[str]): Slugs to locate
+            search_path (str): File or directory to index when a slug is unknown
+
+        Returns:
+            Dict[str, List[dict]]: Per file, the {"slug", "line", "hash"} entries found in it
+        """
+        found = {}
+        missing = []
+        for slug in slugs:
+            entry = self.lookup(slug)
+            if entry is None:
+                missing.append(slug)
+            else:
+                found[slug] = entry
+
+        if missing:
+            if os.path.isdir(search_path):
+                self.index_tree(search_path, IGNORED_DIRS)
+            else:
+                self.index_file(search_path)
+            for slug in missing:
+                entry = self.lookup(slug)
+                if entry is not None:
+                    found[slug] = entry
+
+        by_file = {}
+        for slug, entry in found.items():
+            by_file.setdefault(entry["file"], []).append(
+                {"slug": slug, "line": entry["line"], "hash": entry["hash"]}
+            )
+        return by_file
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,185 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from ..models.base import InferenceBase
+from ..formatters.comment import CommentFormatter
+from ..parsers.typescript import get_parser
+from .changes import diff_lines, overlaps
+from .edits import FileChangedError
+from .function import process_file
+from .scanner import iter_tree
+from .slug_index import SlugIndex
+from termcolor import colored
+
+WATCHED_EXTENSIONS = {".ts", ".tsx"}
+
+
+def watch(
+    inference: InferenceBase,
+    formatter: CommentFormatter,
+    path: str,
+    debounce: float = 1.0,
+    poll_interval: float = 0.5,
+    incremental: bool = False,
+    concurrency: int = 1,
+    slug_index: Optional[SlugIndex] = None,
+    batch_tokens: Optional[int] = None,
+    stream: bool = False,
+    structured: bool = False,
+    stop: Optional[threading.Event] = None,
+):
+    """
+    Watch a file or directory tree and re-document elements as they are edited.
+
+    The tree is polled for changed modification times. Once a burst of saves has been
+    quiet for `debounce` seconds, each changed file is diffed against the version seen
+    last and only the elements overlapping the changed lines are re-documented. The
+    parser workers, backend connections and caches stay warm for the whole session.
+    The tool's own edits become the new baseline of a file as they are written, so
+    they never trigger another round. A file saved again while its comments were being
+    generated is not overwritten; it is queued for the next round instead.
+
+    Args:
+        inference (InferenceBase): Backend used for the comments
+        formatter (CommentFormatter): Formatter for the comments
+        path (str): File or directory to watch
+        debounce (float): Seconds without further changes before a burst is processed
+        poll_interval (float): Seconds between scans of the tree
+        incremental (bool): Keep comments whose element code has not changed
+        concurrency (int): Maximum in-flight inference requests per file
+        slug_index (Optional[SlugIndex]): Slug index to update after each write
+        batch_tokens (Optional[int]): Pack small elements into shared prompts of about this many tokens
+        stream (bool): Stream responses and stop once a comment is complete or malformed
+        structured (bool): Ask the backend for schema-constrained JSON
+        stop (Optional[threading.Event]): Ends the session when set (Ctrl+C also ends it)
+    """
+    parser = get_parser()
+    processed = _scan(path)
+    known = {file_path: _read_lines(file_path) for file_path in processed}
+    observed = processed
+    last_change = 0.0
+
+    print(colored(f"Watching {path} for changes (Ctrl+C to stop)", "cyan"))
+    try:
+        while stop is None or not stop.is_set():
+            time.sleep(poll_interval)
+            current = _scan(path)
+            if current != observed:
+                observed = current
+                last_change = time.monotonic()
+                continue
+            if observed == processed or time.monotonic() - last_change < debounce:
+                continue
+
+            changed = sorted(
+                file_path for file_path, stat in observed.items() if processed.get(file_path) != stat
+            )
+            processed = dict(observed)
+            for file_path in list(known):
+                if file_path not in observed:
+                    del known[file_path]
+
+            for file_path in changed:
+                try:
+                    wrote = _redocument(
+                        inference, formatter, parser, file_path, known,
+                        incremental, concurrency, slug_index, batch_tokens, stream, structured,
+                    )
+                except FileChangedError:
+                    # Keep the user's save; forgetting the file's state makes the next round retry it
+                    print(colored(f"{file_path} was saved again while documenting it; retrying", "yellow"))
+                    processed.pop(file_path, None)
+                    continue
+                except Exception as e:
+                    print(colored(f"Failed to re-document {file_path}: {e}", "red"))
+                    continue
+                if wrote:
+                    # Our own write: remember it so the next scan does not see a change
+                    stat = _stat(file_path)
+                    if stat is not None:
+                        processed[file_path] = stat
+                        observed[file_path] = stat
+    except KeyboardInterrupt:
+        pass
+    print(colored("Stopped watching", "cyan"))
+
+
+def _redocument(
+    inference, formatter, parser, file_path, known,
+    incremental, concurrency, slug_index, batch_tokens, stream, structured,
+) -> bool:
+    """Re-document the changed elements of one file; returns whether the file was processed."""
+    lines = _read_lines(file_path)
+    previous = known.get(file_path)
+    if lines is None or lines == previous:
+        # Saved without changes, or already the baseline (e.g. the tool's own output)
+        return False
+    known[file_path] = lines
+    ranges = diff_lines(previous, lines) if previous is not None else [(1, sys.maxsize)]
+
+    elements = [
+        element
+        for element in parser.parse_file(file_path)
+        if overlaps(ranges, element[2]["pos"]["startLine"], element[2]["pos"]["endLine"])
+    ]
+    if not elements:
+        print(colored(f"No changed elements in {file_path}", "yellow"))
+        return False
+
+    print(colored(f"Re-documenting {len(elements)} changed elements in {file_path}", "blue"))
+    try:
+        process_file(
+            inference,
+            formatter,
+            file_path,
+            elements=elements,
+            incremental=incremental,
+            concurrency=concurrency,
+            slug_index=slug_index,
+            batch_tokens=batch_tokens,
+            stream=stream,
+            structured=structured,
+        )
+    except FileChangedError:
+        # Diff the next save against the old baseline so these elements are covered again
+        known[file_path] = previous
+        raise
+    known[file_path] = _read_lines(file_path)
+    return True
+
+
+def _scan(path: str) -> Dict[str, Tuple[int, int]]:
+    """Map every watched file under `path` to its (mtime_ns, size)."""
+    if os.path.isfile(path):
+        file_paths = [path]
+    else:
+        file_paths = [
+            os.path.join(root, name)
+            for root, _, files in iter_tree(path)
+            for name in files
+            if os.path.splitext(name)[1] in WATCHED_EXTENSIONS
+        ]
+    stats = {}
+    for file_path in file_paths:
+        stat = _stat(file_path)
+        if stat is not None:
+            stats[file_path] = stat
+    return stats
+
+
+def _stat(file_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _read_lines(file_path: str) -> Optional[List[str]]:
+    try:
+        with open(file_path, "r") as f:
+            return f.readlines()
+    except (OSError, UnicodeDecodeError):
+        return None
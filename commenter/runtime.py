@@ -0,0 +1,44 @@
+import asyncio
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its background thread on first use.
+
+    Async clients are bound to the loop they were created on, so every coroutine the
+    tool runs goes through this one long-lived loop instead of a fresh asyncio.run()."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="commenter-event-loop", daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+def run(coroutine: Awaitable[T]) -> T:
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+
+    Args:
+        coroutine (Awaitable[T]): The coroutine to run
+
+    Returns:
+        T: The coroutine's result
+    """
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("runtime.run() cannot be called from the shared event loop itself")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
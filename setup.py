@@ -6,6 +6,9 @@ setup(
     packages=find_packages(),
     install_requires=[
         "rich>=13.0.0",
+        "click",
+        "httpx",
+        "termcolor",
     ],
     entry_points={
         'console_scripts': [
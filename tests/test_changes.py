@@ -0,0 +1,79 @@
+import os
+from commenter.processing.changes import affected_directories, diff_lines, overlaps, parse_diff
+
+DIFF = """diff --git a/src/a.ts b/src/a.ts
+index 1111111..2222222 100644
+--- a/src/a.ts
++++ b/src/a.ts
+@@ -3,0 +4,2 @@ export function a() {
++  const x = 1;
++  const y = 2;
+@@ -10 +12 @@ export function b() {
+-  return 1;
++  return 2;
+@@ -20,3 +22,0 @@ export function c() {
+-  one();
+-  two();
+-  three();
+diff --git a/src/gone.ts b/src/gone.ts
+deleted file mode 100644
+--- a/src/gone.ts
++++ /dev/null
+@@ -1,2 +0,0 @@
+-export const gone = 1;
+-export const alsoGone = 2;
+diff --git a/src/new.ts b/src/new.ts
+new file mode 100644
+--- /dev/null
++++ b/src/new.ts
+@@ -0,0 +1,3 @@
++export const a = 1;
++export const b = 2;
++export const c = 3;
+"""
+
+
+def test_parse_diff_collects_ranges_per_file():
+    changed = parse_diff(DIFF, "/repo")
+
+    assert changed == {
+        os.path.join("/repo", "src/a.ts"): [(4, 5), (12, 12), (22, 22)],
+        os.path.join("/repo", "src/new.ts"): [(1, 3)],
+    }
+
+
+def test_parse_diff_counts_a_deletion_at_the_top_as_line_one():
+    diff = "+++ b/a.ts\n@@ -1,2 +0,0 @@\n-x\n-y\n"
+
+    assert parse_diff(diff, "/repo") == {os.path.join("/repo", "a.ts"): [(1, 1)]}
+
+
+def test_diff_lines_follows_parse_diff_rules():
+    old = ["a\n", "b\n", "c\n", "d\n"]
+    new = ["a\n", "B\n", "c\n", "x\n", "y\n"]
+
+    assert diff_lines(old, new) == [(2, 2), (4, 5)]
+    # A pure deletion touches the line before it
+    assert diff_lines(["a\n", "b\n", "c\n"], ["a\n", "c\n"]) == [(1, 1)]
+    assert diff_lines(old, old) == []
+
+
+def test_overlaps_is_inclusive_on_both_ends():
+    ranges = [(4, 5), (12, 12)]
+
+    assert overlaps(ranges, 1, 4)
+    assert overlaps(ranges, 5, 9)
+    assert overlaps(ranges, 12, 12)
+    assert not overlaps(ranges, 6, 11)
+    assert not overlaps([], 1, 100)
+
+
+def test_affected_directories_stops_at_the_root(tmp_path):
+    root = os.path.realpath(tmp_path)
+    files = [os.path.join(root, "src", "lib", "a.ts"), os.path.join(root, "b.ts")]
+
+    assert affected_directories(files, str(tmp_path)) == {
+        root,
+        os.path.join(root, "src"),
+        os.path.join(root, "src", "lib"),
+    }
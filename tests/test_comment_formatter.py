@@ -0,0 +1,121 @@
+from commenter.formatters.comment import CommentFormatter, _recover_json_fields
+
+CODE = """function add(a: number, b: number): number {
+  return a + b;
+}"""
+
+
+def test_code_hash_ignores_whitespace_but_not_code():
+    reindented = "function add(a: number, b: number): number {\n\n      return a + b;\n}\n"
+
+    assert CommentFormatter.code_hash(CODE) == CommentFormatter.code_hash(reindented)
+    assert CommentFormatter.code_hash(CODE) != CommentFormatter.code_hash(CODE.replace("+", "-"))
+    assert len(CommentFormatter.code_hash(CODE)) == 12
+
+
+def test_code_hash_ignores_generated_comments_of_nested_members():
+    bare = "class Cart {\n  total() {\n    return 0;\n  }\n}"
+    commented = (
+        "class Cart {\n  /**\n   * Sums the cart.\n   * @generated abc123 v1.0 hash:0123456789ab\n   */\n"
+        "  total() {\n    return 0;\n  }\n}"
+    )
+    handwritten = "class Cart {\n  /* keep in sync with Order */\n  total() {\n    return 0;\n  }\n}"
+
+    assert CommentFormatter.code_hash(commented) == CommentFormatter.code_hash(bare)
+    assert CommentFormatter.code_hash(handwritten) != CommentFormatter.code_hash(bare)
+
+
+def test_extract_code_hash():
+    comment = "/**\n * Adds.\n * @generated k3j2h1 v1.2 hash:0a1b2c3d4e5f\n */\n"
+
+    assert CommentFormatter.extract_code_hash(comment) == "0a1b2c3d4e5f"
+    assert CommentFormatter.extract_code_hash("/** Adds. */") is None
+    assert CommentFormatter.extract_code_hash(None) is None
+
+
+def test_split_batch_output_matches_by_index_then_name_then_position():
+    output = (
+        '<elements><element index="2"><name>b</name></element>'
+        "<element><name>c</name></element>"
+        "<element><name>unknown</name></element></elements>"
+    )
+
+    blocks = CommentFormatter.split_batch_output(output, ["a", "b", "c"])
+
+    # The third block names no element and its position is taken, so "a" gets no block
+    assert blocks == {
+        1: '<element index="2"><name>b</name></element>',
+        2: "<element><name>c</name></element>",
+    }
+
+
+def test_split_batch_output_falls_back_to_position():
+    output = "<element><name>x</name></element><element><name>y</name></element>"
+
+    assert CommentFormatter.split_batch_output(output, ["a", "b"]) == {
+        0: "<element><name>x</name></element>",
+        1: "<element><name>y</name></element>",
+    }
+
+
+def test_split_batch_output_ignores_out_of_range_and_duplicate_indexes():
+    output = '<element index="1"><name>a</name></element><element index="1"><name>b</name></element><element index="9"><name>z</name></element>'
+
+    blocks = CommentFormatter.split_batch_output(output, ["a", "b"])
+
+    assert blocks[0] == '<element index="1"><name>a</name></element>'
+    assert blocks[1] == '<element index="1"><name>b</name></element>'
+    assert len(blocks) == 2
+
+
+def test_parse_structured_output_reads_valid_json_after_prose():
+    output = (
+        'Here you go: {"name": "add", "description": " Adds two numbers. ", "type": "function", '
+        '"isAsync": false, "parameters": [{"name": "a", "type": "number", "description": "First"}, '
+        '{"type": "number"}], "returns": {"type": "number", "description": "The sum"}} trailing'
+    )
+
+    parsed = CommentFormatter.parse_structured_output(output)
+
+    assert parsed == {
+        "name": "add",
+        "description": "Adds two numbers.",
+        "type": "function",
+        "isAsync": False,
+        "parameters": [{"name": "a", "type": "number", "description": "First"}],
+        "returns": {"type": "number", "description": "The sum"},
+    }
+
+
+def test_parse_structured_output_without_json():
+    assert CommentFormatter.parse_structured_output("I cannot help with that") == {
+        "name": "",
+        "description": "",
+        "parameters": [],
+        "returns": {},
+    }
+
+
+def test_parse_structured_output_recovers_truncated_json():
+    output = (
+        '{"name": "add", "description": "Adds \\"two\\" numbers.", "isAsync": true, '
+        '"returns": {"type": "number", "description": "The sum"}, '
+        '"parameters": [{"name": "a", "type": "number", "description": "First"}, {"name": "b", "ty'
+    )
+
+    parsed = CommentFormatter.parse_structured_output(output)
+
+    assert parsed["name"] == "add"
+    assert parsed["description"] == 'Adds "two" numbers.'
+    assert parsed["isAsync"] is True
+    assert parsed["returns"] == {"type": "number", "description": "The sum"}
+    assert parsed["parameters"] == [{"name": "a", "type": "number", "description": "First"}]
+
+
+def test_recover_json_fields_only_reads_top_level_strings():
+    text = '{"returns": {"type": "string", "description": "Nested"}, "description": "Top'
+
+    data = _recover_json_fields(text)
+
+    # The nested "description" belongs to returns; the top-level one is unterminated
+    assert data == {"returns": {"type": "string", "description": "Nested"}}
@@ -0,0 +1,107 @@
+import os
+import pytest
+from commenter.processing.edits import EditConflictError, EditPlan, FileChangedError, atomic_open
+
+LINES = ["a\n", "b\n", "c\n", "d\n"]
+
+
+def test_apply_replaces_inserts_and_keeps_untouched_lines():
+    plan = EditPlan()
+    plan.replace(3, 4, ["D\n"])
+    plan.replace(0, 0, ["/** a */\n"])
+    plan.replace(1, 2, [])
+
+    assert plan.apply(LINES) == ["/** a */\n", "a\n", "c\n", "D\n"]
+    # The original lines are left alone
+    assert LINES == ["a\n", "b\n", "c\n", "d\n"]
+
+
+def test_touching_spans_are_allowed():
+    plan = EditPlan()
+    plan.replace(0, 2, ["x\n"])
+    plan.replace(2, 4, ["y\n"])
+
+    assert plan.apply(LINES) == ["x\n", "y\n"]
+
+
+def test_overlapping_spans_conflict():
+    plan = EditPlan()
+    plan.replace(0, 2, ["x\n"])
+    plan.replace(1, 3, ["y\n"])
+
+    with pytest.raises(EditConflictError):
+        plan.apply(LINES)
+
+
+def test_two_insertions_at_the_same_line_conflict():
+    plan = EditPlan()
+    plan.replace(1, 1, ["x\n"])
+    plan.replace(1, 1, ["y\n"])
+
+    with pytest.raises(EditConflictError):
+        plan.apply(LINES)
+
+
+def test_invalid_and_out_of_range_spans_are_rejected():
+    with pytest.raises(ValueError):
+        EditPlan().replace(2, 1, [])
+
+    plan = EditPlan()
+    plan.replace(3, 6, ["x\n"])
+    with pytest.raises(ValueError):
+        plan.apply(LINES)
+
+
+def test_write_replaces_the_file_and_streams_large_output(tmp_path, monkeypatch):
+    path = tmp_path / "a.ts"
+    path.write_text("".join(LINES))
+    plan = EditPlan()
+    plan.replace(0, 1, ["A\n"])
+
+    assert plan.write(LINES, str(path)) == 8
+    assert path.read_text() == "A\nb\nc\nd\n"
+
+    monkeypatch.setattr(EditPlan, "STREAM_THRESHOLD", 0)
+    lines = path.read_text().splitlines(keepends=True)
+    plan = EditPlan()
+    plan.replace(4, 4, ["e\n"])
+    plan.write(lines, str(path))
+    assert path.read_text() == "A\nb\nc\nd\ne\n"
+
+
+def test_write_refuses_to_overwrite_a_newer_save(tmp_path):
+    path = tmp_path / "a.ts"
+    path.write_text("".join(LINES))
+    plan = EditPlan()
+    plan.replace(0, 1, ["A\n"])
+    path.write_text("saved meanwhile\n")
+
+    with pytest.raises(FileChangedError):
+        plan.write(LINES, str(path))
+    assert path.read_text() == "saved meanwhile\n"
+    assert os.listdir(tmp_path) == ["a.ts"]
+
+
+def test_atomic_open_keeps_the_mode_of_an_existing_file(tmp_path):
+    path = tmp_path / "run.sh"
+    path.write_text("old\n")
+    os.chmod(path, 0o750)
+
+    with atomic_open(str(path)) as f:
+        f.write("new\n")
+
+    assert path.read_text() == "new\n"
+    assert os.stat(path).st_mode & 0o7777 == 0o750
+
+
+def test_atomic_open_leaves_the_file_alone_when_the_block_fails(tmp_path):
+    path = tmp_path / "a.ts"
+    path.write_text("old\n")
+
+    with pytest.raises(RuntimeError):
+        with atomic_open(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("interrupted")
+
+    assert path.read_text() == "old\n"
+    assert os.listdir(tmp_path) == ["a.ts"]
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from commenter.inferences import scheduler
+from commenter.inferences.scheduler import _AdaptiveLimiter, _TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic and asyncio.sleep so the bucket can be tested without waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(scheduler.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_spends_its_budget_then_waits_for_the_refill(clock):
+    bucket = _TokenBucket(60)  # one unit per second
+
+    async def run():
+        await bucket.acquire(50)
+        await bucket.acquire(10)
+        await bucket.acquire(5)
+
+    asyncio.run(run())
+
+    assert clock.sleeps == [pytest.approx(5.0)]
+    assert bucket.available == pytest.approx(0.0)
+
+
+def test_token_bucket_refills_up_to_its_rate(clock):
+    bucket = _TokenBucket(60)
+
+    async def run():
+        await bucket.acquire(60)
+        clock.now += 600
+        await bucket.acquire(60)
+
+    asyncio.run(run())
+
+    assert clock.sleeps == []
+
+
+def test_token_bucket_caps_an_oversized_request_at_a_full_bucket(clock):
+    bucket = _TokenBucket(60)
+
+    async def run():
+        await bucket.acquire(30)
+        await bucket.acquire(1000)
+
+    asyncio.run(run())
+
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+
+
+def test_adaptive_limiter_grows_additively_and_shrinks_multiplicatively():
+    limiter = _AdaptiveLimiter(initial=2, minimum=1, maximum=4)
+
+    for _ in range(2):
+        limiter.grow()
+    assert limiter.limit == pytest.approx(2.9)
+
+    for _ in range(20):
+        limiter.grow()
+    assert limiter.limit == 4
+
+    limiter.shrink(0.5)
+    assert limiter.limit == 2
+    limiter.shrink(0.1)
+    assert limiter.limit == 1
+
+
+def test_adaptive_limiter_caps_requests_in_flight():
+    limiter = _AdaptiveLimiter(initial=2, minimum=1, maximum=2)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        await limiter.acquire()
+        peak = max(peak, limiter.in_flight)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await limiter.release()
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(run())
+
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_limiter_lets_waiters_in_after_a_release():
+    limiter = _AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+    order = []
+
+    async def request(name):
+        await limiter.acquire()
+        order.append(f"start {name}")
+        await asyncio.sleep(0)
+        order.append(f"end {name}")
+        await limiter.release()
+
+    async def run():
+        await asyncio.gather(request("a"), request("b"))
+
+    asyncio.run(run())
+
+    assert order == ["start a", "end a", "start b", "end b"]
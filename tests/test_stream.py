@@ -0,0 +1,70 @@
+from commenter.formatters.stream import COMPLETE, CONTINUE, MALFORMED, ElementStreamParser
+
+ELEMENT = (
+    "<element><name>add</name><description>Adds a < b & c</description>"
+    "<type>function</type><parameters><param><name>a</name></param></parameters>"
+    "<returns><type>number</type></returns></element>"
+)
+
+
+def feed_all(parser, text, size=3):
+    states = [parser.feed(text[start : start + size]) for start in range(0, len(text), size)]
+    return states
+
+
+def test_complete_element_in_small_chunks():
+    parser = ElementStreamParser()
+    states = feed_all(parser, ELEMENT)
+
+    assert states[-1] == COMPLETE
+    assert set(states[:-1]) == {CONTINUE}
+    assert parser.text == ELEMENT
+
+
+def test_text_drops_the_fence_and_anything_after_the_element():
+    parser = ElementStreamParser()
+    feed_all(parser, '```xml\n<?xml version="1.0"?>\n' + ELEMENT + "\n```\nThanks!")
+
+    assert parser.state == COMPLETE
+    assert parser.text == ELEMENT
+
+
+def test_complete_and_malformed_states_are_final():
+    parser = ElementStreamParser()
+    parser.feed(ELEMENT)
+
+    assert parser.feed("<garbage>") == COMPLETE
+    assert parser.text == ELEMENT
+
+
+def test_prose_before_the_element_is_malformed():
+    parser = ElementStreamParser()
+
+    assert parser.feed("Sure! Here is") == MALFORMED
+    assert parser.feed(ELEMENT) == MALFORMED
+
+
+def test_partial_root_tag_waits_for_more():
+    parser = ElementStreamParser()
+
+    assert parser.feed("  <elem") == CONTINUE
+    assert parser.feed("ent>") == CONTINUE
+
+
+def test_unknown_and_mismatched_tags_are_malformed():
+    assert ElementStreamParser().feed("<element><script>") == MALFORMED
+    assert ElementStreamParser().feed("<element><parameters></returns>") == MALFORMED
+    assert ElementStreamParser().feed("<name>x</name>") == MALFORMED
+
+
+def test_comments_and_self_closing_tags_are_skipped():
+    parser = ElementStreamParser()
+
+    assert parser.feed("<element><!-- note --><parameters/><name>x</name></element>") == COMPLETE
+
+
+def test_overlong_unfinished_output_is_malformed():
+    parser = ElementStreamParser(max_chars=40)
+
+    assert parser.feed("<element><description>") == CONTINUE
+    assert parser.feed("x" * 40) == MALFORMED